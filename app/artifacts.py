@@ -0,0 +1,100 @@
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, Optional
+
+REPORT_ARTIFACT_TTL_SECONDS = float(os.getenv("REPORT_ARTIFACT_TTL_SECONDS", "900"))
+# Artifacts larger than this spill from memory to a temporary file
+REPORT_ARTIFACT_SPOOL_BYTES = int(
+    os.getenv("REPORT_ARTIFACT_SPOOL_BYTES", str(1024 * 1024))
+)
+REPORT_ARTIFACT_CHUNK_SIZE = 64 * 1024
+
+MEDIA_TYPES: Dict[str, str] = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+
+def new_spool() -> tempfile.SpooledTemporaryFile:
+    return tempfile.SpooledTemporaryFile(max_size=REPORT_ARTIFACT_SPOOL_BYTES)
+
+
+class ReportArtifact:
+
+    def __init__(self, name: str, media_type: str, file, metadata: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.media_type = media_type
+        self.metadata = metadata
+        self.created_at = time.time()
+        self._file = file
+        self._lock = threading.Lock()
+        file.seek(0, os.SEEK_END)
+        self.size = file.tell()
+
+    def iter_bytes(self, chunk_size: int = REPORT_ARTIFACT_CHUNK_SIZE) -> Iterator[bytes]:
+        # Each reader keeps its own offset so concurrent downloads of the
+        # same artifact don't interleave.
+        offset = 0
+        while offset < self.size:
+            with self._lock:
+                self._file.seek(offset)
+                chunk = self._file.read(min(chunk_size, self.size - offset))
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class ArtifactStore:
+
+    def __init__(self, ttl_seconds: float = REPORT_ARTIFACT_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._artifacts: Dict[str, ReportArtifact] = {}
+        self._lock = threading.Lock()
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [a for a in self._artifacts.values() if a.created_at < cutoff]
+            for artifact in expired:
+                del self._artifacts[artifact.id]
+        for artifact in expired:
+            artifact.close()
+
+    def add(
+        self, name: str, media_type: str, file, metadata: Optional[Dict[str, Any]] = None
+    ) -> ReportArtifact:
+        self._purge_expired()
+        artifact = ReportArtifact(name, media_type, file, metadata or {})
+        with self._lock:
+            self._artifacts[artifact.id] = artifact
+        return artifact
+
+    def get(self, artifact_id: str) -> Optional[ReportArtifact]:
+        self._purge_expired()
+        with self._lock:
+            return self._artifacts.get(artifact_id)
+
+    def remove(self, artifact_id: str) -> None:
+        with self._lock:
+            artifact = self._artifacts.pop(artifact_id, None)
+        if artifact is not None:
+            artifact.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "artifacts": len(self._artifacts),
+                "bytes": sum(a.size for a in self._artifacts.values()),
+            }
+
+
+artifact_store = ArtifactStore()
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CHART_CACHE_MAX_ENTRIES = int(os.getenv("CHART_CACHE_MAX_ENTRIES", "256"))
+# Optional second tier shared across workers and restarts
+CHART_CACHE_DIR = os.getenv("CHART_CACHE_DIR") or None
+
+
+def chart_cache_key(kind: str, args: Any, render_params: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"kind": kind, "args": args, "params": render_params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ChartCache:
+
+    def __init__(
+        self,
+        max_entries: int = CHART_CACHE_MAX_ENTRIES,
+        directory: Optional[str] = CHART_CACHE_DIR,
+    ):
+        self.max_entries = max_entries
+        self.directory = Path(directory) if directory else None
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.png"
+
+    def _remember(self, key: str, png: bytes) -> None:
+        self._entries[key] = png
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return png
+
+        if self.directory is not None:
+            try:
+                png = self._path(key).read_bytes()
+            except OSError:
+                png = None
+            if png is not None:
+                with self._lock:
+                    self._remember(key, png)
+                    self.disk_hits += 1
+                return png
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, png: bytes) -> None:
+        with self._lock:
+            self._remember(key, png)
+        if self.directory is not None:
+            path = self._path(key)
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+                tmp.write_bytes(png)
+                os.replace(tmp, path)
+            except OSError as e:
+                print(f"Chart cache write failed: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "directory": str(self.directory) if self.directory else None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+chart_cache = ChartCache()
@@ -0,0 +1,144 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from app.chart_cache import ChartCache, chart_cache, chart_cache_key
+
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# chart kind -> "module:function" returning PNG bytes (or None)
+CHART_RENDERERS: Dict[str, str] = {
+    "workforce_by_gender_pie": "app.report_generator:_render_workforce_by_gender_pie",
+    "training_hours_by_gender_bar": "app.report_generator:_render_training_hours_by_gender_bar",
+    "trend_bar": "app.report_generator:_render_trend_bar",
+}
+
+# Passed to every renderer and folded into the chart cache key
+CHART_RENDER_PARAMS: Dict[str, Dict[str, Any]] = {
+    "workforce_by_gender_pie": {"figsize": (6, 6), "dpi": 200},
+    "training_hours_by_gender_bar": {"figsize": (8, 5), "dpi": 200},
+    "trend_bar": {"figsize": (6, 4), "dpi": 200},
+}
+
+ChartJob = Tuple[str, tuple]
+
+# Only used when rendering in-process; worker processes each own their pyplot.
+_pyplot_lock = threading.Lock()
+_resolved: Dict[str, Any] = {}
+
+
+def _init_worker() -> None:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+
+
+def _resolve(kind: str):
+    renderer = _resolved.get(kind)
+    if renderer is None:
+        module_name, func_name = CHART_RENDERERS[kind].split(":")
+        renderer = getattr(importlib.import_module(module_name), func_name)
+        _resolved[kind] = renderer
+    return renderer
+
+
+def render_chart_png(kind: str, args: tuple) -> Optional[bytes]:
+    return _resolve(kind)(*args, **CHART_RENDER_PARAMS.get(kind, {}))
+
+
+def chart_job_key(kind: str, args: tuple) -> str:
+    return chart_cache_key(
+        f"{kind}:{CHART_RENDERERS[kind]}", args, CHART_RENDER_PARAMS.get(kind, {})
+    )
+
+
+class ChartRenderEngine:
+
+    def __init__(
+        self,
+        max_workers: int = CHART_WORKERS,
+        cache: Optional[ChartCache] = chart_cache,
+    ):
+        self.max_workers = max_workers
+        self.cache = cache
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                # spawn: workers must not inherit the parent's threads or pyplot state
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def _render_in_process(self, jobs: Dict[str, ChartJob]) -> Dict[str, Optional[bytes]]:
+        with _pyplot_lock:
+            return {name: render_chart_png(kind, args) for name, (kind, args) in jobs.items()}
+
+    def _lookup(
+        self, jobs: Dict[str, ChartJob]
+    ) -> Tuple[Dict[str, Optional[bytes]], Dict[str, ChartJob], Dict[str, str]]:
+        if self.cache is None:
+            return {}, jobs, {}
+        cached: Dict[str, Optional[bytes]] = {}
+        pending: Dict[str, ChartJob] = {}
+        keys: Dict[str, str] = {}
+        for name, (kind, args) in jobs.items():
+            key = chart_job_key(kind, args)
+            png = self.cache.get(key)
+            if png is None:
+                pending[name] = (kind, args)
+                keys[name] = key
+            else:
+                cached[name] = png
+        return cached, pending, keys
+
+    def _store(self, rendered: Dict[str, Optional[bytes]], keys: Dict[str, str]) -> None:
+        for name, key in keys.items():
+            if rendered.get(name) is not None:
+                self.cache.set(key, rendered[name])
+
+    async def _cache_io(self, fn, *args):
+        # The disk tier reads and writes files; keep those off the event loop
+        if self.cache is not None and self.cache.directory is not None:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def render_async(self, jobs: Dict[str, ChartJob]) -> Dict[str, Optional[bytes]]:
+        results, pending, keys = await self._cache_io(self._lookup, jobs)
+        if pending:
+            executor = self._get_executor()
+            if executor is None:
+                rendered = await asyncio.to_thread(self._render_in_process, pending)
+            else:
+                names = list(pending)
+                pngs = await asyncio.gather(
+                    *(
+                        asyncio.wrap_future(executor.submit(render_chart_png, *pending[name]))
+                        for name in names
+                    )
+                )
+                rendered = dict(zip(names, pngs))
+            await self._cache_io(self._store, rendered, keys)
+            results.update(rendered)
+        return {name: results[name] for name in jobs}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+chart_engine = ChartRenderEngine()
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Outside the working tree by default, so neither the app nor the test run
+# drops a database into the checkout
+COMPLETION_CACHE_PATH = os.getenv(
+    "COMPLETION_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "triple-i", "completion_cache.db"),
+)
+COMPLETION_CACHE_TTL_SECONDS = float(
+    os.getenv("COMPLETION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))
+)
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", "5000"))
+# Hits only record their access time in memory; it reaches the LRU column in
+# one write per this many distinct hits, or with the next store.
+COMPLETION_CACHE_TOUCH_BATCH = int(os.getenv("COMPLETION_CACHE_TOUCH_BATCH", "64"))
+
+
+class CompletionCache:
+
+    def __init__(
+        self,
+        path: Optional[str] = COMPLETION_CACHE_PATH,
+        ttl_seconds: float = COMPLETION_CACHE_TTL_SECONDS,
+        max_entries: int = COMPLETION_CACHE_MAX_ENTRIES,
+        touch_batch: int = COMPLETION_CACHE_TOUCH_BATCH,
+    ):
+        # An empty path disables the cache
+        self.path = path or None
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.touch_batch = max(1, touch_batch)
+        self._touched: Dict[str, float] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], **params: Any) -> str:
+        prompt_hash = hashlib.sha256(
+            json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        payload = json.dumps(
+            {"model": model, "prompt": prompt_hash, "params": params}, sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily so importing the module never touches the filesystem
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, model TEXT, content TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_completions_accessed_at "
+                "ON completions (accessed_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        if self.path is None:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT content, created_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    conn.commit()
+                self.misses += 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch:
+                self._flush_touched(conn)
+                conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def _flush_touched(self, conn: sqlite3.Connection) -> None:
+        if self._touched:
+            conn.executemany(
+                "UPDATE completions SET accessed_at = ? WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def set(self, key: str, model: str, content: str) -> None:
+        if self.path is None:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, model, content, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, content, now, now),
+            )
+            self._flush_touched(conn)
+            conn.execute(
+                "DELETE FROM completions WHERE created_at < ?",
+                (now - self.ttl_seconds,),
+            )
+            # Least recently used entries go first once the cache is full
+            conn.execute(
+                "DELETE FROM completions WHERE key IN ("
+                "SELECT key FROM completions ORDER BY accessed_at DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+
+    def clear(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM completions")
+            conn.commit()
+            self._touched.clear()
+
+    # The request loop never waits on SQLite: lookups and stores made from
+    # coroutines run on a worker thread.
+    async def aget(self, key: str) -> Optional[str]:
+        if self.path is None:
+            return None
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, model: str, content: str) -> None:
+        if self.path is not None:
+            await asyncio.to_thread(self.set, key, model, content)
+
+    def stats(self) -> Dict[str, Any]:
+        entries = 0
+        if self.path is not None:
+            with self._lock:
+                entries = self._connect().execute(
+                    "SELECT COUNT(*) FROM completions"
+                ).fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            conn, self._conn = self._conn, None
+            if conn is not None:
+                self._flush_touched(conn)
+                conn.commit()
+        if conn is not None:
+            conn.close()
+
+
+completion_cache = CompletionCache()
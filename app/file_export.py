@@ -1,16 +1,14 @@
 import base64
 import io
 from datetime import datetime
-import os
 from docx.enum.section import WD_SECTION_START
 
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
 from docx import Document
 from docx.shared import Inches, Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from dotenv import load_dotenv
-from openai import OpenAI
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet
@@ -29,8 +27,6 @@ from app.templates.layouts import get_layout
 
 load_dotenv()
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 
 def _decode_base64_image(img_b64: str) -> io.BytesIO:
     return io.BytesIO(base64.b64decode(img_b64))
@@ -80,7 +76,8 @@ def _build_kpi_summary_rows(kpi_data: Dict[str, Any]) -> List[List[str]]:
     return rows
 
 
-def generate_docx_report(
+def write_docx_report(
+    out: BinaryIO,
     *,
     company_id: int,
     year: int,
@@ -96,7 +93,7 @@ def generate_docx_report(
     outlook_and_next_steps: str,
     closing: str,
     layout_template: Optional[Dict[str, Any]] = None,
-) -> Tuple[str, str]:
+) -> str:
 
     layout = get_layout("default") if layout_template is None else layout_template
 
@@ -232,13 +229,12 @@ def generate_docx_report(
     doc.add_heading(closing_config.get("title", "Closing"), level=1)
     doc.add_paragraph(closing)
 
-    buf = io.BytesIO()
-    doc.save(buf)
-    buf.seek(0)
-    return filename, base64.b64encode(buf.read()).decode("utf-8")
+    doc.save(out)
+    return filename
 
 
-def generate_pdf_report(
+def write_pdf_report(
+    out: BinaryIO,
     *,
     company_id: int,
     year: int,
@@ -254,14 +250,13 @@ def generate_pdf_report(
     outlook_and_next_steps: str,
     closing: str,
     layout_template: Optional[Dict[str, Any]] = None,
-) -> Tuple[str, str]:
+) -> str:
 
     layout = get_layout("default") if layout_template is None else layout_template
 
     filename = f"S1_Report_{company_id}_{year}.pdf"
-    buf = io.BytesIO()
     doc = SimpleDocTemplate(
-        buf, pagesize=A4, leftMargin=36, rightMargin=36, topMargin=36, Margin=36
+        out, pagesize=A4, leftMargin=36, rightMargin=36, topMargin=36, Margin=36
     )
     styles = getSampleStyleSheet()
     story = []
@@ -395,5 +390,20 @@ def generate_pdf_report(
     story.append(Paragraph(closing, styles["Normal"]))
 
     doc.build(story)
-    buf.seek(0)
-    return filename, base64.b64encode(buf.read()).decode("utf-8")
+    return filename
+
+
+def render_document_bytes(write, **kwargs: Any) -> Tuple[str, bytes]:
+    buf = io.BytesIO()
+    filename = write(buf, **kwargs)
+    return filename, buf.getvalue()
+
+
+def generate_docx_report(**kwargs: Any) -> Tuple[str, str]:
+    filename, data = render_document_bytes(write_docx_report, **kwargs)
+    return filename, base64.b64encode(data).decode("utf-8")
+
+
+def generate_pdf_report(**kwargs: Any) -> Tuple[str, str]:
+    filename, data = render_document_bytes(write_pdf_report, **kwargs)
+    return filename, base64.b64encode(data).decode("utf-8")
@@ -0,0 +1,670 @@
+import os
+import time
+import zipfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import sqlalchemy
+from openpyxl import load_workbook
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for .parquet uploads
+    pq = None
+
+from app.database import engine
+from app.models import (
+    FS1_Diversity,
+    FS1_EmployeeTraining,
+    FS1_EmployeeTurnover,
+    FS1_Workforce,
+    FS1_WorkforceComposition,
+    FS1_WorkforceDiversity,
+    FS1_WorkplaceInjuries,
+)
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "5000"))
+INGEST_MODES = ("replace", "incremental")
+# Keeps IN (...) lists under SQLite's bound-parameter limit
+IN_CLAUSE_LIMIT = 900
+
+_TIMESTAMP_COLUMNS = ("createdat", "created_at", "updatedat", "updated_at")
+
+# Candidate DateKey formats, most specific first; "mixed" is the catch-all
+DATE_FORMATS = ("%Y%m%d", "%Y-%m-%d", "mixed")
+DATE_FORMAT_SAMPLE_SIZE = 200
+# Row labels listed per column in date issue reports
+DATE_ISSUE_ROW_LIMIT = 100
+
+SHEET_MODELS: Dict[str, Dict[str, Any]] = {
+    "injuries": {
+        "model": FS1_WorkplaceInjuries,
+        "required": [
+            "injuryid",
+            "datekey",
+            "injurycount",
+            "companyid",
+            "countryid",
+            "organizationalunitid",
+            "createdat",
+            "updatedat",
+        ],
+    },
+    "workforce": {
+        "model": FS1_Workforce,
+        "required": [
+            "workforceid",
+            "datekey",
+            "workforcecount",
+            "companyid",
+            "countryid",
+            "organizationalunitid",
+            "createdat",
+            "updatedat",
+        ],
+    },
+    "diversity": {
+        "model": FS1_Diversity,
+        "required": [
+            "DiversityID",
+            "DateKey",
+            "CountryID",
+            "CompanyID",
+            "DisabilityCount",
+            "OrganizationalUnitID",
+            "created_at",
+            "updated_at",
+        ],
+    },
+    "workforcediversity": {
+        "model": FS1_WorkforceDiversity,
+        "required": [
+            "diversityid",
+            "datekey",
+            "countryid",
+            "companyid",
+            "disabilitycount",
+            "organizationalunitid",
+            "createdat",
+            "updatedat",
+        ],
+    },
+    "workforcecomposition": {
+        "model": FS1_WorkforceComposition,
+        "required": [
+            "workforcecompositionid",
+            "datekey",
+            "genderid",
+            "contracttypeid",
+            "countryid",
+            "employeecount",
+            "companyid",
+            "organizationalunitid",
+            "createdat",
+            "updatedat",
+        ],
+    },
+    "employeetraining": {
+        "model": FS1_EmployeeTraining,
+        "required": [
+            "trainingid",
+            "datekey",
+            "totaltraininghours",
+            "companyid",
+            "countryid",
+            "organizationalunitid",
+            "createdat",
+            "updatedat",
+        ],
+    },
+    "employeeturnover": {
+        "model": FS1_EmployeeTurnover,
+        "required": [
+            "turnoverid",
+            "datekey",
+            "genderid",
+            "agegroupid",
+            "employeesdeparted",
+            "companyid",
+            "contracttypeid",
+            "countryid",
+            "organizationalunitid",
+            "createdat",
+            "updatedat",
+        ],
+    },
+}
+
+FS1_TABLES = [
+    FS1_WorkplaceInjuries,
+    FS1_Workforce,
+    FS1_Diversity,
+    FS1_WorkforceDiversity,
+    FS1_WorkforceComposition,
+    FS1_EmployeeTraining,
+    FS1_EmployeeTurnover,
+]
+
+
+def normalize_column_name(name: Any) -> str:
+    return str(name).strip().replace(" ", "").replace("_", "").lower()
+
+
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = (
+        df.columns.astype(str)
+        .str.strip()
+        .str.replace(" ", "")
+        .str.replace("_", "")
+        .str.lower()
+    )
+    return df
+
+
+def match_sheet_model(columns: Iterable[str]) -> Optional[Dict[str, Any]]:
+    columns = set(columns)
+    for info in SHEET_MODELS.values():
+        required = [c.lower() for c in info["required"]]
+        if all(col in columns for col in required):
+            return info
+    return None
+
+
+def _parse_dates(text: pd.Series, fmt: str) -> pd.Series:
+    if fmt == "%Y-%m-%d":
+        # Date part of ISO timestamps
+        text = text.str[:10]
+    return pd.to_datetime(text, format=fmt, errors="coerce")
+
+
+def detect_date_format(text: pd.Series) -> str:
+    # Decided once per column from a sample, so the full column is parsed
+    # with a single explicit format instead of being inferred per value.
+    # Fixed formats win over "mixed".
+    sample = text.head(DATE_FORMAT_SAMPLE_SIZE)
+    best, best_hits = DATE_FORMATS[-1], 0
+    for fmt in DATE_FORMATS[:-1]:
+        hits = int(_parse_dates(sample, fmt).notna().sum())
+        if hits == len(sample):
+            return fmt
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+    return best
+
+
+def normalize_date_column(values: pd.Series) -> Dict[str, Any]:
+    # Returns python datetimes (None where missing or unparseable) and the
+    # row labels of both, so callers can report bad rows instead of guessing.
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[us]")
+    fmt = None
+    if pd.api.types.is_datetime64_any_dtype(values):
+        parsed = values
+        pending = pd.Series(False, index=values.index)
+    else:
+        pending = values.notna()
+        if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) != "string":
+            is_dt = values.map(lambda v: isinstance(v, (datetime, pd.Timestamp)))
+            if is_dt.any():
+                parsed[is_dt] = pd.to_datetime(values[is_dt])
+                pending &= ~is_dt
+
+        text = values[pending].astype(str)
+        if len(text):
+            fmt = detect_date_format(text)
+            # Columns mixing formats get the remaining formats on what's
+            # left over, still one vectorized call per format.
+            for candidate in (fmt,) + tuple(f for f in DATE_FORMATS if f != fmt):
+                converted = _parse_dates(text, candidate)
+                hits = converted.notna()
+                parsed[hits[hits].index] = converted[hits]
+                text = text[~hits]
+                if text.empty:
+                    break
+
+    missing = values.index[values.isna()]
+    unparseable = values.index[parsed.isna() & values.notna()]
+    # Object dtype keeps None for NaT on pandas 2.x and 3.x alike
+    converted = parsed.astype(object).where(parsed.notna(), None)
+    return {
+        "values": converted,
+        "format": fmt,
+        "missing": list(missing),
+        "unparseable": list(unparseable),
+    }
+
+
+def to_datetime_column(values: pd.Series) -> pd.Series:
+    return normalize_date_column(values)["values"]
+
+
+def datekey_year(values: List[Any]) -> List[Optional[int]]:
+    # Matches the old SUBSTR(CAST(DateKey AS TEXT), 1, 4) predicate for both
+    # integer (YYYYMMDD / YYYY) and datetime DateKeys.
+    text = pd.Series(values, dtype=object).map(
+        lambda v: None if v is None else str(v)[:4]
+    )
+    years = pd.to_numeric(text, errors="coerce")
+    return [None if pd.isna(y) else int(y) for y in years]
+
+
+def prepare_records(
+    df: pd.DataFrame,
+    model_cls,
+    required: List[str],
+    date_issues: Optional[Dict[str, Dict[str, list]]] = None,
+) -> List[Dict[str, Any]]:
+    # Column mapping is resolved once per sheet rather than once per row.
+    available = {c.lower() for c in required}
+    now_utc = datetime.now(timezone.utc)
+    names: List[str] = []
+    columns: List[Any] = []
+    for col in model_cls.__table__.columns:
+        col_lower = col.name.lower()
+        if col.name == "Year":
+            continue
+        if col_lower in available and col_lower in df.columns:
+            series = df[col_lower]
+            if isinstance(col.type, sqlalchemy.DateTime):
+                normalized = normalize_date_column(series)
+                values = normalized["values"]
+                missing = normalized["missing"]
+                if col_lower in _TIMESTAMP_COLUMNS:
+                    # A blank audit timestamp is stamped like an absent column
+                    values[missing] = datetime.now()
+                    missing = []
+                if date_issues is not None and (missing or normalized["unparseable"]):
+                    issues = date_issues.setdefault(
+                        col.name, {"missing": [], "unparseable": []}
+                    )
+                    issues["missing"].extend(missing)
+                    issues["unparseable"].extend(normalized["unparseable"])
+            else:
+                values = series.astype(object).where(series.notna(), None)
+            names.append(col.name)
+            columns.append(values.tolist())
+        elif col_lower in ("createdat", "created_at", "updatedat", "updated_at"):
+            names.append(col.name)
+            columns.append([now_utc] * len(df))
+    if "Year" in model_cls.__table__.columns and "DateKey" in names:
+        names.append("Year")
+        columns.append(datekey_year(columns[names.index("DateKey")]))
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def insert_records(
+    conn, model_cls, records: List[Dict[str, Any]], chunk_size: int
+) -> int:
+    statement = model_cls.__table__.insert()
+    for start in range(0, len(records), chunk_size):
+        conn.execute(statement, records[start : start + chunk_size])
+    return len(records)
+
+
+def upsert_records(
+    conn, model_cls, records: List[Dict[str, Any]], chunk_size: int
+) -> Dict[str, Any]:
+    # Rows are matched on the table's primary key (InjuryID, ...). Audit
+    # timestamps don't count as a change, and CreatedAt is never overwritten.
+    table = model_cls.__table__
+    pk = list(table.primary_key.columns)[0]
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    changed_companies = set()
+    if not records:
+        return {**counts, "company_ids": changed_companies}
+
+    names = list(records[0])
+    compared = [n for n in names if n != pk.name and n.lower() not in _TIMESTAMP_COLUMNS]
+    assigned = [n for n in names if n != pk.name and n.lower() not in ("createdat", "created_at")]
+    update = (
+        table.update()
+        .where(pk == sqlalchemy.bindparam("_pk"))
+        .values({n: sqlalchemy.bindparam(f"_{n}") for n in assigned})
+    )
+    # The stored CompanyID is read too: a row that moves to another company
+    # changes the KPIs of the company it leaves as well.
+    owner = table.c.get("CompanyID")
+    lookup = [pk, owner if owner is not None else sqlalchemy.null()]
+    lookup += [table.c[n] for n in compared]
+
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start : start + chunk_size]
+        ids = [r[pk.name] for r in chunk]
+        existing = {}
+        for offset in range(0, len(ids), IN_CLAUSE_LIMIT):
+            rows = conn.execute(
+                sqlalchemy.select(*lookup).where(pk.in_(ids[offset : offset + IN_CLAUSE_LIMIT]))
+            )
+            existing.update((row[0], (row[1], tuple(row[2:]))) for row in rows)
+
+        inserts, updates = [], []
+        for record in chunk:
+            match = existing.get(record[pk.name])
+            if match is None:
+                inserts.append(record)
+            elif tuple(record[n] for n in compared) == match[1]:
+                counts["unchanged"] += 1
+                continue
+            else:
+                updates.append(
+                    {"_pk": record[pk.name], **{f"_{n}": record[n] for n in assigned}}
+                )
+                changed_companies.add(match[0])
+            changed_companies.add(record.get("CompanyID"))
+
+        if inserts:
+            conn.execute(table.insert(), inserts)
+        if updates:
+            conn.execute(update, updates)
+        counts["inserted"] += len(inserts)
+        counts["updated"] += len(updates)
+
+    changed_companies.discard(None)
+    return {**counts, "company_ids": changed_companies}
+
+
+def delete_missing_in_slices(conn, model_cls, slices, seen_ids) -> Tuple[int, set]:
+    # Rows in a (CompanyID, Year) slice the upload covered, but that the
+    # upload no longer contains, were removed at the source.
+    table = model_cls.__table__
+    pk = list(table.primary_key.columns)[0]
+    deleted = 0
+    companies = set()
+    for company_id, year in slices:
+        ids = conn.execute(
+            sqlalchemy.select(pk).where(
+                table.c.CompanyID == company_id, table.c.Year == year
+            )
+        ).scalars()
+        stale = [i for i in ids if i not in seen_ids]
+        for offset in range(0, len(stale), IN_CLAUSE_LIMIT):
+            conn.execute(table.delete().where(pk.in_(stale[offset : offset + IN_CLAUSE_LIMIT])))
+        if stale:
+            deleted += len(stale)
+            companies.add(company_id)
+    return deleted, companies
+
+
+def delete_fs1_rows(conn) -> None:
+    for table in FS1_TABLES:
+        conn.execute(table.__table__.delete())
+
+
+def clear_fs1_tables(bind=None) -> None:
+    with (bind or engine).begin() as conn:
+        delete_fs1_rows(conn)
+
+
+def open_workbook(source):
+    # read_only keeps openpyxl from building the whole cell tree in memory
+    return load_workbook(source, read_only=True, data_only=True)
+
+
+def _batch_frame(rows: List[tuple], columns: List[Any], offset: int) -> pd.DataFrame:
+    # Row labels continue across batches so issues can be reported by row.
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    df.index = pd.RangeIndex(offset, offset + len(df))
+    return df
+
+
+def _iter_worksheet_batches(worksheet, batch_size: int) -> Iterator[pd.DataFrame]:
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return
+    columns = [
+        f"Unnamed: {i}" if name is None else name for i, name in enumerate(header)
+    ]
+    width = len(columns)
+    batch: List[tuple] = []
+    offset = 0
+    yielded = False
+    for row in rows:
+        if all(value is None for value in row):
+            continue
+        batch.append(tuple(row[:width]) + (None,) * (width - len(row)))
+        if len(batch) >= batch_size:
+            yield _batch_frame(batch, columns, offset)
+            offset += len(batch)
+            yielded = True
+            batch = []
+    if batch or not yielded:
+        yield _batch_frame(batch, columns, offset)
+
+
+def iter_workbook_batches(
+    workbook, batch_size: Optional[int] = None
+) -> Iterator[Tuple[str, Iterator[pd.DataFrame]]]:
+    batch_size = batch_size or INGEST_CHUNK_SIZE
+    for worksheet in workbook.worksheets:
+        yield worksheet.title, _iter_worksheet_batches(worksheet, batch_size)
+
+
+def _model_for_header(header: Iterable[Any]) -> Tuple[Dict[str, str], Optional[Dict[str, Any]]]:
+    normalized = {raw: normalize_column_name(raw) for raw in header}
+    return normalized, match_sheet_model(normalized.values())
+
+
+def csv_dtypes(header: Iterable[Any]) -> Dict[str, Any]:
+    # Explicit dtypes spare the C parser its type inference pass. DateKey is
+    # left as text because its format varies between drops.
+    normalized, info = _model_for_header(header)
+    if info is None:
+        return {}
+    types = {
+        normalize_column_name(c.name): c.type for c in info["model"].__table__.columns
+    }
+    dtypes: Dict[str, Any] = {}
+    for raw, name in normalized.items():
+        col_type = types.get(name)
+        if col_type is None:
+            continue
+        if name == "datekey" or isinstance(col_type, (sqlalchemy.DateTime, sqlalchemy.String)):
+            dtypes[raw] = object
+        elif isinstance(col_type, sqlalchemy.Integer):
+            dtypes[raw] = "Int64"
+        elif isinstance(col_type, sqlalchemy.Float):
+            dtypes[raw] = "float64"
+    return dtypes
+
+
+def iter_csv_batches(open_source, batch_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    # open_source() is called twice: once for the header, once for the data.
+    batch_size = batch_size or INGEST_CHUNK_SIZE
+    with open_source() as f:
+        header = pd.read_csv(f, nrows=0, engine="c").columns
+    with open_source() as f:
+        reader = pd.read_csv(
+            f, engine="c", dtype=csv_dtypes(header), chunksize=batch_size
+        )
+        yielded = False
+        for df in reader:
+            yielded = True
+            yield df
+        if not yielded:
+            yield pd.DataFrame(columns=header)
+
+
+def iter_parquet_batches(source, batch_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    if pq is None:
+        raise RuntimeError("pyarrow is required to ingest Parquet files")
+    batch_size = batch_size or INGEST_CHUNK_SIZE
+    parquet = pq.ParquetFile(source)
+    names = parquet.schema_arrow.names
+    normalized, info = _model_for_header(names)
+    # Only the columns the matched model stores are decoded.
+    if info is not None:
+        wanted = {normalize_column_name(c.name) for c in info["model"].__table__.columns}
+        names = [raw for raw in names if normalized[raw] in wanted]
+    offset = 0
+    yielded = False
+    for batch in parquet.iter_batches(batch_size=batch_size, columns=names):
+        yielded = True
+        df = batch.to_pandas(integer_object_nulls=True)
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        offset += len(df)
+        yield df
+    if not yielded:
+        yield pd.DataFrame(columns=names)
+
+
+def iter_archive_batches(
+    archive: zipfile.ZipFile, batch_size: Optional[int] = None
+) -> Iterator[Tuple[str, Iterator[pd.DataFrame]]]:
+    # One member per FS1 table; the member name plays the role of the sheet name.
+    for member in archive.infolist():
+        name = os.path.basename(member.filename)
+        if member.is_dir() or name.startswith(".") or member.filename.startswith("__MACOSX"):
+            continue
+        stem, ext = os.path.splitext(name)
+        ext = ext.lower()
+        if ext == ".csv":
+            yield stem, iter_csv_batches(lambda m=member: archive.open(m), batch_size)
+        elif ext == ".parquet":
+            yield stem, iter_parquet_batches(archive.open(member), batch_size)
+        else:
+            # Reported back as a skipped sheet
+            yield stem, iter(())
+
+
+def ingest_sheet_batches(
+    sheets: Iterable[Tuple[str, Iterable[pd.DataFrame]]],
+    chunk_size: Optional[int] = None,
+    bind=None,
+    mode: str = "replace",
+    truncate: bool = False,
+) -> Dict[str, Any]:
+    # Each batch is inserted before the next one is pulled, so peak memory
+    # follows the batch size rather than the sheet size. The whole upload is
+    # one transaction: a batch that fails to parse or insert rolls back every
+    # earlier batch and, with truncate=True, the delete of the FS1 tables.
+    if mode not in INGEST_MODES:
+        raise ValueError(f"Unknown ingest mode: {mode}")
+    bind = bind or engine
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    incremental = mode == "incremental"
+    processed: List[str] = []
+    skipped: List[str] = []
+    company_id = None
+    company_ids = set()
+    changed_company_ids = set()
+    total_rows = 0
+    total_batches = 0
+    changes: Dict[str, Dict[str, int]] = {}
+    date_issues: List[Dict[str, Any]] = []
+    # model -> ((CompanyID, Year) slices, primary keys seen) for incremental mode
+    coverage: Dict[Any, Tuple[set, set]] = {}
+    started = time.perf_counter()
+
+    with bind.begin() as conn:
+        if truncate:
+            delete_fs1_rows(conn)
+        for sheet_name, batches in sheets:
+            print(f"Processing sheet: {sheet_name}")
+            matched_model = None
+            sheet_date_issues: Dict[str, Dict[str, list]] = {}
+            for df in batches:
+                df = normalize_columns(df)
+                if matched_model is None:
+                    if company_id is None and not df.empty and "companyid" in df.columns:
+                        company_id = int(df.iloc[0].get("companyid", 1))
+                    matched_model = match_sheet_model(df.columns)
+                    if not matched_model:
+                        break
+                    ModelClass = matched_model["model"]
+                    print(f"Matched '{sheet_name}' → {ModelClass.__name__}")
+
+                records = prepare_records(
+                    df, ModelClass, matched_model["required"], sheet_date_issues
+                )
+                company_ids.update(
+                    r["CompanyID"] for r in records if r.get("CompanyID") is not None
+                )
+                if incremental:
+                    outcome = upsert_records(conn, ModelClass, records, chunk_size)
+                    changed_company_ids.update(outcome.pop("company_ids"))
+                    table_changes = changes.setdefault(
+                        ModelClass.__tablename__,
+                        {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0},
+                    )
+                    for key, value in outcome.items():
+                        table_changes[key] += value
+                    slices, seen = coverage.setdefault(ModelClass, (set(), set()))
+                    pk_name = list(ModelClass.__table__.primary_key.columns)[0].name
+                    for r in records:
+                        slices.add((r.get("CompanyID"), r.get("Year")))
+                        seen.add(r[pk_name])
+                    total_rows += len(records)
+                else:
+                    total_rows += insert_records(conn, ModelClass, records, chunk_size)
+                total_batches += 1
+
+            if not matched_model:
+                print(f"No matching model found for sheet '{sheet_name}'")
+                skipped.append(sheet_name)
+                continue
+            processed.append(sheet_name)
+            for column, issues in sheet_date_issues.items():
+                date_issues.append(
+                    {
+                        "sheet": sheet_name,
+                        "column": column,
+                        "missing_count": len(issues["missing"]),
+                        "unparseable_count": len(issues["unparseable"]),
+                        "missing_rows": [
+                            int(i) for i in issues["missing"][:DATE_ISSUE_ROW_LIMIT]
+                        ],
+                        "unparseable_rows": [
+                            int(i) for i in issues["unparseable"][:DATE_ISSUE_ROW_LIMIT]
+                        ],
+                    }
+                )
+
+        for ModelClass, (slices, seen) in coverage.items():
+            deleted, companies = delete_missing_in_slices(conn, ModelClass, slices, seen)
+            changes[ModelClass.__tablename__]["deleted"] += deleted
+            changed_company_ids.update(companies)
+
+    elapsed = time.perf_counter() - started
+    result = {
+        "processed_sheets": processed,
+        "skipped_sheets": skipped,
+        "company_id": company_id,
+        "company_ids": sorted(company_ids),
+        "mode": mode,
+        "date_issues": date_issues,
+        "stats": {
+            "rows": total_rows,
+            "batches": total_batches,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(total_rows / elapsed, 1) if elapsed > 0 else 0.0,
+            "chunk_size": chunk_size,
+        },
+    }
+    if incremental:
+        totals = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+        for table_changes in changes.values():
+            for key, value in table_changes.items():
+                totals[key] += value
+        result["changes"] = {
+            **totals,
+            "by_table": changes,
+            "changed_company_ids": sorted(changed_company_ids),
+        }
+    return result
+
+
+def ingest_sheets(
+    sheets: Iterable[Tuple[str, pd.DataFrame]],
+    chunk_size: Optional[int] = None,
+    bind=None,
+    mode: str = "replace",
+    truncate: bool = False,
+) -> Dict[str, Any]:
+    return ingest_sheet_batches(
+        ((sheet_name, [df]) for sheet_name, df in sheets),
+        chunk_size=chunk_size,
+        bind=bind,
+        mode=mode,
+        truncate=truncate,
+    )
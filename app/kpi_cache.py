@@ -0,0 +1,109 @@
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+
+KPI_CACHE_MAX_ENTRIES = int(os.getenv("KPI_CACHE_MAX_ENTRIES", "256"))
+KPI_CACHE_TTL_SECONDS = float(os.getenv("KPI_CACHE_TTL_SECONDS", "900"))
+
+
+class KPICache:
+
+    def __init__(
+        self, max_entries=KPI_CACHE_MAX_ENTRIES, ttl_seconds=KPI_CACHE_TTL_SECONDS
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+        # Bumped per company by invalidate_company and for all by clear(), so a
+        # result computed across an upload is not stored over the new data.
+        self._generations = {}
+        self._epoch = 0
+
+    @staticmethod
+    def make_key(company_id, years=None, organizational_unit_ids=None, country_id=None):
+        return (
+            int(company_id),
+            tuple(sorted({int(y) for y in years})) if years else None,
+            tuple(sorted(set(organizational_unit_ids))) if organizational_unit_ids else None,
+            country_id or None,
+        )
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers get their own copy so they can't mutate the cached payload
+        return copy.deepcopy(value)
+
+    def generation(self, company_id):
+        # Read before computing a miss and pass to set()
+        with self._lock:
+            return self._epoch, self._generations.get(int(company_id), 0)
+
+    def set(self, key, value, generation=None):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != (
+                self._epoch,
+                self._generations.get(key[0], 0),
+            ):
+                self.stale_writes += 1
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_company(self, company_id):
+        company_id = int(company_id)
+        with self._lock:
+            self._generations[company_id] = self._generations.get(company_id, 0) + 1
+            stale = [key for key in self._entries if key[0] == company_id]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale_writes": self.stale_writes,
+            }
+
+
+kpi_cache = KPICache()
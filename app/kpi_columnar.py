@@ -0,0 +1,292 @@
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict
+
+import numpy as np
+from app.database import SessionLocal
+from app.kpi_processor import (
+    FACT_TABLES,
+    KPI_DEFINITIONS,
+    KPI_USE_ROLLUPS,
+    _filter_facts,
+    _org_unit_names,
+    build_kpi_payloads,
+    kpi_processor,
+)
+
+KPI_COLUMNAR_MAX_COMPANIES = int(os.getenv("KPI_COLUMNAR_MAX_COMPANIES", "64"))
+# Engine behind the interactive KPI routes: "sql" (KPIProcessor) or "columnar"
+KPI_ENGINE = os.getenv("KPI_ENGINE", "sql")
+KPI_ENGINES = ("sql", "columnar")
+
+# table key -> (measure column, has GenderID)
+_MEASURES = {
+    "workforce": ("EmployeeCount", True),
+    "turnover": ("EmployeesDeparted", False),
+    "training": ("TotalTrainingHours", False),
+    "injuries": ("InjuryCount", False),
+    "diversity": ("DisabilityCount", False),
+}
+# Base aggregate -> fact table it is computed from
+_AGGREGATE_TABLES = {
+    "workforce": "workforce",
+    "departed": "turnover",
+    "training_hours": "training",
+    "injuries": "injuries",
+    "disabilities": "diversity",
+}
+# Stands in for NULL keys in the int32 arrays
+_NULL = -1
+
+
+def _int32(values) -> np.ndarray:
+    return np.array([_NULL if v is None else v for v in values], dtype=np.int32)
+
+
+class CompanyFacts:
+    """Columnar copy of one company's live FS1 facts."""
+
+    def __init__(self, columns: Dict[str, Dict[str, np.ndarray]], org_unit_names):
+        self.columns = columns
+        self.org_unit_names = org_unit_names
+        self.nbytes = sum(a.nbytes for table in columns.values() for a in table.values())
+
+    def mask(self, key, years=None, organizational_unit_ids=None, country_id=None):
+        table = self.columns[key]
+        mask = np.ones(len(table["measure"]), dtype=bool)
+        if organizational_unit_ids:
+            mask &= np.isin(table["ou"], np.asarray(organizational_unit_ids, dtype=np.int32))
+        if years:
+            mask &= np.isin(table["year"], np.asarray([int(y) for y in years], dtype=np.int32))
+        if country_id:
+            mask &= table["country"] == country_id
+        return mask
+
+
+def _total(measure: np.ndarray, integer: bool):
+    # SQL SUM() over no rows is NULL; fsum keeps float totals exact.
+    if not len(measure):
+        return None
+    return int(measure.sum()) if integer else math.fsum(measure.tolist())
+
+
+class ColumnarKPIProcessor:
+    """Answers the KPIProcessor interface from per-company NumPy arrays."""
+
+    def __init__(self, session_factory=None, max_companies: int = KPI_COLUMNAR_MAX_COMPANIES):
+        self.session_factory = session_factory
+        self.max_companies = max_companies
+        self._companies: "OrderedDict[Any, CompanyFacts]" = OrderedDict()
+        # Bumped by invalidate_company (per company) and clear() (epoch)
+        self._generations: Dict[Any, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def _load(self, company_id) -> CompanyFacts:
+        session_factory = self.session_factory or SessionLocal
+        columns: Dict[str, Dict[str, np.ndarray]] = {}
+        with session_factory() as db:
+            for key, model in FACT_TABLES.items():
+                measure, has_gender = _MEASURES[key]
+                selected = [model.OrganizationalUnitID, model.Year, model.CountryID]
+                if has_gender:
+                    selected.append(model.GenderID)
+                selected.append(getattr(model, measure))
+                # Company and live org unit filters applied once, at load time
+                rows = _filter_facts(db.query(*selected), model, company_id).all()
+                # SQL SUM skips NULL measures, and a group left with no rows
+                # sums to None, as SUM over only NULLs does.
+                rows = [row for row in rows if row[-1] is not None]
+                values = list(zip(*rows)) if rows else [()] * len(selected)
+                table = {
+                    "ou": _int32(values[0]),
+                    "year": _int32(values[1]),
+                    "country": _int32(values[2]),
+                    "measure": np.array(values[-1], dtype=np.float64),
+                }
+                if has_gender:
+                    table["gender"] = _int32(values[3])
+                columns[key] = table
+            org_unit_names = _org_unit_names(db, company_id)
+        return CompanyFacts(columns, org_unit_names)
+
+    def company_facts(self, company_id, use_cache: bool = True) -> CompanyFacts:
+        if not use_cache:
+            return self._load(company_id)
+        with self._lock:
+            facts = self._companies.get(company_id)
+            if facts is not None:
+                self._companies.move_to_end(company_id)
+                return facts
+            generation = (self._epoch, self._generations.get(company_id, 0))
+        facts = self._load(company_id)
+        with self._lock:
+            # An upload that invalidated the company during the load wins
+            if (self._epoch, self._generations.get(company_id, 0)) == generation:
+                self._companies[company_id] = facts
+                while len(self._companies) > self.max_companies:
+                    self._companies.popitem(last=False)
+        return facts
+
+    def invalidate_company(self, company_id) -> None:
+        with self._lock:
+            self._generations[company_id] = self._generations.get(company_id, 0) + 1
+            self._companies.pop(company_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._companies.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "companies": len(self._companies),
+                "bytes": sum(f.nbytes for f in self._companies.values()),
+            }
+
+    def fetch_base_aggregates(
+        self,
+        company_id,
+        years=None,
+        organizational_unit_ids=None,
+        country_id=None,
+        aggregates=tuple(_AGGREGATE_TABLES),
+        use_cache=True,
+    ) -> Dict[str, Any]:
+        # Only the requested base aggregates are computed
+        facts = self.company_facts(company_id, use_cache)
+        filters = (years, organizational_unit_ids, country_id)
+        result: Dict[str, Any] = {"org_unit_names": dict(facts.org_unit_names)}
+
+        if "workforce" in aggregates:
+            workforce = facts.columns["workforce"]
+            mask = facts.mask("workforce", *filters)
+            pairs = np.stack([workforce["ou"][mask], workforce["gender"][mask]], axis=1)
+            groups, inverse = np.unique(pairs, axis=0, return_inverse=True)
+            sums = np.bincount(
+                inverse.ravel(), weights=workforce["measure"][mask], minlength=len(groups)
+            )
+            result["workforce"] = [
+                (
+                    None if ou == _NULL else int(ou),
+                    None if gender == _NULL else int(gender),
+                    int(total),
+                )
+                for (ou, gender), total in zip(groups.tolist(), sums.tolist())
+            ]
+
+        if "departed" in aggregates:
+            turnover = facts.columns["turnover"]
+            mask = facts.mask("turnover", *filters)
+            units, inverse = np.unique(turnover["ou"][mask], return_inverse=True)
+            departed = np.bincount(
+                inverse.ravel(), weights=turnover["measure"][mask], minlength=len(units)
+            )
+            result["departed"] = {
+                int(ou): int(total)
+                for ou, total in zip(units.tolist(), departed.tolist())
+                if ou != _NULL
+            }
+
+        for name in ("training_hours", "injuries", "disabilities"):
+            if name in aggregates:
+                key = _AGGREGATE_TABLES[name]
+                result[name] = _total(
+                    facts.columns[key]["measure"][facts.mask(key, *filters)],
+                    integer=key != "training",
+                )
+        return result
+
+    def get_all_kpi_data(
+        self,
+        company_id,
+        years=None,
+        organizational_unit_ids=None,
+        country_id=None,
+        fused=True,
+        use_cache=True,
+        use_rollups=KPI_USE_ROLLUPS,
+    ) -> Dict[str, Any]:
+        # Same signature as KPIProcessor.get_all_kpi_data. Every KPI comes
+        # from the in-memory facts, so fused and use_rollups change nothing;
+        # use_cache=False reads the company's facts afresh without keeping them.
+        return build_kpi_payloads(
+            self.fetch_base_aggregates(
+                company_id, years, organizational_unit_ids, country_id, use_cache=use_cache
+            )
+        )
+
+    def _kpi(self, name, company_id, years, organizational_unit_ids, country_id):
+        aggregates = self.fetch_base_aggregates(
+            company_id, years, organizational_unit_ids, country_id, KPI_DEFINITIONS[name][1]
+        )
+        return build_kpi_payloads(aggregates, [name])[name]
+
+    def get_total_workforce_by_gender(
+        self, company_id, years=None, organizational_unit_ids=None, country_id=None
+    ):
+        return self._kpi(
+            "Total Workforce by Gender", company_id, years, organizational_unit_ids, country_id
+        )
+
+    def get_percentage_employees_with_disabilities(
+        self, company_id, years=None, organizational_unit_ids=None, country_id=None
+    ):
+        return self._kpi(
+            "Percentage of Employees with Disabilities",
+            company_id, years, organizational_unit_ids, country_id,
+        )
+
+    def get_employee_turnover_rate(
+        self, company_id, years=None, organizational_unit_ids=None, country_id=None
+    ):
+        return self._kpi(
+            "Employee Turnover Rate", company_id, years, organizational_unit_ids, country_id
+        )
+
+    def get_average_training_hours_per_employee(
+        self, company_id, years=None, organizational_unit_ids=None, country_id=None
+    ):
+        return self._kpi(
+            "Average Training Hours per Employee",
+            company_id, years, organizational_unit_ids, country_id,
+        )
+
+    def get_workplace_injury_rate(
+        self, company_id, years=None, organizational_unit_ids=None, country_id=None
+    ):
+        return self._kpi(
+            "Workplace Injury Rate", company_id, years, organizational_unit_ids, country_id
+        )
+
+    def get_workforce_by_gender_by_org_unit(
+        self, company_id, years=None, organizational_unit_ids=None, country_id=None
+    ):
+        return self._kpi(
+            "Workforce by Gender by Organizational Unit",
+            company_id, years, organizational_unit_ids, country_id,
+        )
+
+    def get_employee_turnover_rate_by_org_unit(
+        self, company_id, years=None, organizational_unit_ids=None, country_id=None
+    ):
+        return self._kpi(
+            "Employee Turnover Rate by Organizational Unit",
+            company_id, years, organizational_unit_ids, country_id,
+        )
+
+
+columnar_kpi_processor = ColumnarKPIProcessor()
+
+
+def get_kpi_engine(name=None):
+    # KPIProcessor or ColumnarKPIProcessor; both answer the same methods
+    name = name or KPI_ENGINE
+    if name == "columnar":
+        return columnar_kpi_processor
+    if name == "sql":
+        return kpi_processor
+    raise ValueError(f"Unknown KPI engine {name!r}; expected one of {KPI_ENGINES}")
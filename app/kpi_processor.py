@@ -1,6 +1,9 @@
+import os
+from collections import defaultdict
 from sqlalchemy.orm import Session
-from sqlalchemy import func, String
+from sqlalchemy import func
 from app.database import SessionLocal
+from app.kpi_cache import kpi_cache
 from app.models import (
     FS1_WorkforceComposition,
     FS1_WorkforceDiversity,
@@ -8,798 +11,819 @@ from app.models import (
     FS1_EmployeeTraining,
     FS1_WorkplaceInjuries,
     D_OrganizationalUnit,
+    R_Diversity,
+    R_Injuries,
+    R_Training,
+    R_Turnover,
+    R_RollupStatus,
+    R_Workforce,
 )
+from app.rollups import rollups_fresh
+
+KPI_USE_ROLLUPS = os.getenv("KPI_USE_ROLLUPS", "1") != "0"
+# Companies per grouped scan in the batch path; keeps the CompanyID IN (...)
+# list under SQLite's bound parameter limit.
+KPI_BATCH_SIZE = int(os.getenv("KPI_BATCH_SIZE", "500"))
+
+# Table sets fetch_base_aggregates can read from. Rollups keep every column
+# the KPI filters use (company, year, org unit, country), so any filter set
+# the processor accepts can be answered from them.
+FACT_TABLES = {
+    "workforce": FS1_WorkforceComposition,
+    "turnover": FS1_EmployeeTurnover,
+    "training": FS1_EmployeeTraining,
+    "injuries": FS1_WorkplaceInjuries,
+    "diversity": FS1_WorkforceDiversity,
+}
+ROLLUP_TABLES = {
+    "workforce": R_Workforce,
+    "turnover": R_Turnover,
+    "training": R_Training,
+    "injuries": R_Injuries,
+    "diversity": R_Diversity,
+}
+
+GENDER_MAPPING = {
+    1: "Male",
+    2: "Female",
+    3: "Non-binary",
+    4: "Transgender",
+    5: "Other",
+}
+
+
+def _filter_facts(
+    query, model, company_id, years=None, organizational_unit_ids=None, country_id=None
+):
+    return _filter_fact_slice(
+        query.filter(model.CompanyID == company_id),
+        model,
+        years,
+        organizational_unit_ids,
+        country_id,
+    )
+
+
+def _filter_fact_slice(
+    query, model, years=None, organizational_unit_ids=None, country_id=None
+):
+    # Org unit, year and country filters shared by the single-company and
+    # batch queries; the caller adds the company predicate.
+    query = query.join(
+        D_OrganizationalUnit,
+        model.OrganizationalUnitID == D_OrganizationalUnit.OrganizationalUnitID,
+    ).filter(D_OrganizationalUnit.is_deleted == 0)
+    if organizational_unit_ids:
+        query = query.filter(model.OrganizationalUnitID.in_(organizational_unit_ids))
+    if years:
+        query = query.filter(model.Year.in_([int(y) for y in years]))
+    if country_id:
+        query = query.filter(model.CountryID == country_id)
+    return query
+
+
+def _present_org_unit_ids(
+    db: Session,
+    model,
+    company_id,
+    years=None,
+    organizational_unit_ids=None,
+    country_id=None,
+):
+    # Org units present in the fact table for the given filters
+    query = db.query(model.OrganizationalUnitID).filter(model.CompanyID == company_id)
+    if organizational_unit_ids:
+        query = query.filter(model.OrganizationalUnitID.in_(organizational_unit_ids))
+    if years:
+        query = query.filter(model.Year.in_([int(y) for y in years]))
+    if country_id:
+        query = query.filter(model.CountryID == country_id)
+    return {row[0] for row in query.distinct().all() if row[0] is not None}
+
+
+def _org_unit_names(db: Session, company_id, org_unit_ids=None):
+    query = db.query(
+        D_OrganizationalUnit.OrganizationalUnitID,
+        D_OrganizationalUnit.OrganizationalUnitName,
+    ).filter(
+        D_OrganizationalUnit.CompanyID == company_id,
+        D_OrganizationalUnit.is_deleted == 0,
+    )
+    if org_unit_ids is not None:
+        query = query.filter(D_OrganizationalUnit.OrganizationalUnitID.in_(org_unit_ids))
+    query = query.order_by(D_OrganizationalUnit.OrganizationalUnitID)
+    return {row[0]: row[1] for row in query.all()}
+
+
+def _org_unit_names_by_company(db: Session, company_ids):
+    names = {company_id: {} for company_id in company_ids}
+    query = (
+        db.query(
+            D_OrganizationalUnit.CompanyID,
+            D_OrganizationalUnit.OrganizationalUnitID,
+            D_OrganizationalUnit.OrganizationalUnitName,
+        )
+        .filter(
+            D_OrganizationalUnit.CompanyID.in_(company_ids),
+            D_OrganizationalUnit.is_deleted == 0,
+        )
+        .order_by(D_OrganizationalUnit.OrganizationalUnitID)
+    )
+    for company_id, ou_id, name in query.all():
+        names[company_id][ou_id] = name
+    return names
+
+
+# ---- Payload builders ----
+# Shared by the per-KPI queries and the fused path so both produce identical
+# output from the same base aggregates.
+
+
+def _workforce_by_gender_payload(gender_rows):
+    return [
+        {
+            "gender": GENDER_MAPPING.get(gender_id, "Unknown"),
+            "employee_count": int(total),
+        }
+        for gender_id, total in gender_rows
+    ]
+
+
+def _disabilities_payload(total_employees, total_disabilities, gender_rows):
+    total_employees = int(total_employees or 0)
+    total_disabilities = int(total_disabilities or 0)
+    overall_percentage = (
+        (total_disabilities / total_employees * 100) if total_employees > 0 else 0.0
+    )
+
+    gender_breakdown = []
+    allocated_disabilities = 0
+    for i, (gender_id, total) in enumerate(gender_rows):
+        gender_total = int(total)
+        if i == len(gender_rows) - 1:
+            gender_disabilities = total_disabilities - allocated_disabilities
+        else:
+            gender_disabilities = (
+                int(round((gender_total / total_employees) * total_disabilities))
+                if total_employees > 0
+                else 0
+            )
+            allocated_disabilities += gender_disabilities
+
+        gender_percentage = (
+            (gender_disabilities / total_disabilities * 100)
+            if total_disabilities > 0
+            else 0.0
+        )
+        gender_breakdown.append(
+            {
+                "gender": GENDER_MAPPING.get(gender_id, "Unknown"),
+                "total_employees": gender_total,
+                "employees_with_disabilities": gender_disabilities,
+                "percentage": round(gender_percentage, 2),
+            }
+        )
+
+    return {
+        "overall_percentage": round(overall_percentage, 2),
+        "total_employees": total_employees,
+        "total_employees_with_disabilities": total_disabilities,
+        "breakdown_by_gender": gender_breakdown,
+    }
+
+
+def _turnover_payload(total_employees, total_employees_departed):
+    total_employees = float(total_employees or 0)
+    total_employees_departed = float(total_employees_departed or 0)
+    turnover_rate = (
+        (total_employees_departed / total_employees * 100)
+        if total_employees > 0
+        else 0.0
+    )
+    return {
+        "overall_turnover_rate": round(turnover_rate, 2),
+        "total_employees": int(total_employees),
+        "total_employees_departed": int(total_employees_departed),
+    }
+
+
+def _training_payload(total_employees, total_training_hours, gender_rows):
+    total_employees = float(total_employees or 0)
+    total_training_hours = float(total_training_hours or 0.0)
+    overall_average = (
+        (total_training_hours / total_employees) if total_employees > 0 else 0.0
+    )
+
+    gender_breakdown = []
+    for gender_id, total in gender_rows:
+        gender_total = float(total)
+        gender_training_hours = (
+            round((gender_total / total_employees) * total_training_hours, 2)
+            if total_employees > 0
+            else 0.0
+        )
+        gender_average = (
+            (gender_training_hours / gender_total) if gender_total > 0 else 0.0
+        )
+        gender_breakdown.append(
+            {
+                "gender": GENDER_MAPPING.get(gender_id, "Unknown"),
+                "total_employees": int(gender_total),
+                "total_training_hours": gender_training_hours,
+                "average_hours_per_employee": round(gender_average, 2),
+            }
+        )
+
+    return {
+        "overall_average_hours": round(overall_average, 2),
+        "total_employees": int(total_employees),
+        "total_training_hours": total_training_hours,
+        "breakdown_by_gender": gender_breakdown,
+    }
+
+
+def _injury_payload(total_employees, total_injuries):
+    total_employees = float(total_employees or 0)
+    total_injuries = float(total_injuries or 0)
+    injury_rate = (total_injuries / total_employees) if total_employees > 0 else 0.0
+    return {
+        "overall_injury_rate": round(injury_rate, 4),
+        "total_employees": int(total_employees),
+        "total_injuries": int(total_injuries),
+    }
+
+
+def _workforce_by_org_unit_payload(org_unit_names, org_unit_gender_rows):
+    # Organize results, ensure all org units are present
+    grouped = {
+        ou_id: {
+            "OrganizationalUnitID": ou_id,
+            "OrganizationalUnitName": org_unit_names.get(ou_id, ""),
+            "genders": [],
+        }
+        for ou_id in org_unit_names
+    }
+
+    for ou_id, gender_id, employee_count in org_unit_gender_rows:
+        if ou_id not in grouped:
+            continue
+        grouped[ou_id]["genders"].append(
+            {
+                "gender": GENDER_MAPPING.get(gender_id, "Unknown"),
+                "employee_count": int(employee_count),
+            }
+        )
+
+    # Fill missing genders with zero counts for each org unit
+    for ou in grouped.values():
+        present_genders = {g["gender"] for g in ou["genders"]}
+        for gid, gname in GENDER_MAPPING.items():
+            if gname not in present_genders:
+                ou["genders"].append({"gender": gname, "employee_count": 0})
+        ou["genders"].sort(key=lambda x: x["gender"])
+
+    return list(grouped.values())
+
+
+def _turnover_by_org_unit_payload(org_unit_names, workforce_map, departed_map):
+    results = []
+    for ou_id in org_unit_names:
+        total_employees = int(workforce_map.get(ou_id, 0))
+        total_departed = int(departed_map.get(ou_id, 0))
+        turnover_rate = (
+            (total_departed / total_employees * 100) if total_employees > 0 else 0.0
+        )
+        results.append(
+            {
+                "OrganizationalUnitID": ou_id,
+                "OrganizationalUnitName": org_unit_names.get(ou_id, ""),
+                "total_employees": total_employees,
+                "total_employees_departed": total_departed,
+                "turnover_rate": round(turnover_rate, 2),
+            }
+        )
+    return results
+
+
+# KPI name -> (KPIProcessor method, base aggregates its payload reads)
+KPI_DEFINITIONS = {
+    "Total Workforce by Gender": ("get_total_workforce_by_gender", ("workforce",)),
+    "Percentage of Employees with Disabilities": (
+        "get_percentage_employees_with_disabilities",
+        ("workforce", "disabilities"),
+    ),
+    "Employee Turnover Rate": ("get_employee_turnover_rate", ("workforce", "departed")),
+    "Average Training Hours per Employee": (
+        "get_average_training_hours_per_employee",
+        ("workforce", "training_hours"),
+    ),
+    "Workplace Injury Rate": ("get_workplace_injury_rate", ("workforce", "injuries")),
+    "Workforce by Gender by Organizational Unit": (
+        "get_workforce_by_gender_by_org_unit",
+        ("workforce",),
+    ),
+    "Employee Turnover Rate by Organizational Unit": (
+        "get_employee_turnover_rate_by_org_unit",
+        ("workforce", "departed"),
+    ),
+}
+
+
+def build_kpi_payloads(aggregates, names=None):
+    # Derives the KPI payloads in memory from the fused base aggregates: all
+    # seven, or only `names`, in which case `aggregates` only needs what
+    # KPI_DEFINITIONS lists for them.
+    by_gender = defaultdict(int)
+    workforce_by_ou = defaultdict(int)
+    for ou_id, gender_id, count in aggregates["workforce"]:
+        by_gender[gender_id] += int(count)
+        workforce_by_ou[ou_id] += int(count)
+    gender_rows = sorted(by_gender.items())
+    total_employees = sum(by_gender.values())
+
+    departed_by_ou = aggregates.get("departed", {})
+    org_unit_names = aggregates["org_unit_names"]
+
+    builders = {
+        "Total Workforce by Gender": lambda: _workforce_by_gender_payload(gender_rows),
+        "Percentage of Employees with Disabilities": lambda: _disabilities_payload(
+            total_employees, aggregates["disabilities"], gender_rows
+        ),
+        "Employee Turnover Rate": lambda: _turnover_payload(
+            total_employees, sum(departed_by_ou.values())
+        ),
+        "Average Training Hours per Employee": lambda: _training_payload(
+            total_employees, aggregates["training_hours"], gender_rows
+        ),
+        "Workplace Injury Rate": lambda: _injury_payload(
+            total_employees, aggregates["injuries"]
+        ),
+        "Workforce by Gender by Organizational Unit": lambda: _workforce_by_org_unit_payload(
+            {ou_id: name for ou_id, name in org_unit_names.items() if ou_id in workforce_by_ou},
+            aggregates["workforce"],
+        ),
+        "Employee Turnover Rate by Organizational Unit": lambda: _turnover_by_org_unit_payload(
+            {ou_id: name for ou_id, name in org_unit_names.items() if ou_id in departed_by_ou},
+            workforce_by_ou,
+            departed_by_ou,
+        ),
+    }
+    return {name: builders[name]() for name in (names or builders)}
 
 
 class KPIProcessor:
 
+    def _gender_rows(self, db, company_id, years, organizational_unit_ids, country_id):
+        gender_query = _filter_facts(
+            db.query(
+                FS1_WorkforceComposition.GenderID,
+                func.sum(FS1_WorkforceComposition.EmployeeCount).label("total_count"),
+            ),
+            FS1_WorkforceComposition,
+            company_id,
+            years,
+            organizational_unit_ids,
+            country_id,
+        ).group_by(FS1_WorkforceComposition.GenderID)
+        return [(row.GenderID, row.total_count) for row in gender_query.all()]
+
+    def _total_employees(
+        self, db, company_id, years, organizational_unit_ids, country_id
+    ):
+        return _filter_facts(
+            db.query(
+                func.sum(FS1_WorkforceComposition.EmployeeCount).label(
+                    "total_employees"
+                )
+            ),
+            FS1_WorkforceComposition,
+            company_id,
+            years,
+            organizational_unit_ids,
+            country_id,
+        ).scalar()
+
     def get_total_workforce_by_gender(
         self, company_id, years=None, organizational_unit_ids=None, country_id=None
     ):
         with SessionLocal() as db:
-            gender_query = (
-                db.query(
-                    FS1_WorkforceComposition.GenderID,
-                    func.sum(FS1_WorkforceComposition.EmployeeCount).label(
-                        "total_count"
-                    ),
-                )
-                .join(
-                    D_OrganizationalUnit,
-                    FS1_WorkforceComposition.OrganizationalUnitID
-                    == D_OrganizationalUnit.OrganizationalUnitID,
-                )
-                .filter(
-                    FS1_WorkforceComposition.CompanyID == company_id,
-                    D_OrganizationalUnit.is_deleted == 0,
+            return _workforce_by_gender_payload(
+                self._gender_rows(
+                    db, company_id, years, organizational_unit_ids, country_id
                 )
             )
 
-            if organizational_unit_ids:
-                gender_query = gender_query.filter(
-                    FS1_WorkforceComposition.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                gender_query = gender_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceComposition.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                gender_query = gender_query.filter(
-                    FS1_WorkforceComposition.CountryID == country_id
-                )
-
-            gender_query = gender_query.group_by(FS1_WorkforceComposition.GenderID)
-            gender_data = gender_query.all()
-
-            gender_mapping = {
-                1: "Male",
-                2: "Female",
-                3: "Non-binary",
-                4: "Transgender",
-                5: "Other",
-            }
-            return [
-                {
-                    "gender": gender_mapping.get(row.GenderID, "Unknown"),
-                    "employee_count": int(row.total_count),
-                }
-                for row in gender_data
-            ]
-
     def get_percentage_employees_with_disabilities(
         self, company_id, years=None, organizational_unit_ids=None, country_id=None
     ):
         with SessionLocal() as db:
-            # Total Employees
-            emp_query = (
-                db.query(
-                    func.sum(FS1_WorkforceComposition.EmployeeCount).label(
-                        "total_employees"
-                    )
-                )
-                .join(
-                    D_OrganizationalUnit,
-                    FS1_WorkforceComposition.OrganizationalUnitID
-                    == D_OrganizationalUnit.OrganizationalUnitID,
-                )
-                .filter(
-                    FS1_WorkforceComposition.CompanyID == company_id,
-                    D_OrganizationalUnit.is_deleted == 0,
-                )
+            total_employees = self._total_employees(
+                db, company_id, years, organizational_unit_ids, country_id
             )
-
-            if organizational_unit_ids:
-                emp_query = emp_query.filter(
-                    FS1_WorkforceComposition.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                emp_query = emp_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceComposition.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                emp_query = emp_query.filter(
-                    FS1_WorkforceComposition.CountryID == country_id
-                )
-
-            total_employees = int(emp_query.scalar() or 0)
-
-            # Total Disabilities
-            disability_query = (
+            total_disabilities = _filter_facts(
                 db.query(
                     func.sum(FS1_WorkforceDiversity.DisabilityCount).label(
                         "total_disabilities"
                     )
-                )
-                .join(
-                    D_OrganizationalUnit,
-                    FS1_WorkforceDiversity.OrganizationalUnitID
-                    == D_OrganizationalUnit.OrganizationalUnitID,
-                )
-                .filter(
-                    FS1_WorkforceDiversity.CompanyID == company_id,
-                    D_OrganizationalUnit.is_deleted == 0,
-                )
+                ),
+                FS1_WorkforceDiversity,
+                company_id,
+                years,
+                organizational_unit_ids,
+                country_id,
+            ).scalar()
+            gender_rows = self._gender_rows(
+                db, company_id, years, organizational_unit_ids, country_id
             )
-            if organizational_unit_ids:
-                disability_query = disability_query.filter(
-                    FS1_WorkforceDiversity.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                disability_query = disability_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceDiversity.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                disability_query = disability_query.filter(
-                    FS1_WorkforceDiversity.CountryID == country_id
-                )
-
-            total_disabilities = int(disability_query.scalar() or 0)
-            overall_percentage = (
-                (total_disabilities / total_employees * 100)
-                if total_employees > 0
-                else 0.0
-            )
-
-            # Gender Breakdown
-            gender_query = (
-                db.query(
-                    FS1_WorkforceComposition.GenderID,
-                    func.sum(FS1_WorkforceComposition.EmployeeCount).label(
-                        "total_count"
-                    ),
-                )
-                .join(
-                    D_OrganizationalUnit,
-                    FS1_WorkforceComposition.OrganizationalUnitID
-                    == D_OrganizationalUnit.OrganizationalUnitID,
-                )
-                .filter(
-                    FS1_WorkforceComposition.CompanyID == company_id,
-                    D_OrganizationalUnit.is_deleted == 0,
-                )
+            return _disabilities_payload(
+                total_employees, total_disabilities, gender_rows
             )
 
-            if organizational_unit_ids:
-                gender_query = gender_query.filter(
-                    FS1_WorkforceComposition.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                gender_query = gender_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceComposition.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                gender_query = gender_query.filter(
-                    FS1_WorkforceComposition.CountryID == country_id
-                )
-
-            gender_query = gender_query.group_by(FS1_WorkforceComposition.GenderID)
-            gender_data = gender_query.all()
-
-            gender_mapping = {
-                1: "Male",
-                2: "Female",
-                3: "Non-binary",
-                4: "Transgender",
-                5: "Other",
-            }
-            gender_breakdown = []
-
-            allocated_disabilities = 0
-            for i, row in enumerate(gender_data):
-                gender_total = int(row.total_count)
-                if i == len(gender_data) - 1:
-                    gender_disabilities = total_disabilities - allocated_disabilities
-                else:
-                    gender_disabilities = (
-                        int(
-                            round((gender_total / total_employees) * total_disabilities)
-                        )
-                        if total_employees > 0
-                        else 0
-                    )
-                    allocated_disabilities += gender_disabilities
-
-                gender_percentage = (
-                    (gender_disabilities / total_disabilities * 100)
-                    if total_disabilities > 0
-                    else 0.0
-                )
-                gender_breakdown.append(
-                    {
-                        "gender": gender_mapping.get(row.GenderID, "Unknown"),
-                        "total_employees": gender_total,
-                        "employees_with_disabilities": gender_disabilities,
-                        "percentage": round(gender_percentage, 2),
-                    }
-                )
-
-            return {
-                "overall_percentage": round(overall_percentage, 2),
-                "total_employees": total_employees,
-                "total_employees_with_disabilities": total_disabilities,
-                "breakdown_by_gender": gender_breakdown,
-            }
-
     def get_employee_turnover_rate(
         self, company_id, years=None, organizational_unit_ids=None, country_id=None
     ):
         with SessionLocal() as db:
-            # --- Total Employees Departed ---
-            departed_query = db.query(
-                func.sum(FS1_EmployeeTurnover.EmployeesDeparted).label(
-                    "total_employees_departed"
-                )
-            )
-            departed_query = departed_query.join(
-                D_OrganizationalUnit,
-                FS1_EmployeeTurnover.OrganizationalUnitID
-                == D_OrganizationalUnit.OrganizationalUnitID,
-            ).filter(
-                FS1_EmployeeTurnover.CompanyID == company_id,
-                D_OrganizationalUnit.is_deleted == 0,
-            )
-            if organizational_unit_ids:
-                departed_query = departed_query.filter(
-                    FS1_EmployeeTurnover.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                departed_query = departed_query.filter(
-                    func.substring(
-                        func.cast(FS1_EmployeeTurnover.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                departed_query = departed_query.filter(
-                    FS1_EmployeeTurnover.CountryID == country_id
-                )
-            total_employees_departed = departed_query.scalar() or 0
-            total_employees_departed = float(total_employees_departed)
-
-            # --- Total Employees ---
-            emp_query = db.query(
-                func.sum(FS1_WorkforceComposition.EmployeeCount).label(
-                    "total_employees"
-                )
-            )
-            emp_query = emp_query.join(
-                D_OrganizationalUnit,
-                FS1_WorkforceComposition.OrganizationalUnitID
-                == D_OrganizationalUnit.OrganizationalUnitID,
-            ).filter(
-                FS1_WorkforceComposition.CompanyID == company_id,
-                D_OrganizationalUnit.is_deleted == 0,
-            )
-            if organizational_unit_ids:
-                emp_query = emp_query.filter(
-                    FS1_WorkforceComposition.OrganizationalUnitID.in_(
-                        organizational_unit_ids
+            total_employees_departed = _filter_facts(
+                db.query(
+                    func.sum(FS1_EmployeeTurnover.EmployeesDeparted).label(
+                        "total_employees_departed"
                     )
-                )
-            if years:
-                emp_query = emp_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceComposition.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                emp_query = emp_query.filter(
-                    FS1_WorkforceComposition.CountryID == country_id
-                )
-            total_employees = emp_query.scalar() or 0
-            total_employees = float(total_employees)
-
-            # --- Calculate Turnover Rate ---
-            turnover_rate = (
-                (total_employees_departed / total_employees * 100)
-                if total_employees > 0
-                else 0.0
+                ),
+                FS1_EmployeeTurnover,
+                company_id,
+                years,
+                organizational_unit_ids,
+                country_id,
+            ).scalar()
+            total_employees = self._total_employees(
+                db, company_id, years, organizational_unit_ids, country_id
             )
-
-            return {
-                "overall_turnover_rate": round(turnover_rate, 2),
-                "total_employees": int(total_employees),
-                "total_employees_departed": int(total_employees_departed),
-            }
+            return _turnover_payload(total_employees, total_employees_departed)
 
     def get_average_training_hours_per_employee(
         self, company_id, years=None, organizational_unit_ids=None, country_id=None
     ):
         with SessionLocal() as db:
-            # --- Total Training Hours ---
-            training_query = db.query(
-                func.sum(FS1_EmployeeTraining.TotalTrainingHours).label(
-                    "total_training_hours"
-                )
-            )
-            training_query = training_query.join(
-                D_OrganizationalUnit,
-                FS1_EmployeeTraining.OrganizationalUnitID
-                == D_OrganizationalUnit.OrganizationalUnitID,
-            ).filter(
-                FS1_EmployeeTraining.CompanyID == company_id,
-                D_OrganizationalUnit.is_deleted == 0,
-            )
-            if organizational_unit_ids:
-                training_query = training_query.filter(
-                    FS1_EmployeeTraining.OrganizationalUnitID.in_(
-                        organizational_unit_ids
+            total_training_hours = _filter_facts(
+                db.query(
+                    func.sum(FS1_EmployeeTraining.TotalTrainingHours).label(
+                        "total_training_hours"
                     )
-                )
-            if years:
-                training_query = training_query.filter(
-                    func.substring(
-                        func.cast(FS1_EmployeeTraining.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                training_query = training_query.filter(
-                    FS1_EmployeeTraining.CountryID == country_id
-                )
-            total_training_hours = training_query.scalar() or 0.0
-            total_training_hours = float(total_training_hours)
-
-            # --- Total Employees ---
-            emp_query = db.query(
-                func.sum(FS1_WorkforceComposition.EmployeeCount).label(
-                    "total_employees"
-                )
+                ),
+                FS1_EmployeeTraining,
+                company_id,
+                years,
+                organizational_unit_ids,
+                country_id,
+            ).scalar()
+            total_employees = self._total_employees(
+                db, company_id, years, organizational_unit_ids, country_id
             )
-            emp_query = emp_query.join(
-                D_OrganizationalUnit,
-                FS1_WorkforceComposition.OrganizationalUnitID
-                == D_OrganizationalUnit.OrganizationalUnitID,
-            ).filter(
-                FS1_WorkforceComposition.CompanyID == company_id,
-                D_OrganizationalUnit.is_deleted == 0,
+            gender_rows = self._gender_rows(
+                db, company_id, years, organizational_unit_ids, country_id
             )
-            if organizational_unit_ids:
-                emp_query = emp_query.filter(
-                    FS1_WorkforceComposition.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                emp_query = emp_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceComposition.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                emp_query = emp_query.filter(
-                    FS1_WorkforceComposition.CountryID == country_id
-                )
-            total_employees = emp_query.scalar() or 0
-            total_employees = float(total_employees)
-
-            overall_average = (
-                (total_training_hours / total_employees) if total_employees > 0 else 0.0
-            )
-
-            # --- Gender Breakdown ---
-            gender_query = (
-                db.query(
-                    FS1_WorkforceComposition.GenderID,
-                    func.sum(FS1_WorkforceComposition.EmployeeCount).label(
-                        "total_count"
-                    ),
-                )
-                .join(
-                    D_OrganizationalUnit,
-                    FS1_WorkforceComposition.OrganizationalUnitID
-                    == D_OrganizationalUnit.OrganizationalUnitID,
-                )
-                .filter(
-                    FS1_WorkforceComposition.CompanyID == company_id,
-                    D_OrganizationalUnit.is_deleted == 0,
-                )
+            return _training_payload(
+                total_employees, total_training_hours, gender_rows
             )
-            if organizational_unit_ids:
-                gender_query = gender_query.filter(
-                    FS1_WorkforceComposition.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                gender_query = gender_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceComposition.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                gender_query = gender_query.filter(
-                    FS1_WorkforceComposition.CountryID == country_id
-                )
-            gender_query = gender_query.group_by(FS1_WorkforceComposition.GenderID)
-            gender_data = gender_query.all()
-
-            gender_mapping = {
-                1: "Male",
-                2: "Female",
-                3: "Non-binary",
-                4: "Transgender",
-                5: "Other",
-            }
-            gender_breakdown = []
-            for row in gender_data:
-                gender_total = float(row.total_count)
-                gender_training_hours = (
-                    round((gender_total / total_employees) * total_training_hours, 2)
-                    if total_employees > 0
-                    else 0.0
-                )
-                gender_average = (
-                    (gender_training_hours / gender_total) if gender_total > 0 else 0.0
-                )
-                gender_breakdown.append(
-                    {
-                        "gender": gender_mapping.get(row.GenderID, "Unknown"),
-                        "total_employees": int(gender_total),
-                        "total_training_hours": gender_training_hours,
-                        "average_hours_per_employee": round(gender_average, 2),
-                    }
-                )
-
-            return {
-                "overall_average_hours": round(overall_average, 2),
-                "total_employees": int(total_employees),
-                "total_training_hours": total_training_hours,
-                "breakdown_by_gender": gender_breakdown,
-            }
 
     def get_workplace_injury_rate(
         self, company_id, years=None, organizational_unit_ids=None, country_id=None
     ):
         with SessionLocal() as db:
-            # --- Total Employees ---
-            emp_query = db.query(
-                func.sum(FS1_WorkforceComposition.EmployeeCount).label(
-                    "total_employees"
-                )
-            )
-            emp_query = emp_query.join(
-                D_OrganizationalUnit,
-                FS1_WorkforceComposition.OrganizationalUnitID
-                == D_OrganizationalUnit.OrganizationalUnitID,
-            ).filter(
-                FS1_WorkforceComposition.CompanyID == company_id,
-                D_OrganizationalUnit.is_deleted == 0,
-            )
-            if organizational_unit_ids:
-                emp_query = emp_query.filter(
-                    FS1_WorkforceComposition.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                emp_query = emp_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceComposition.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                emp_query = emp_query.filter(
-                    FS1_WorkforceComposition.CountryID == country_id
-                )
-            total_employees = emp_query.scalar() or 0
-            total_employees = float(total_employees)
-
-            # --- Total Injuries ---
-            injury_query = db.query(
-                func.sum(FS1_WorkplaceInjuries.InjuryCount).label("total_injuries")
-            )
-            injury_query = injury_query.join(
-                D_OrganizationalUnit,
-                FS1_WorkplaceInjuries.OrganizationalUnitID
-                == D_OrganizationalUnit.OrganizationalUnitID,
-            ).filter(
-                FS1_WorkplaceInjuries.CompanyID == company_id,
-                D_OrganizationalUnit.is_deleted == 0,
-            )
-            if organizational_unit_ids:
-                injury_query = injury_query.filter(
-                    FS1_WorkplaceInjuries.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                injury_query = injury_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkplaceInjuries.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                injury_query = injury_query.filter(
-                    FS1_WorkplaceInjuries.CountryID == country_id
-                )
-            total_injuries = injury_query.scalar() or 0
-            total_injuries = float(total_injuries)
-
-            injury_rate = (
-                (total_injuries / total_employees) if total_employees > 0 else 0.0
+            total_employees = self._total_employees(
+                db, company_id, years, organizational_unit_ids, country_id
             )
-
-            return {
-                "overall_injury_rate": round(injury_rate, 4),
-                "total_employees": int(total_employees),
-                "total_injuries": int(total_injuries),
-            }
+            total_injuries = _filter_facts(
+                db.query(
+                    func.sum(FS1_WorkplaceInjuries.InjuryCount).label("total_injuries")
+                ),
+                FS1_WorkplaceInjuries,
+                company_id,
+                years,
+                organizational_unit_ids,
+                country_id,
+            ).scalar()
+            return _injury_payload(total_employees, total_injuries)
 
     def get_workforce_by_gender_by_org_unit(
         self, company_id, years=None, organizational_unit_ids=None, country_id=None
     ):
         with SessionLocal() as db:
-            # Get only org units present in FS1_WorkforceComposition for the given filters
-            org_unit_query = db.query(
-                FS1_WorkforceComposition.OrganizationalUnitID
-            ).filter(FS1_WorkforceComposition.CompanyID == company_id)
-            if organizational_unit_ids:
-                org_unit_query = org_unit_query.filter(
-                    FS1_WorkforceComposition.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                org_unit_query = org_unit_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceComposition.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                org_unit_query = org_unit_query.filter(
-                    FS1_WorkforceComposition.CountryID == country_id
-                )
-            org_unit_ids = {row[0] for row in org_unit_query.distinct().all()}
-
-            # Get org unit names for those present in FS1_WorkforceComposition
-            org_units = (
-                db.query(D_OrganizationalUnit)
-                .filter(
-                    D_OrganizationalUnit.CompanyID == company_id,
-                    D_OrganizationalUnit.is_deleted == 0,
-                    D_OrganizationalUnit.OrganizationalUnitID.in_(org_unit_ids),
-                )
-                .all()
+            org_unit_ids = _present_org_unit_ids(
+                db,
+                FS1_WorkforceComposition,
+                company_id,
+                years,
+                organizational_unit_ids,
+                country_id,
             )
-            org_unit_names = {
-                u.OrganizationalUnitID: u.OrganizationalUnitName for u in org_units
-            }
+            if not org_unit_ids:
+                return []
+            org_unit_names = _org_unit_names(db, company_id, org_unit_ids)
 
-            # Query actual data from FS1_WorkforceComposition
-            workforce_query = (
+            workforce_query = _filter_facts(
                 db.query(
                     FS1_WorkforceComposition.OrganizationalUnitID,
                     FS1_WorkforceComposition.GenderID,
                     func.sum(FS1_WorkforceComposition.EmployeeCount).label(
                         "employee_count"
                     ),
-                )
-                .join(
-                    D_OrganizationalUnit,
-                    FS1_WorkforceComposition.OrganizationalUnitID
-                    == D_OrganizationalUnit.OrganizationalUnitID,
-                )
-                .filter(
-                    FS1_WorkforceComposition.CompanyID == company_id,
-                    D_OrganizationalUnit.is_deleted == 0,
-                    FS1_WorkforceComposition.OrganizationalUnitID.in_(org_unit_ids),
-                )
-            )
-            if years:
-                workforce_query = workforce_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceComposition.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                workforce_query = workforce_query.filter(
-                    FS1_WorkforceComposition.CountryID == country_id
-                )
-
-            workforce_query = workforce_query.group_by(
+                ),
+                FS1_WorkforceComposition,
+                company_id,
+                years,
+                list(org_unit_ids),
+                country_id,
+            ).group_by(
                 FS1_WorkforceComposition.OrganizationalUnitID,
                 FS1_WorkforceComposition.GenderID,
             )
-            results = workforce_query.all()
-
-            gender_mapping = {
-                1: "Male",
-                2: "Female",
-                3: "Non-binary",
-                4: "Transgender",
-                5: "Other",
-            }
-
-            # Organize results, ensure all org units are present
-            grouped = {
-                ou_id: {
-                    "OrganizationalUnitID": ou_id,
-                    "OrganizationalUnitName": org_unit_names.get(ou_id, ""),
-                    "genders": [],
-                }
-                for ou_id in org_unit_names
-            }
-
-            for row in results:
-                ou_id = row.OrganizationalUnitID
-                grouped[ou_id]["genders"].append(
-                    {
-                        "gender": gender_mapping.get(row.GenderID, "Unknown"),
-                        "employee_count": int(row.employee_count),
-                    }
-                )
-
-            # Fill missing genders with zero counts for each org unit
-            for ou in grouped.values():
-                present_genders = {g["gender"] for g in ou["genders"]}
-                for gid, gname in gender_mapping.items():
-                    if gname not in present_genders:
-                        ou["genders"].append({"gender": gname, "employee_count": 0})
-                ou["genders"].sort(key=lambda x: x["gender"])
-
-            return list(grouped.values())
+            rows = [
+                (row.OrganizationalUnitID, row.GenderID, row.employee_count)
+                for row in workforce_query.all()
+            ]
+            return _workforce_by_org_unit_payload(org_unit_names, rows)
 
     def get_employee_turnover_rate_by_org_unit(
         self, company_id, years=None, organizational_unit_ids=None, country_id=None
     ):
         with SessionLocal() as db:
-            # Get only org units present in FS1_EmployeeTurnover for the given filters
-            org_unit_query = db.query(FS1_EmployeeTurnover.OrganizationalUnitID).filter(
-                FS1_EmployeeTurnover.CompanyID == company_id
+            org_unit_ids = _present_org_unit_ids(
+                db,
+                FS1_EmployeeTurnover,
+                company_id,
+                years,
+                organizational_unit_ids,
+                country_id,
             )
-            if organizational_unit_ids:
-                org_unit_query = org_unit_query.filter(
-                    FS1_EmployeeTurnover.OrganizationalUnitID.in_(
-                        organizational_unit_ids
-                    )
-                )
-            if years:
-                org_unit_query = org_unit_query.filter(
-                    func.substring(
-                        func.cast(FS1_EmployeeTurnover.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                org_unit_query = org_unit_query.filter(
-                    FS1_EmployeeTurnover.CountryID == country_id
-                )
-            org_unit_ids = {
-                row[0] for row in org_unit_query.distinct().all() if row[0] is not None
-            }
+            if not org_unit_ids:
+                return []
+            org_unit_names = _org_unit_names(db, company_id, org_unit_ids)
 
-            # Get org unit names for those present in FS1_EmployeeTurnover
-            org_units = (
-                db.query(D_OrganizationalUnit)
-                .filter(
-                    D_OrganizationalUnit.CompanyID == company_id,
-                    D_OrganizationalUnit.is_deleted == 0,
-                    D_OrganizationalUnit.OrganizationalUnitID.in_(org_unit_ids),
-                )
-                .all()
-            )
-            org_unit_names = {
-                u.OrganizationalUnitID: u.OrganizationalUnitName for u in org_units
-            }
-
-            # Query departed employees from FS1_EmployeeTurnover
-            departed_query = (
+            departed_query = _filter_facts(
                 db.query(
                     FS1_EmployeeTurnover.OrganizationalUnitID,
                     func.sum(FS1_EmployeeTurnover.EmployeesDeparted).label(
                         "total_departed"
                     ),
-                )
-                .join(
-                    D_OrganizationalUnit,
-                    FS1_EmployeeTurnover.OrganizationalUnitID
-                    == D_OrganizationalUnit.OrganizationalUnitID,
-                )
-                .filter(
-                    FS1_EmployeeTurnover.CompanyID == company_id,
-                    D_OrganizationalUnit.is_deleted == 0,
-                    FS1_EmployeeTurnover.OrganizationalUnitID.in_(org_unit_ids),
-                )
-            )
-            if years:
-                departed_query = departed_query.filter(
-                    func.substring(
-                        func.cast(FS1_EmployeeTurnover.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                departed_query = departed_query.filter(
-                    FS1_EmployeeTurnover.CountryID == country_id
-                )
-            departed_query = departed_query.group_by(
-                FS1_EmployeeTurnover.OrganizationalUnitID
-            )
-            departed_counts = departed_query.all()
-
-            # Query total employees from FS1_WorkforceComposition
-            workforce_query = (
+                ),
+                FS1_EmployeeTurnover,
+                company_id,
+                years,
+                list(org_unit_ids),
+                country_id,
+            ).group_by(FS1_EmployeeTurnover.OrganizationalUnitID)
+
+            workforce_query = _filter_facts(
                 db.query(
                     FS1_WorkforceComposition.OrganizationalUnitID,
                     func.sum(FS1_WorkforceComposition.EmployeeCount).label(
                         "total_employees"
                     ),
-                )
-                .join(
-                    D_OrganizationalUnit,
-                    FS1_WorkforceComposition.OrganizationalUnitID
-                    == D_OrganizationalUnit.OrganizationalUnitID,
-                )
-                .filter(
-                    FS1_WorkforceComposition.CompanyID == company_id,
-                    D_OrganizationalUnit.is_deleted == 0,
-                    FS1_WorkforceComposition.OrganizationalUnitID.in_(org_unit_ids),
-                )
-            )
-            if years:
-                workforce_query = workforce_query.filter(
-                    func.substring(
-                        func.cast(FS1_WorkforceComposition.DateKey, String), 1, 4
-                    ).in_([str(y) for y in years])
-                )
-            if country_id:
-                workforce_query = workforce_query.filter(
-                    FS1_WorkforceComposition.CountryID == country_id
-                )
-            workforce_query = workforce_query.group_by(
-                FS1_WorkforceComposition.OrganizationalUnitID
-            )
-            workforce_counts = workforce_query.all()
+                ),
+                FS1_WorkforceComposition,
+                company_id,
+                years,
+                list(org_unit_ids),
+                country_id,
+            ).group_by(FS1_WorkforceComposition.OrganizationalUnitID)
 
             # Merge results, ensure all org units are present
             workforce_map = {
                 row.OrganizationalUnitID: int(row.total_employees)
-                for row in workforce_counts
+                for row in workforce_query.all()
             }
             departed_map = {
                 row.OrganizationalUnitID: int(row.total_departed)
-                for row in departed_counts
+                for row in departed_query.all()
             }
+            return _turnover_by_org_unit_payload(
+                org_unit_names, workforce_map, departed_map
+            )
 
-            results = []
-            for ou_id in org_unit_names:
-                total_employees = workforce_map.get(ou_id, 0)
-                total_departed = departed_map.get(ou_id, 0)
-                turnover_rate = (
-                    (total_departed / total_employees * 100)
-                    if total_employees > 0
-                    else 0.0
-                )
-                results.append(
-                    {
-                        "OrganizationalUnitID": ou_id,
-                        "OrganizationalUnitName": org_unit_names.get(ou_id, ""),
-                        "total_employees": total_employees,
-                        "total_employees_departed": total_departed,
-                        "turnover_rate": round(turnover_rate, 2),
-                    }
-                )
+    def fetch_base_aggregates(
+        self,
+        db,
+        company_id,
+        years=None,
+        organizational_unit_ids=None,
+        country_id=None,
+        tables=FACT_TABLES,
+    ):
+        filters = (company_id, years, organizational_unit_ids, country_id)
+        composition = tables["workforce"]
+        turnover = tables["turnover"]
+        training = tables["training"]
+        injuries_table = tables["injuries"]
+        diversity = tables["diversity"]
+
+        # Workforce by (org unit, gender): gender totals, org unit totals and
+        # the overall headcount are all derived from this one grouped scan.
+        workforce = _filter_facts(
+            db.query(
+                composition.OrganizationalUnitID,
+                composition.GenderID,
+                func.sum(composition.EmployeeCount),
+            ),
+            composition,
+            *filters,
+        ).group_by(
+            composition.OrganizationalUnitID,
+            composition.GenderID,
+        )
+
+        departed = _filter_facts(
+            db.query(
+                turnover.OrganizationalUnitID,
+                func.sum(turnover.EmployeesDeparted),
+            ),
+            turnover,
+            *filters,
+        ).group_by(turnover.OrganizationalUnitID)
+
+        # Training hours, injuries and disabilities in a single round trip
+        training_hours = _filter_facts(
+            db.query(func.sum(training.TotalTrainingHours)),
+            training,
+            *filters,
+        ).scalar_subquery()
+        injuries = _filter_facts(
+            db.query(func.sum(injuries_table.InjuryCount)),
+            injuries_table,
+            *filters,
+        ).scalar_subquery()
+        disabilities = _filter_facts(
+            db.query(func.sum(diversity.DisabilityCount)),
+            diversity,
+            *filters,
+        ).scalar_subquery()
+        totals = db.query(training_hours, injuries, disabilities).one()
+
+        return {
+            "workforce": [tuple(row) for row in workforce.all()],
+            "departed": {
+                ou_id: int(total)
+                for ou_id, total in departed.all()
+                if ou_id is not None
+            },
+            "training_hours": totals[0],
+            "injuries": totals[1],
+            "disabilities": totals[2],
+            "org_unit_names": _org_unit_names(db, company_id),
+        }
 
-            return results
+    def _grouped_base_aggregates(self, db, group_by, scope, slice_filters, tables):
+        # fetch_base_aggregates with one extra grouping column (CompanyID or
+        # Year): one scan per query serves every group. `scope` maps a table
+        # to its WHERE predicate. Org unit names are left to the caller.
+        aggregates = defaultdict(
+            lambda: {
+                "workforce": [],
+                "departed": {},
+                "training_hours": None,
+                "injuries": None,
+                "disabilities": None,
+            }
+        )
+        composition = tables["workforce"]
+        turnover = tables["turnover"]
+
+        group = getattr(composition, group_by)
+        workforce = _filter_fact_slice(
+            db.query(
+                group,
+                composition.OrganizationalUnitID,
+                composition.GenderID,
+                func.sum(composition.EmployeeCount),
+            ).filter(scope(composition)),
+            composition,
+            *slice_filters,
+        ).group_by(group, composition.OrganizationalUnitID, composition.GenderID)
+        for key, ou_id, gender_id, total in workforce.all():
+            aggregates[key]["workforce"].append((ou_id, gender_id, total))
+
+        group = getattr(turnover, group_by)
+        departed = _filter_fact_slice(
+            db.query(
+                group,
+                turnover.OrganizationalUnitID,
+                func.sum(turnover.EmployeesDeparted),
+            ).filter(scope(turnover)),
+            turnover,
+            *slice_filters,
+        ).group_by(group, turnover.OrganizationalUnitID)
+        for key, ou_id, total in departed.all():
+            if ou_id is not None:
+                aggregates[key]["departed"][ou_id] = int(total)
+
+        for name, table, measure in (
+            ("training_hours", tables["training"], "TotalTrainingHours"),
+            ("injuries", tables["injuries"], "InjuryCount"),
+            ("disabilities", tables["diversity"], "DisabilityCount"),
+        ):
+            group = getattr(table, group_by)
+            totals = _filter_fact_slice(
+                db.query(group, func.sum(getattr(table, measure))).filter(scope(table)),
+                table,
+                *slice_filters,
+            ).group_by(group)
+            for key, total in totals.all():
+                aggregates[key][name] = total
+
+        return aggregates
+
+    def fetch_base_aggregates_batch(
+        self,
+        db,
+        company_ids,
+        years=None,
+        organizational_unit_ids=None,
+        country_id=None,
+        tables=FACT_TABLES,
+    ):
+        # Same aggregates as fetch_base_aggregates, for many companies at once
+        grouped = self._grouped_base_aggregates(
+            db,
+            "CompanyID",
+            lambda model: model.CompanyID.in_(company_ids),
+            (years, organizational_unit_ids, country_id),
+            tables,
+        )
+        names = _org_unit_names_by_company(db, company_ids)
+        aggregates = {}
+        for company_id in company_ids:
+            aggregates[company_id] = grouped[company_id]
+            aggregates[company_id]["org_unit_names"] = names[company_id]
+        return aggregates
+
+    def fetch_base_aggregates_by_year(
+        self,
+        db,
+        company_id,
+        years=None,
+        organizational_unit_ids=None,
+        country_id=None,
+        tables=FACT_TABLES,
+    ):
+        # {year: base aggregates} for one company. Rows without a Year (an
+        # unparseable DateKey) belong to no year and are left out.
+        grouped = self._grouped_base_aggregates(
+            db,
+            "Year",
+            lambda model: model.CompanyID == company_id,
+            (years, organizational_unit_ids, country_id),
+            tables,
+        )
+        names = _org_unit_names(db, company_id)
+        # Requested years with no rows still get an (empty) entry
+        year_keys = {y for y in grouped if y is not None} | {int(y) for y in years or ()}
+        aggregates = {}
+        for year in sorted(year_keys):
+            aggregates[year] = grouped[year]
+            aggregates[year]["org_unit_names"] = dict(names)
+        return aggregates
 
     def get_all_kpi_data(
-        self, company_id, years=None, organizational_unit_ids=None, country_id=None
+        self,
+        company_id,
+        years=None,
+        organizational_unit_ids=None,
+        country_id=None,
+        fused=True,
+        use_cache=True,
+        use_rollups=KPI_USE_ROLLUPS,
     ):
+        if use_cache:
+            key = kpi_cache.make_key(
+                company_id, years, organizational_unit_ids, country_id
+            )
+            cached = kpi_cache.get(key)
+            if cached is not None:
+                return cached
+            generation = kpi_cache.generation(company_id)
+            result = self.get_all_kpi_data(
+                company_id,
+                years,
+                organizational_unit_ids,
+                country_id,
+                fused=fused,
+                use_cache=False,
+                use_rollups=use_rollups,
+            )
+            kpi_cache.set(key, result, generation)
+            return result
+
+        if fused:
+            # One session, four queries, all seven payloads derived in memory
+            with SessionLocal() as db:
+                tables = FACT_TABLES
+                if use_rollups and rollups_fresh(db, company_id):
+                    tables = ROLLUP_TABLES
+                aggregates = self.fetch_base_aggregates(
+                    db, company_id, years, organizational_unit_ids, country_id, tables
+                )
+            return build_kpi_payloads(aggregates)
+
         return {
             "Total Workforce by Gender": self.get_total_workforce_by_gender(
                 company_id, years, organizational_unit_ids, country_id
@@ -825,4 +849,106 @@ class KPIProcessor:
         }
 
 
+    def get_all_kpi_data_batch(
+        self,
+        company_ids,
+        years=None,
+        organizational_unit_ids=None,
+        country_id=None,
+        use_cache=True,
+        use_rollups=KPI_USE_ROLLUPS,
+    ):
+        # {company_id: get_all_kpi_data(company_id, ...)} in a handful of
+        # grouped scans per KPI_BATCH_SIZE companies.
+        company_ids = list(dict.fromkeys(int(c) for c in company_ids))
+        results = {}
+        pending = []
+        generations = {}
+        for company_id in company_ids:
+            cached = None
+            if use_cache:
+                generations[company_id] = kpi_cache.generation(company_id)
+                cached = kpi_cache.get(
+                    kpi_cache.make_key(
+                        company_id, years, organizational_unit_ids, country_id
+                    )
+                )
+            if cached is not None:
+                results[company_id] = cached
+            else:
+                pending.append(company_id)
+
+        with SessionLocal() as db:
+            for offset in range(0, len(pending), KPI_BATCH_SIZE):
+                chunk = pending[offset : offset + KPI_BATCH_SIZE]
+                fresh = set()
+                if use_rollups:
+                    fresh = {
+                        row[0]
+                        for row in db.query(R_RollupStatus.CompanyID)
+                        .filter(R_RollupStatus.CompanyID.in_(chunk))
+                        .all()
+                    }
+                # Companies with current rollups read those; the rest the facts
+                for tables, group in (
+                    (ROLLUP_TABLES, [c for c in chunk if c in fresh]),
+                    (FACT_TABLES, [c for c in chunk if c not in fresh]),
+                ):
+                    if not group:
+                        continue
+                    aggregates = self.fetch_base_aggregates_batch(
+                        db, group, years, organizational_unit_ids, country_id, tables
+                    )
+                    for company_id, company_aggregates in aggregates.items():
+                        result = build_kpi_payloads(company_aggregates)
+                        if use_cache:
+                            kpi_cache.set(
+                                kpi_cache.make_key(
+                                    company_id, years, organizational_unit_ids, country_id
+                                ),
+                                result,
+                                generations[company_id],
+                            )
+                        results[company_id] = result
+
+        return {company_id: results[company_id] for company_id in company_ids}
+
+
+    def get_kpi_time_series(
+        self,
+        company_id,
+        years=None,
+        organizational_unit_ids=None,
+        country_id=None,
+        use_rollups=KPI_USE_ROLLUPS,
+    ):
+        # {year: get_all_kpi_data(company_id, [year], ...)} for every requested
+        # year (all years on file when None), from one year-grouped scan.
+        with SessionLocal() as db:
+            tables = FACT_TABLES
+            if use_rollups and rollups_fresh(db, company_id):
+                tables = ROLLUP_TABLES
+            aggregates = self.fetch_base_aggregates_by_year(
+                db, company_id, years, organizational_unit_ids, country_id, tables
+            )
+        return {
+            year: build_kpi_payloads(year_aggregates)
+            for year, year_aggregates in aggregates.items()
+        }
+
+
+def report_kpi_inputs(series, year=None):
+    # Current and prior-year payloads from a time series, shaped as the
+    # kpi_data / historical_kpi_data arguments of generate_management_report.
+    if not series:
+        return {"year": None, "kpi_data": {}, "historical_kpi_data": None}
+    year = max(series) if year is None else int(year)
+    prior = [y for y in series if y < year]
+    return {
+        "year": year,
+        "kpi_data": series.get(year, {}),
+        "historical_kpi_data": series[max(prior)] if prior else None,
+    }
+
+
 kpi_processor = KPIProcessor()
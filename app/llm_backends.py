@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+# "openai" talks to the provider; "local" swaps in LocalCompletionClient so
+# reports and benchmarks run offline with realistic, reproducible timings.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_BACKENDS = ("openai", "local")
+
+LLM_LOCAL_LATENCY_MS = float(os.getenv("LLM_LOCAL_LATENCY_MS", "800"))
+LLM_LOCAL_LATENCY_JITTER_MS = float(os.getenv("LLM_LOCAL_LATENCY_JITTER_MS", "400"))
+LLM_LOCAL_DISTRIBUTION = os.getenv("LLM_LOCAL_DISTRIBUTION", "lognormal")
+LLM_LOCAL_FAILURE_RATE = float(os.getenv("LLM_LOCAL_FAILURE_RATE", "0"))
+LLM_LOCAL_SEED = os.getenv("LLM_LOCAL_SEED", "0")
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+
+class LocalBackendError(Exception):
+    """Injected provider failure; status codes the gateway treats as retryable."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Local backend injected HTTP {status_code}")
+        self.status_code = status_code
+
+
+class LocalCompletionClient:
+    """Offline stand-in for AsyncOpenAI's chat completions.
+
+    Replies are derived from the prompt; latency follows `distribution` around
+    `latency_ms` (spread `jitter_ms`) and `failure_rate` of calls raise 429/503.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = LLM_LOCAL_LATENCY_MS,
+        jitter_ms: float = LLM_LOCAL_LATENCY_JITTER_MS,
+        distribution: str = LLM_LOCAL_DISTRIBUTION,
+        failure_rate: float = LLM_LOCAL_FAILURE_RATE,
+        seed: Optional[int] = int(LLM_LOCAL_SEED) if LLM_LOCAL_SEED else None,
+        chunk_words: int = 4,
+    ):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown latency distribution {distribution!r}; "
+                f"expected one of {LATENCY_DISTRIBUTIONS}"
+            )
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.distribution = distribution
+        self.failure_rate = failure_rate
+        self.chunk_words = chunk_words
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _draw(self):
+        # (latency seconds, injected status code or None)
+        with self._lock:
+            self.calls += 1
+            if self.distribution == "fixed":
+                ms = self.latency_ms
+            elif self.distribution == "uniform":
+                ms = self._rng.uniform(
+                    self.latency_ms - self.jitter_ms, self.latency_ms + self.jitter_ms
+                )
+            elif self.distribution == "normal":
+                ms = self._rng.gauss(self.latency_ms, self.jitter_ms)
+            else:
+                # Long right tail, parameterised by its mean and std deviation
+                mean = max(self.latency_ms, 1e-3)
+                sigma2 = math.log(1 + (self.jitter_ms / mean) ** 2)
+                mu = math.log(mean) - sigma2 / 2
+                ms = self._rng.lognormvariate(mu, sigma2**0.5)
+            failure = None
+            if self._rng.random() < self.failure_rate:
+                self.failures += 1
+                failure = self._rng.choice((429, 503))
+        return max(ms, 0.0) / 1000, failure
+
+    @staticmethod
+    def _reply(messages: List[Dict[str, str]], response_format=None) -> str:
+        prompt = messages[-1]["content"] if messages else ""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        schema = ((response_format or {}).get("json_schema") or {}).get("schema")
+        if schema:
+            return json.dumps(
+                {
+                    name: f"Local narrative for {name.replace('_', ' ')} ({digest})."
+                    for name in schema.get("properties", {})
+                }
+            )
+        return (
+            "This section summarises the reported ESRS S1 indicators and the "
+            f"trends observed for the period (local backend, prompt {digest})."
+        )
+
+    async def _create(self, *, messages, stream: bool = False, response_format=None, **kwargs):
+        latency, failure = self._draw()
+        content = self._reply(messages, response_format)
+        if not stream:
+            await asyncio.sleep(latency)
+            if failure:
+                raise LocalBackendError(failure)
+            message = SimpleNamespace(content=content)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        # Streaming: time to first chunk is a third of the latency, the rest is
+        # spread over the chunks.
+        await asyncio.sleep(latency / 3)
+        if failure:
+            raise LocalBackendError(failure)
+        return self._stream(content, latency * 2 / 3)
+
+    async def _stream(self, content: str, duration: float):
+        words = content.split(" ")
+        chunks = [
+            " ".join(words[i : i + self.chunk_words])
+            for i in range(0, len(words), self.chunk_words)
+        ]
+        for i, text in enumerate(chunks):
+            if i:
+                await asyncio.sleep(duration / len(chunks))
+            delta = SimpleNamespace(content=text if i == len(chunks) - 1 else text + " ")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"calls": self.calls, "failures": self.failures}
+
+
+def create_llm_client(
+    backend: Optional[str] = None,
+    *,
+    timeout: float = 30.0,
+    max_connections: int = 20,
+):
+    backend = backend or LLM_BACKEND
+    if backend == "local":
+        return LocalCompletionClient()
+    if backend == "openai":
+        return AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            timeout=timeout,
+            # Retries belong to the gateway, so they share its deadline and counters
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+                timeout=timeout,
+            ),
+        )
+    raise ValueError(f"Unknown LLM backend {backend!r}; expected one of {LLM_BACKENDS}")
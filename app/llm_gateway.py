@@ -0,0 +1,356 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import openai
+from openai import AsyncOpenAI
+
+from app.llm_backends import create_llm_client
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+# Upper bound on one completion including every retry and backoff
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "90"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+# Process-wide: in-flight completions across every report, job and event loop
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Token bucket for request starts; 0 disables rate shaping
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "5"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+LATENCY_WINDOW = 512
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, RETRYABLE_ERRORS):
+        return True
+    return getattr(exc, "status_code", None) in RETRYABLE_STATUS_CODES
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    # Honour the provider's Retry-After on 429/503 responses
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    # Full jitter: uniform in [0, min(max, base * 2^attempt)]
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2**attempt))
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers reserve a token and sleep off the debt."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        # Seconds to wait before the reserved request may start
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class ConcurrencyLimiter:
+    """A semaphore shared by every event loop in the process."""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.active < self.limit:
+                self.active += 1
+                return
+            waiter = loop.create_future()
+            self._waiters.append((loop, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, waiter))
+                except ValueError:
+                    pass
+            # The slot may have been handed over just before cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self.active -= 1
+                return
+            # Hand the slot straight to the next waiter, on its own loop
+            loop, waiter = self._waiters.popleft()
+        try:
+            loop.call_soon_threadsafe(self._grant, waiter)
+        except RuntimeError:
+            # Waiter's loop already closed
+            self.release()
+
+    def _grant(self, waiter) -> None:
+        if waiter.done():
+            self.release()
+        else:
+            waiter.set_result(None)
+
+
+class _SectionStats:
+
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.rate_limited = 0
+        self.prompt_tokens = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def as_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4)
+
+        return {
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "rate_limited": self.rate_limited,
+            "prompt_tokens_avg": round(self.prompt_tokens / self.calls) if self.calls else None,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_max": round(latencies[-1], 4) if latencies else None,
+        }
+
+
+class LLMGateway:
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        rate_per_second: float = LLM_RATE_PER_SECOND,
+        burst: int = LLM_RATE_BURST,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        deadline: float = LLM_DEADLINE_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+    ):
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.limiter = ConcurrencyLimiter(max_concurrency)
+        self.bucket = TokenBucket(rate_per_second, burst)
+        # httpx pools are bound to the loop that opened them, so the shared
+        # client (see app/llm_backends.py) is per event loop: the request
+        # loop and each report job worker's long-lived loop.
+        self._clients = weakref.WeakKeyDictionary()
+        self._stats = defaultdict(_SectionStats)
+        self._lock = threading.Lock()
+
+    def client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = create_llm_client(
+                    timeout=self.timeout, max_connections=LLM_MAX_CONNECTIONS
+                )
+                self._clients[loop] = client
+        return client
+
+    async def aclose(self) -> None:
+        # Closes the running loop's client and its connection pool; call it
+        # before that loop is closed.
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        close = getattr(client, "close", None)
+        if close is not None:
+            await close()
+
+    def _record(self, section: str, **counts) -> None:
+        with self._lock:
+            stats = self._stats[section]
+            for name, value in counts.items():
+                if name == "latency":
+                    stats.latencies.append(value)
+                else:
+                    setattr(stats, name, getattr(stats, name) + value)
+
+    async def _acquire(self) -> None:
+        delay = self.bucket.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+        await self.limiter.acquire()
+
+    def _retry_wait(self, section, exc, attempt, started, deadline, retryable=True):
+        # Backoff before the next attempt, or None when the error is final
+        self._record(
+            section,
+            timeouts=int(isinstance(exc, (asyncio.TimeoutError, openai.APITimeoutError))),
+            rate_limited=int(getattr(exc, "status_code", None) == 429),
+        )
+        wait = max(backoff_delay(attempt), _retry_after(exc) or 0.0)
+        if (
+            not retryable
+            or not is_retryable(exc)
+            or attempt >= self.max_retries
+            or time.monotonic() + wait >= deadline
+        ):
+            self._record(section, failures=1, latency=time.monotonic() - started)
+            return None
+        self._record(section, retries=1)
+        return wait
+
+    def _time_left(self, deadline) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError("LLM deadline exceeded")
+        return min(self.timeout, remaining)
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: str,
+        section: str = "default",
+        client=None,
+        prompt_tokens: Optional[int] = None,
+        **params: Any,
+    ) -> str:
+        # One chat completion under the process-wide limits. Retryable errors
+        # back off and retry until max_retries or the deadline; anything else,
+        # or the last failure, is raised to the caller.
+        client = client or self.client()
+        started = time.monotonic()
+        deadline = started + self.deadline
+        self._record(section, calls=1, prompt_tokens=prompt_tokens or 0)
+        attempt = 0
+        while True:
+            await self._acquire()
+            try:
+                completion = await asyncio.wait_for(
+                    client.chat.completions.create(model=model, messages=messages, **params),
+                    timeout=self._time_left(deadline),
+                )
+            except Exception as exc:
+                wait = self._retry_wait(section, exc, attempt, started, deadline)
+                if wait is None:
+                    raise
+            else:
+                self._record(section, successes=1, latency=time.monotonic() - started)
+                return completion.choices[0].message.content if completion.choices else ""
+            finally:
+                self.limiter.release()
+            attempt += 1
+            await asyncio.sleep(wait)
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        *,
+        model: str,
+        section: str = "default",
+        client=None,
+        prompt_tokens: Optional[int] = None,
+        **params: Any,
+    ) -> AsyncIterator[str]:
+        # Streamed variant of complete(), yielding content deltas. The timeout
+        # applies to the wait for each chunk. Only failures before the first
+        # delta are retried; after that the caller already holds partial text.
+        client = client or self.client()
+        started = time.monotonic()
+        deadline = started + self.deadline
+        self._record(section, calls=1, prompt_tokens=prompt_tokens or 0)
+        attempt = 0
+        while True:
+            await self._acquire()
+            received = False
+            try:
+                chunks = await asyncio.wait_for(
+                    client.chat.completions.create(
+                        model=model, messages=messages, stream=True, **params
+                    ),
+                    timeout=self._time_left(deadline),
+                )
+                iterator = chunks.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(
+                            iterator.__anext__(), timeout=self._time_left(deadline)
+                        )
+                    except StopAsyncIteration:
+                        break
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        received = True
+                        yield delta
+            except Exception as exc:
+                wait = self._retry_wait(
+                    section, exc, attempt, started, deadline, retryable=not received
+                )
+                if wait is None:
+                    raise
+            else:
+                self._record(section, successes=1, latency=time.monotonic() - started)
+                return
+            finally:
+                self.limiter.release()
+            attempt += 1
+            await asyncio.sleep(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sections = {name: stats.as_dict() for name, stats in self._stats.items()}
+        return {
+            "in_flight": self.limiter.active,
+            "max_concurrency": self.limiter.limit,
+            "rate_per_second": self.bucket.rate,
+            "sections": sections,
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+llm_gateway = LLMGateway()
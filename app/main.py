@@ -6,8 +6,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import inspect
 from app import models
 from app.database import Base, engine
+from app.migrations import apply_migrations
+from app.chart_engine import chart_engine
+from app.rendering import render_executor
 
-from app.routers import upload, report
+from app.routers import upload, report, kpi
 
 app = FastAPI(title="s1-report-generator")
 
@@ -30,8 +33,23 @@ def root():
 
 app.include_router(upload.router)
 app.include_router(report.router)
+app.include_router(kpi.router)
+
+
+@app.on_event("startup")
+def resume_report_jobs():
+    report.report_jobs.resume()
+
+
+@app.on_event("shutdown")
+def shutdown_executors():
+    render_executor.shutdown()
+    chart_engine.shutdown()
+    report.report_jobs.shutdown()
+
 
 if not existing_tables:
     models.Base.metadata.create_all(bind=engine)
 else:
-    print("Tables already exist — skipping creation.")
+    print("Tables already exist — applying pending migrations.")
+    apply_migrations(engine)
@@ -0,0 +1,42 @@
+from sqlalchemy import Integer, String, cast, func, inspect, text
+
+from app.database import Base, engine
+from app.ingest import FS1_TABLES
+
+
+def _add_missing_columns(conn, inspector, model) -> None:
+    table = model.__table__
+    existing = {c["name"] for c in inspector.get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=conn.dialect)
+        conn.execute(
+            text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+        )
+        print(f"Added column {table.name}.{column.name}")
+
+
+def _backfill_year(conn, model) -> None:
+    table = model.__table__
+    conn.execute(
+        table.update()
+        .where(table.c.Year.is_(None), table.c.DateKey.isnot(None))
+        .values(Year=cast(func.substr(cast(table.c.DateKey, String), 1, 4), Integer))
+    )
+
+
+def apply_migrations(bind=None) -> None:
+    bind = bind or engine
+    # New tables (and their indexes) are created outright.
+    Base.metadata.create_all(bind=bind)
+
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for model in FS1_TABLES:
+            _add_missing_columns(conn, inspector, model)
+            _backfill_year(conn, model)
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index, Text
 from app.database import Base
 
 
@@ -8,14 +8,27 @@ class D_OrganizationalUnit(Base):
     OrganizationalUnitID = Column(Integer, primary_key=True, index=True)
     OrganizationalUnitName = Column(String)
     CompanyID = Column(Integer)
-    is_deleted = Column(Integer, default=0)
+    is_deleted = Column(Integer, default=0, index=True)
 
 
 class FS1_WorkforceDiversity(Base):
     __tablename__ = "FS1_WorkforceDiversity"
+    # Covering index for the KPIProcessor access pattern: tenant, year and
+    # org unit filters, the group-by keys and the summed measure.
+    __table_args__ = (
+        Index(
+            "ix_FS1_WorkforceDiversity_kpi",
+            "CompanyID",
+            "Year",
+            "OrganizationalUnitID",
+            "CountryID",
+            "DisabilityCount",
+        ),
+    )
 
     DiversityID = Column(Integer, primary_key=True, index=True)
     DateKey = Column(Integer, nullable=False)
+    Year = Column(Integer, index=True)
     CountryID = Column(Integer, nullable=False)
     CompanyID = Column(Integer, nullable=False)
     DisabilityCount = Column(Integer, nullable=False)
@@ -26,9 +39,21 @@ class FS1_WorkforceDiversity(Base):
 
 class FS1_WorkforceComposition(Base):
     __tablename__ = "FS1_WorkforceComposition"
+    __table_args__ = (
+        Index(
+            "ix_FS1_WorkforceComposition_kpi",
+            "CompanyID",
+            "Year",
+            "OrganizationalUnitID",
+            "GenderID",
+            "CountryID",
+            "EmployeeCount",
+        ),
+    )
 
     WorkforceCompositionID = Column(Integer, primary_key=True, index=True)
     DateKey = Column(Integer, nullable=False)
+    Year = Column(Integer, index=True)
     GenderID = Column(Integer, nullable=False)
     ContractTypeID = Column(Integer, nullable=False)
     CountryID = Column(Integer, nullable=False)
@@ -41,9 +66,20 @@ class FS1_WorkforceComposition(Base):
 
 class FS1_EmployeeTraining(Base):
     __tablename__ = "FS1_EmployeeTraining"
+    __table_args__ = (
+        Index(
+            "ix_FS1_EmployeeTraining_kpi",
+            "CompanyID",
+            "Year",
+            "OrganizationalUnitID",
+            "CountryID",
+            "TotalTrainingHours",
+        ),
+    )
 
     TrainingID = Column(Integer, primary_key=True, index=True)
     DateKey = Column(Integer, nullable=False)
+    Year = Column(Integer, index=True)
     TotalTrainingHours = Column(Float, nullable=False)
     CompanyID = Column(Integer, nullable=False)
     CountryID = Column(Integer, nullable=False)
@@ -54,9 +90,21 @@ class FS1_EmployeeTraining(Base):
 
 class FS1_EmployeeTurnover(Base):
     __tablename__ = "FS1_EmployeeTurnover"
+    __table_args__ = (
+        Index(
+            "ix_FS1_EmployeeTurnover_kpi",
+            "CompanyID",
+            "Year",
+            "OrganizationalUnitID",
+            "GenderID",
+            "CountryID",
+            "EmployeesDeparted",
+        ),
+    )
 
     TurnoverID = Column(Integer, primary_key=True, index=True)
     DateKey = Column(Integer, nullable=False)
+    Year = Column(Integer, index=True)
     GenderID = Column(Integer, nullable=False)
     AgeGroupID = Column(Integer, nullable=False)
     EmployeesDeparted = Column(Integer, nullable=False)
@@ -70,8 +118,19 @@ class FS1_EmployeeTurnover(Base):
 
 class FS1_WorkplaceInjuries(Base):
     __tablename__ = "FS1_WorkplaceInjuries"
+    __table_args__ = (
+        Index(
+            "ix_FS1_WorkplaceInjuries_kpi",
+            "CompanyID",
+            "Year",
+            "OrganizationalUnitID",
+            "CountryID",
+            "InjuryCount",
+        ),
+    )
     InjuryID = Column(Integer, primary_key=True, index=True)
     DateKey = Column(DateTime)
+    Year = Column(Integer, index=True)
     InjuryCount = Column(Integer)
     CompanyID = Column(Integer)
     CountryID = Column(Integer)
@@ -88,6 +147,7 @@ class FS1_Workforce(Base):
     __tablename__ = "FS1_Workforce"
     WorkforceID = Column(Integer, primary_key=True, index=True)
     DateKey = Column(DateTime)
+    Year = Column(Integer, index=True)
     WorkforceCount = Column(Integer)
     CompanyID = Column(Integer)
     CountryID = Column(Integer)
@@ -101,9 +161,155 @@ class FS1_Diversity(Base):
 
     DiversityID = Column(Integer, primary_key=True, index=True)
     DateKey = Column(DateTime)
+    Year = Column(Integer, index=True)
     CountryID = Column(Integer)
     CompanyID = Column(Integer)
     DisabilityCount = Column(Integer)
     OrganizationalUnitID = Column(Integer)
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
+
+
+# ---- KPI rollups ----
+# Pre-aggregated FS1 facts at the reporting grain, rebuilt per company after
+# each upload (see app/rollups.py). Column names mirror the fact tables so the
+# KPI queries run unchanged against either.
+
+
+class R_Workforce(Base):
+    __tablename__ = "R_Workforce"
+    __table_args__ = (
+        Index(
+            "ix_R_Workforce_kpi",
+            "CompanyID",
+            "Year",
+            "OrganizationalUnitID",
+            "GenderID",
+            "CountryID",
+            "EmployeeCount",
+        ),
+    )
+
+    RollupID = Column(Integer, primary_key=True)
+    CompanyID = Column(Integer, nullable=False)
+    Year = Column(Integer)
+    OrganizationalUnitID = Column(Integer)
+    CountryID = Column(Integer)
+    GenderID = Column(Integer)
+    ContractTypeID = Column(Integer)
+    EmployeeCount = Column(Integer, nullable=False)
+
+
+class R_Turnover(Base):
+    __tablename__ = "R_Turnover"
+    __table_args__ = (
+        Index(
+            "ix_R_Turnover_kpi",
+            "CompanyID",
+            "Year",
+            "OrganizationalUnitID",
+            "GenderID",
+            "CountryID",
+            "EmployeesDeparted",
+        ),
+    )
+
+    RollupID = Column(Integer, primary_key=True)
+    CompanyID = Column(Integer, nullable=False)
+    Year = Column(Integer)
+    OrganizationalUnitID = Column(Integer)
+    CountryID = Column(Integer)
+    GenderID = Column(Integer)
+    ContractTypeID = Column(Integer)
+    EmployeesDeparted = Column(Integer, nullable=False)
+
+
+class R_Training(Base):
+    __tablename__ = "R_Training"
+    __table_args__ = (
+        Index(
+            "ix_R_Training_kpi",
+            "CompanyID",
+            "Year",
+            "OrganizationalUnitID",
+            "CountryID",
+            "TotalTrainingHours",
+        ),
+    )
+
+    RollupID = Column(Integer, primary_key=True)
+    CompanyID = Column(Integer, nullable=False)
+    Year = Column(Integer)
+    OrganizationalUnitID = Column(Integer)
+    CountryID = Column(Integer)
+    TotalTrainingHours = Column(Float, nullable=False)
+
+
+class R_Injuries(Base):
+    __tablename__ = "R_Injuries"
+    __table_args__ = (
+        Index(
+            "ix_R_Injuries_kpi",
+            "CompanyID",
+            "Year",
+            "OrganizationalUnitID",
+            "CountryID",
+            "InjuryCount",
+        ),
+    )
+
+    RollupID = Column(Integer, primary_key=True)
+    CompanyID = Column(Integer, nullable=False)
+    Year = Column(Integer)
+    OrganizationalUnitID = Column(Integer)
+    CountryID = Column(Integer)
+    InjuryCount = Column(Integer, nullable=False)
+
+
+class R_Diversity(Base):
+    __tablename__ = "R_Diversity"
+    __table_args__ = (
+        Index(
+            "ix_R_Diversity_kpi",
+            "CompanyID",
+            "Year",
+            "OrganizationalUnitID",
+            "CountryID",
+            "DisabilityCount",
+        ),
+    )
+
+    RollupID = Column(Integer, primary_key=True)
+    CompanyID = Column(Integer, nullable=False)
+    Year = Column(Integer)
+    OrganizationalUnitID = Column(Integer)
+    CountryID = Column(Integer)
+    DisabilityCount = Column(Integer, nullable=False)
+
+
+class R_RollupStatus(Base):
+    __tablename__ = "R_RollupStatus"
+
+    CompanyID = Column(Integer, primary_key=True)
+    RefreshedAt = Column(DateTime, nullable=False)
+    SourceRows = Column(Integer, nullable=False, default=0)
+
+
+class ReportJob(Base):
+    __tablename__ = "ReportJob"
+    __table_args__ = (Index("ix_ReportJob_dedup", "DedupKey", "Status"),)
+
+    JobID = Column(String(32), primary_key=True)
+    DedupKey = Column(String(64), nullable=False)
+    Status = Column(String(16), nullable=False, index=True)
+    Progress = Column(Integer, nullable=False, default=0)
+    Stage = Column(String(64))
+    Payload = Column(Text, nullable=False)
+    Result = Column(Text)
+    FilePath = Column(String)
+    FileName = Column(String)
+    MediaType = Column(String)
+    Error = Column(Text)
+    CreatedAt = Column(DateTime)
+    UpdatedAt = Column(DateTime)
+    FinishedAt = Column(DateTime)
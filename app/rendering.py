@@ -0,0 +1,106 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# docx/pdf assembly holds the GIL, so only worker processes let concurrent
+# reports render on separate cores. "auto" picks processes when there is more
+# than one core; on a single core they only add spawn and pickling cost.
+RENDER_EXECUTOR = os.getenv("RENDER_EXECUTOR", "auto")
+RENDER_EXECUTOR_KINDS = ("auto", "thread", "process")
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def _timed_call(fn, args, kwargs):
+    # Runs in the worker; wall-clock timestamps so they are comparable
+    # across processes.
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, time.time(), result
+
+
+class RenderExecutor:
+
+    def __init__(self, kind=RENDER_EXECUTOR, max_workers=RENDER_WORKERS):
+        if kind not in RENDER_EXECUTOR_KINDS:
+            raise ValueError(f"Unknown render executor kind: {kind}")
+        if kind == "auto":
+            kind = "process" if (os.cpu_count() or 1) > 1 else "thread"
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # spawn, as in chart_engine: no inherited threads or locks
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="render"
+                    )
+            return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        submitted = time.time()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            started, finished, result = await loop.run_in_executor(
+                executor, functools.partial(_timed_call, fn, args, kwargs)
+            )
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        wait = max(0.0, started - submitted)
+        with self._lock:
+            self.completed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_run += finished - started
+        return result
+
+    def stats(self):
+        with self._lock:
+            done = self.completed or 1
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.max_workers),
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_wait_ms": round(self.total_wait / done * 1000, 2),
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "avg_run_ms": round(self.total_run / done * 1000, 2),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+render_executor = RenderExecutor()
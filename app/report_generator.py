@@ -3,8 +3,10 @@ from __future__ import annotations
 import asyncio
 import base64
 import io
+import json
 import os
-from typing import Any, Dict, List, Optional
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 import matplotlib
 
@@ -13,22 +15,38 @@ import matplotlib.pyplot as plt
 
 from openai import AsyncOpenAI
 
+from app.chart_engine import ChartJob, chart_engine
+from app.completion_cache import completion_cache
+from app.llm_gateway import llm_gateway
+from app.templates.prompts import (
+    SECTION_GUIDANCE,
+    build_prompt_context,
+    build_section_prompt,
+    compact_json,
+    estimate_tokens,
+)
+
 load_dotenv()
 
 
-def _fig_to_base64_png(fig) -> str:
+def _fig_to_png_bytes(fig, dpi: int = 200) -> bytes:
     buffer = io.BytesIO()
-    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
+    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=dpi)
     plt.close(fig)
-    buffer.seek(0)
-    return base64.b64encode(buffer.read()).decode("utf-8")
+    return buffer.getvalue()
+
+
+def _png_to_base64(png: Optional[bytes]) -> Optional[str]:
+    return base64.b64encode(png).decode("utf-8") if png is not None else None
 
 
-def _plot_workforce_by_gender_pie(workforce_by_gender: List[Dict[str, Any]]) -> str:
+def _render_workforce_by_gender_pie(
+    workforce_by_gender: List[Dict[str, Any]], figsize=(6, 6), dpi: int = 200
+) -> bytes:
     labels = [item.get("gender", "Unknown") for item in workforce_by_gender]
     sizes = [item.get("employee_count", 0) for item in workforce_by_gender]
 
-    fig, ax = plt.subplots(figsize=(6, 6))
+    fig, ax = plt.subplots(figsize=figsize)
     wedges, texts = ax.pie(sizes, wedgeprops=dict(width=0.4), startangle=140)
     ax.legend(
         wedges, labels, title="Gender", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1)
@@ -37,36 +55,61 @@ def _plot_workforce_by_gender_pie(workforce_by_gender: List[Dict[str, Any]]) ->
 
     centre_circle = plt.Circle((0, 0), 0.70, fc="white")
     fig.gca().add_artist(centre_circle)
-    return _fig_to_base64_png(fig)
+    return _fig_to_png_bytes(fig, dpi)
 
 
-def _plot_training_hours_by_gender_bar(training_breakdown: List[Dict[str, Any]]) -> str:
+def _render_training_hours_by_gender_bar(
+    training_breakdown: List[Dict[str, Any]], figsize=(8, 5), dpi: int = 200
+) -> bytes:
     labels = [item.get("gender", "Unknown") for item in training_breakdown]
     values = [
         float(item.get("total_training_hours", 0.0)) for item in training_breakdown
     ]
 
-    fig, ax = plt.subplots(figsize=(8, 5))
+    fig, ax = plt.subplots(figsize=figsize)
     ax.bar(labels, values, color="#4C78A8")
     ax.set_title("Total Training Hours by Gender")
     ax.set_xlabel("Gender")
     ax.set_ylabel("Total Training Hours")
     ax.grid(axis="y", linestyle=":", alpha=0.5)
-    return _fig_to_base64_png(fig)
+    return _fig_to_png_bytes(fig, dpi)
 
 
-def _plot_trend_bar(
-    title: str, current_value: float, prior_value: Optional[float]
-) -> Optional[str]:
+def _render_trend_bar(
+    title: str,
+    current_value: float,
+    prior_value: Optional[float],
+    figsize=(6, 4),
+    dpi: int = 200,
+) -> Optional[bytes]:
     if prior_value is None:
         return None
-    fig, ax = plt.subplots(figsize=(6, 4))
+    fig, ax = plt.subplots(figsize=figsize)
     ax.bar(["Prior"], [prior_value], color="#A0A0A0")
     ax.bar(["Current"], [current_value], color="#59A14F")
     ax.set_title(title)
     ax.set_ylabel("Value")
     ax.grid(axis="y", linestyle=":", alpha=0.5)
-    return _fig_to_base64_png(fig)
+    return _fig_to_png_bytes(fig, dpi)
+
+
+REPORT_SECTIONS = [
+    "executive_summary",
+    "workforce_composition_and_diversity",
+    "working_conditions_and_equal_opportunity",
+    "training_and_development",
+    "turnover_and_retention",
+    "health_and_safety",
+    "outlook_and_next_steps",
+    "closing",
+]
+
+# "sections": one completion per section. "structured": one JSON-schema
+# completion for all eight, with per-section calls for any that fail.
+GENERATION_MODES = ("sections", "structured")
+REPORT_GENERATION_MODE = os.getenv("REPORT_GENERATION_MODE", "sections")
+
+SYSTEM_PROMPT = "You are an expert ESG (ESRS S1) reporting analyst."
 
 
 def _build_section_prompt(
@@ -74,88 +117,193 @@ def _build_section_prompt(
     kpi_data: Dict[str, Any],
     historical_kpi_data: Optional[Dict[str, Any]],
 ) -> str:
+    # Only this section's KPIs, with long breakdowns condensed
+    context = build_prompt_context(section_name, kpi_data, historical_kpi_data)
+    return build_section_prompt(
+        section_name, compact_json(context["kpi"]), compact_json(context["historical"])
+    )
 
-    def safe(obj):
-        try:
-            import json
-
-            return json.dumps(obj, ensure_ascii=False)
-        except Exception:
-            return str(obj)
-
-    section_guidance = {
-        "executive_summary": "Write a formal executive summary (max 5 sentences) that provides an overview of the company's ESRS S1 performance, highlighting key metrics and trends.",
-        "workforce_composition_and_diversity": "Analyze workforce composition and diversity metrics (S1-1, S1-9) with gender distribution, inclusion considerations, and any material imbalances (max 5 sentences).",
-        "working_conditions_and_equal_opportunity": "Discuss working conditions and equal opportunity policies and outcomes, referencing S1-2 and S1-3 where applicable (max 5 sentences).",
-        "training_and_development": "Analyze training and development metrics, referencing S1-13 and observed trends in capability building (max 5 sentences).",
-        "turnover_and_retention": "Interpret turnover and retention dynamics with potential drivers, aligned with ESRS S1 concepts (max 5 sentences).",
-        "health_and_safety": "Summarize workplace health and safety metrics with emphasis on safe working environments, referencing S1-14 where relevant (max 5 sentences).",
-        "outlook_and_next_steps": "Outline management's next steps to improve performance across S1 topics with clear follow-up actions (max 5 sentences).",
-        "closing": "Write a concise but formal closing paragraph (max 5 sentences) that synthesizes insights, highlights progress/challenges, reaffirms commitment to continuous improvement, and maintains a confident, forward-looking tone.",
-    }
 
-    return (
-        f"You are an ESG reporting analyst. Write the '{section_name}' section for an ESRS S1 Management Report.\n\n"
-        f"Requirements: {section_guidance.get(section_name, 'Write a professional ESG narrative section.')}\n\n"
-        f"Current KPI Data:\n{safe(kpi_data)}\n\n"
-        f"Historical KPI Data (optional):\n{safe(historical_kpi_data or {})}\n\n"
-        "Return only the section text, no JSON wrapper or additional formatting."
-    )
+def _estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_tokens(message["content"]) for message in messages)
 
 
 async def _generate_section_async(
-    client: AsyncOpenAI,
+    client: Optional[AsyncOpenAI],
     section_name: str,
     kpi_data: Dict[str, Any],
     historical_kpi_data: Optional[Dict[str, Any]],
     openai_model: str,
+    token_estimates: Optional[Dict[str, int]] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
 ) -> str:
     try:
         prompt = _build_section_prompt(section_name, kpi_data, historical_kpi_data)
-        completion = await client.chat.completions.create(
+        messages = [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT,
+            },
+            {"role": "user", "content": prompt},
+        ]
+        prompt_tokens = _estimate_prompt_tokens(messages)
+        if token_estimates is not None:
+            token_estimates[section_name] = prompt_tokens
+        params = {"temperature": 0.7, "max_completion_tokens": 2000}
+        cache_key = completion_cache.make_key(openai_model, messages, **params)
+        cached = await completion_cache.aget(cache_key)
+        if cached is not None:
+            if on_delta is not None:
+                on_delta(cached)
+            return cached
+
+        # Deadlines, retries and rate limits live in the gateway; a client of
+        # None means its shared process-wide one.
+        request = dict(
             model=openai_model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert ESG (ESRS S1) reporting analyst.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.7,
-            max_completion_tokens=2000,
+            section=section_name,
+            client=client,
+            prompt_tokens=prompt_tokens,
+            **params,
         )
-        return completion.choices[0].message.content if completion.choices else ""
-    except Exception:
+        if on_delta is None:
+            content = await llm_gateway.complete(messages, **request)
+        else:
+            parts = []
+            async for delta in llm_gateway.stream(messages, **request):
+                parts.append(delta)
+                on_delta(delta)
+            content = "".join(parts)
+        # Only real narrative is cached; failures fall back and retry next time
+        if content:
+            await completion_cache.aset(cache_key, openai_model, content)
+        return content
+    except Exception as exc:
+        print(f"Section {section_name} failed: {type(exc).__name__}: {exc}")
         return ""
 
 
-async def generate_management_report(
+def _fallback_section_text(section: str) -> str:
+    return f"Analysis for {section.replace('_', ' ').title()} section based on available KPI data."
+
+
+def _sections_schema(sections: List[str]) -> Dict[str, Any]:
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "esrs_s1_report_sections",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {name: {"type": "string"} for name in sections},
+                "required": list(sections),
+                "additionalProperties": False,
+            },
+        },
+    }
+
+
+def _build_structured_prompt(
+    sections: List[str],
     kpi_data: Dict[str, Any],
-    *,
-    historical_kpi_data: Optional[Dict[str, Any]] = None,
-    openai_model: str = "gpt-4o-mini",
-) -> Dict[str, Any]:
+    historical_kpi_data: Optional[Dict[str, Any]],
+) -> str:
+    requirements = "\n".join(
+        f"- {name}: {SECTION_GUIDANCE.get(name, 'Write a professional ESG narrative section.')}"
+        for name in sections
+    )
+    context = build_prompt_context(None, kpi_data, historical_kpi_data)
+    return (
+        "You are an ESG reporting analyst. Write the following sections of an ESRS S1 Management Report.\n\n"
+        f"Sections and requirements:\n{requirements}\n\n"
+        f"Current KPI Data:\n{compact_json(context['kpi'])}\n\n"
+        f"Historical KPI Data (optional):\n{compact_json(context['historical'])}\n\n"
+        "Return a JSON object with one key per section whose value is that section's text."
+    )
 
-    # Build visuals from KPI data
-    charts: Dict[str, Optional[str]] = {
-        "workforce_by_gender": None,
-        "training_hours_by_gender": None,
-        "trend_training_hours_per_employee": None,
+
+def _parse_structured_sections(content: Optional[str], sections: List[str]) -> Dict[str, str]:
+    # Sections that parsed to non-empty text; anything else is left for the
+    # per-section fallback.
+    try:
+        parsed = json.loads(content or "")
+    except ValueError:
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+    return {
+        name: parsed[name].strip()
+        for name in sections
+        if isinstance(parsed.get(name), str) and parsed[name].strip()
     }
 
+
+async def _generate_structured_async(
+    client: Optional[AsyncOpenAI],
+    sections: List[str],
+    kpi_data: Dict[str, Any],
+    historical_kpi_data: Optional[Dict[str, Any]],
+    openai_model: str,
+    token_estimates: Optional[Dict[str, int]] = None,
+) -> Dict[str, str]:
+    try:
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": _build_structured_prompt(sections, kpi_data, historical_kpi_data),
+            },
+        ]
+        prompt_tokens = _estimate_prompt_tokens(messages)
+        if token_estimates is not None:
+            token_estimates["structured"] = prompt_tokens
+        params = {
+            "temperature": 0.7,
+            "max_completion_tokens": 250 * len(sections) + 500,
+            "response_format": _sections_schema(sections),
+        }
+        cache_key = completion_cache.make_key(openai_model, messages, **params)
+        content = await completion_cache.aget(cache_key)
+        cached = content is not None
+        if not cached:
+            content = await llm_gateway.complete(
+                messages,
+                model=openai_model,
+                section="structured",
+                client=client,
+                prompt_tokens=prompt_tokens,
+                **params,
+            )
+        parsed = _parse_structured_sections(content, sections)
+        # Only fully valid responses are cached
+        if not cached and len(parsed) == len(sections):
+            await completion_cache.aset(cache_key, openai_model, content)
+        return parsed
+    except Exception as exc:
+        print(f"Structured generation failed: {type(exc).__name__}: {exc}")
+        return {}
+
+
+def _chart_jobs(
+    kpi_data: Dict[str, Any], historical_kpi_data: Optional[Dict[str, Any]]
+) -> Dict[str, ChartJob]:
+    jobs: Dict[str, ChartJob] = {}
+
     # Workforce by Gender (pie/donut)
     workforce_by_gender = kpi_data.get("Total Workforce by Gender")
     if isinstance(workforce_by_gender, list) and workforce_by_gender:
-        charts["workforce_by_gender"] = _plot_workforce_by_gender_pie(
-            workforce_by_gender
+        jobs["workforce_by_gender"] = (
+            "workforce_by_gender_pie",
+            (workforce_by_gender,),
         )
 
     # Total Training Hours by Gender (bar)
     avg_training = kpi_data.get("Average Training Hours per Employee", {}) or {}
     gender_breakdown = avg_training.get("breakdown_by_gender")
     if isinstance(gender_breakdown, list) and gender_breakdown:
-        charts["training_hours_by_gender"] = _plot_training_hours_by_gender_bar(
-            gender_breakdown
+        jobs["training_hours_by_gender"] = (
+            "training_hours_by_gender_bar",
+            (gender_breakdown,),
         )
 
     # Trend: Training hours per employee
@@ -169,51 +317,100 @@ async def generate_management_report(
         )
         if isinstance(hist_training, dict):
             prior_avg = hist_training.get("overall_average_hours")
-    charts["trend_training_hours_per_employee"] = _plot_trend_bar(
-        "Average Training Hours per Employee – YoY",
-        float(current_avg) if current_avg is not None else 0.0,
-        prior_avg if prior_avg is not None else None,
+    if prior_avg is not None:
+        jobs["trend_training_hours_per_employee"] = (
+            "trend_bar",
+            (
+                "Average Training Hours per Employee – YoY",
+                float(current_avg) if current_avg is not None else 0.0,
+                prior_avg,
+            ),
+        )
+
+    return jobs
+
+
+async def _build_charts(
+    kpi_data: Dict[str, Any], historical_kpi_data: Optional[Dict[str, Any]]
+) -> Dict[str, Optional[str]]:
+    charts: Dict[str, Optional[str]] = {
+        "workforce_by_gender": None,
+        "training_hours_by_gender": None,
+        "trend_training_hours_per_employee": None,
+    }
+    # All charts for the report render in parallel worker processes
+    rendered = await chart_engine.render_async(
+        _chart_jobs(kpi_data, historical_kpi_data)
     )
+    for name, png in rendered.items():
+        charts[name] = _png_to_base64(png)
+    return charts
+
+
+async def _timed(timings: Dict[str, float], stage: str, work):
+    started = time.perf_counter()
+    try:
+        return await work
+    finally:
+        timings[f"{stage}_seconds"] = round(time.perf_counter() - started, 4)
+
+
+async def generate_management_report(
+    kpi_data: Dict[str, Any],
+    *,
+    historical_kpi_data: Optional[Dict[str, Any]] = None,
+    openai_model: str = "gpt-4o-mini",
+    client: Optional[AsyncOpenAI] = None,
+    mode: Optional[str] = None,
+) -> Dict[str, Any]:
+    mode = mode or REPORT_GENERATION_MODE
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode {mode!r}; expected one of {GENERATION_MODES}")
+    generation = {"mode": mode, "fallback_sections": [], "prompt_tokens": {}}
 
     # Build narrative.
     async def _generate_all_sections():
-        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        sections = [
-            "executive_summary",
-            "workforce_composition_and_diversity",
-            "working_conditions_and_equal_opportunity",
-            "training_and_development",
-            "turnover_and_retention",
-            "health_and_safety",
-            "outlook_and_next_steps",
-            "closing",
-        ]
+        section_results = {}
+        pending = list(REPORT_SECTIONS)
+        if mode == "structured":
+            section_results = await _generate_structured_async(
+                client,
+                REPORT_SECTIONS,
+                kpi_data,
+                historical_kpi_data,
+                openai_model,
+                generation["prompt_tokens"],
+            )
+            pending = [section for section in REPORT_SECTIONS if section not in section_results]
+            generation["fallback_sections"] = pending
 
         tasks = [
             _generate_section_async(
-                client, section, kpi_data, historical_kpi_data, openai_model
+                client,
+                section,
+                kpi_data,
+                historical_kpi_data,
+                openai_model,
+                generation["prompt_tokens"],
             )
-            for section in sections
+            for section in pending
         ]
 
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        section_results = {}
-        for i, section in enumerate(sections):
-            result = results[i]
+        for section, result in zip(pending, results):
             if isinstance(result, Exception) or not result:
-                section_results[section] = (
-                    f"Analysis for {section.replace('_', ' ').title()} section based on available KPI data."
-                )
+                section_results[section] = _fallback_section_text(section)
             else:
                 section_results[section] = result
 
         return section_results
 
-    section_results = (
-        await _generate_all_sections()
-        if asyncio.get_event_loop().is_running()
-        else asyncio.run(_generate_all_sections())
+    # Charts render while the sections are generated
+    timings = generation["timings"] = {}
+    charts, section_results = await asyncio.gather(
+        _timed(timings, "charts", _build_charts(kpi_data, historical_kpi_data)),
+        _timed(timings, "llm", _generate_all_sections()),
     )
 
     executive_summary = section_results.get("executive_summary", "")
@@ -241,4 +438,86 @@ async def generate_management_report(
             "closing": closing,
         },
         "charts": charts,
+        "generation": generation,
+    }
+
+
+async def generate_management_report_events(
+    kpi_data: Dict[str, Any],
+    *,
+    historical_kpi_data: Optional[Dict[str, Any]] = None,
+    openai_model: str = "gpt-4o-mini",
+    client: Optional[AsyncOpenAI] = None,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    # Streaming counterpart of generate_management_report: yields (event, data)
+    # as work completes -- "chart" per rendered chart, "section_delta" per
+    # streamed chunk, "section" per finished section -- and finally "report"
+    # with the same sections/charts/generation as the non-streaming call.
+    # Sections always stream one call each; structured mode can't stream
+    # sections independently.
+    events: asyncio.Queue = asyncio.Queue()
+    generation = {"mode": "sections", "fallback_sections": [], "prompt_tokens": {}}
+    charts: Dict[str, Optional[str]] = {
+        "workforce_by_gender": None,
+        "training_hours_by_gender": None,
+        "trend_training_hours_per_employee": None,
     }
+    section_results: Dict[str, str] = {}
+
+    async def _chart(name, job):
+        rendered = await chart_engine.render_async({name: job})
+        charts[name] = _png_to_base64(rendered.get(name))
+        if charts[name] is not None:
+            events.put_nowait(("chart", {"name": name, "image": charts[name]}))
+
+    async def _section(section):
+        content = await _generate_section_async(
+            client,
+            section,
+            kpi_data,
+            historical_kpi_data,
+            openai_model,
+            generation["prompt_tokens"],
+            on_delta=lambda delta: events.put_nowait(
+                ("section_delta", {"section": section, "delta": delta})
+            ),
+        )
+        section_results[section] = content or _fallback_section_text(section)
+        events.put_nowait(
+            ("section", {"section": section, "text": section_results[section]})
+        )
+
+    chart_tasks = [
+        asyncio.create_task(_chart(name, job))
+        for name, job in _chart_jobs(kpi_data, historical_kpi_data).items()
+    ]
+    section_tasks = [asyncio.create_task(_section(section)) for section in REPORT_SECTIONS]
+    tasks = chart_tasks + section_tasks
+    # Same stage timings as generate_management_report
+    timings = generation["timings"] = {}
+    done = asyncio.gather(
+        _timed(timings, "charts", asyncio.gather(*chart_tasks)),
+        _timed(timings, "llm", asyncio.gather(*section_tasks)),
+    )
+    try:
+        while not done.done() or not events.empty():
+            getter = asyncio.ensure_future(events.get())
+            await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                yield getter.result()
+            else:
+                getter.cancel()
+        # Surface chart failures
+        done.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    yield (
+        "report",
+        {
+            "sections": {section: section_results[section] for section in REPORT_SECTIONS},
+            "charts": charts,
+            "generation": generation,
+        },
+    )
@@ -0,0 +1,343 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from app.database import SessionLocal
+from app.llm_gateway import llm_gateway
+from app.models import ReportJob
+
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+REPORT_JOB_MAX_PENDING = int(os.getenv("REPORT_JOB_MAX_PENDING", "100"))
+REPORT_JOBS_DIR = os.getenv("REPORT_JOBS_DIR", "report_jobs")
+# Finished jobs, and their files, are removed this long after they finish
+REPORT_JOB_TTL_SECONDS = float(os.getenv("REPORT_JOB_TTL_SECONDS", str(24 * 3600)))
+REPORT_JOB_PURGE_INTERVAL_SECONDS = float(os.getenv("REPORT_JOB_PURGE_INTERVAL_SECONDS", "60"))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+IN_FLIGHT = (QUEUED, RUNNING)
+FINISHED = (SUCCEEDED, FAILED)
+
+ProgressCallback = Callable[[int, str], None]
+# handler(payload, out, progress) -> {"name", "media_type", ...result metadata}
+JobHandler = Callable[[Dict[str, Any], BinaryIO, ProgressCallback], Awaitable[Dict[str, Any]]]
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def job_dedup_key(payload: Dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def job_to_dict(job: ReportJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.JobID,
+        "status": job.Status,
+        "progress": job.Progress,
+        "stage": job.Stage,
+        "error": job.Error,
+        "created_at": job.CreatedAt.isoformat() if job.CreatedAt else None,
+        "updated_at": job.UpdatedAt.isoformat() if job.UpdatedAt else None,
+        "finished_at": job.FinishedAt.isoformat() if job.FinishedAt else None,
+        "file_name": job.FileName,
+        "media_type": job.MediaType,
+        "file_path": job.FilePath,
+        "result": json.loads(job.Result) if job.Result else None,
+    }
+
+
+class ReportJobQueue:
+
+    def __init__(
+        self,
+        handler: JobHandler,
+        session_factory=SessionLocal,
+        max_workers: int = REPORT_JOB_WORKERS,
+        max_pending: int = REPORT_JOB_MAX_PENDING,
+        directory: str = REPORT_JOBS_DIR,
+        ttl_seconds: float = REPORT_JOB_TTL_SECONDS,
+    ):
+        self.handler = handler
+        self.session_factory = session_factory
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max_pending
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        # Running jobs last updated before this moment belong to a process
+        # that has stopped; see resume().
+        self._started_at = _now()
+        self._next_purge = 0.0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        # Each worker thread keeps one event loop for every job it runs, so
+        # jobs reuse the loop-bound LLM client and its connection pool.
+        self._local = threading.local()
+        self._runners: Dict[int, asyncio.Runner] = {}
+        self._busy = set()
+        self._closed = False
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="report-job"
+            )
+        return self._executor
+
+    def _runner(self) -> asyncio.Runner:
+        runner = getattr(self._local, "runner", None)
+        if runner is None:
+            runner = self._local.runner = asyncio.Runner()
+            with self._lock:
+                self._runners[threading.get_ident()] = runner
+        return runner
+
+    @staticmethod
+    def _close_runners(runners: List[asyncio.Runner]) -> None:
+        for runner in runners:
+            try:
+                runner.run(llm_gateway.aclose())
+            finally:
+                runner.close()
+
+    def _update(self, job_id: str, **values: Any) -> None:
+        db = self.session_factory()
+        try:
+            db.query(ReportJob).filter(ReportJob.JobID == job_id).update(
+                {**values, "UpdatedAt": _now()}
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _claim(self, job_id: str) -> bool:
+        # Conditional update: of every worker and process that sees the job
+        # queued, exactly one moves it to running.
+        db = self.session_factory()
+        try:
+            claimed = (
+                db.query(ReportJob)
+                .filter(ReportJob.JobID == job_id, ReportJob.Status == QUEUED)
+                .update(
+                    {"Status": RUNNING, "Progress": 5, "Stage": "started", "UpdatedAt": _now()},
+                    synchronize_session=False,
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+        return claimed == 1
+
+    def purge_expired(self) -> int:
+        cutoff = _now() - timedelta(seconds=self.ttl_seconds)
+        db = self.session_factory()
+        try:
+            expired = (
+                db.query(ReportJob.JobID, ReportJob.FilePath)
+                .filter(ReportJob.Status.in_(FINISHED), ReportJob.FinishedAt < cutoff)
+                .all()
+            )
+            for _, path in expired:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            if expired:
+                db.query(ReportJob).filter(
+                    ReportJob.JobID.in_([job_id for job_id, _ in expired])
+                ).delete(synchronize_session=False)
+                db.commit()
+        finally:
+            db.close()
+        return len(expired)
+
+    def _maybe_purge(self) -> None:
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + REPORT_JOB_PURGE_INTERVAL_SECONDS
+        try:
+            self.purge_expired()
+        except Exception as e:
+            print(f"Report job purge failed: {e}")
+
+    def submit(self, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        self._maybe_purge()
+        dedup_key = job_dedup_key(payload)
+        # The lock makes check-then-insert atomic, so identical concurrent
+        # requests always land on the same job.
+        with self._lock:
+            db = self.session_factory()
+            try:
+                existing = (
+                    db.query(ReportJob)
+                    .filter(ReportJob.DedupKey == dedup_key, ReportJob.Status.in_(IN_FLIGHT))
+                    .first()
+                )
+                if existing is not None:
+                    return job_to_dict(existing), False
+
+                pending = (
+                    db.query(ReportJob).filter(ReportJob.Status.in_(IN_FLIGHT)).count()
+                )
+                if pending >= self.max_pending:
+                    raise QueueFullError(f"{pending} report jobs already pending")
+
+                now = _now()
+                job = ReportJob(
+                    JobID=uuid.uuid4().hex,
+                    DedupKey=dedup_key,
+                    Status=QUEUED,
+                    Progress=0,
+                    Stage="queued",
+                    Payload=json.dumps(payload, default=str),
+                    CreatedAt=now,
+                    UpdatedAt=now,
+                )
+                db.add(job)
+                db.commit()
+                job_id, result = job.JobID, job_to_dict(job)
+                self._get_executor().submit(self._run, job_id)
+            finally:
+                db.close()
+        return result, True
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._maybe_purge()
+        db = self.session_factory()
+        try:
+            job = db.get(ReportJob, job_id)
+            return job_to_dict(job) if job is not None else None
+        finally:
+            db.close()
+
+    def resume(self) -> int:
+        # Jobs that were queued or mid-flight when the process stopped start
+        # over. Every uvicorn worker calls this at startup: running jobs are
+        # only requeued if they were last updated before this process started
+        # (a sibling's live job is newer), and _claim() lets one worker run
+        # each queued job.
+        self._maybe_purge()
+        with self._lock:
+            db = self.session_factory()
+            try:
+                db.query(ReportJob).filter(
+                    ReportJob.Status == RUNNING, ReportJob.UpdatedAt < self._started_at
+                ).update(
+                    {"Status": QUEUED, "Progress": 0, "Stage": "requeued", "UpdatedAt": _now()},
+                    synchronize_session=False,
+                )
+                db.commit()
+                job_ids = [
+                    job_id
+                    for (job_id,) in db.query(ReportJob.JobID)
+                    .filter(ReportJob.Status == QUEUED)
+                    .order_by(ReportJob.CreatedAt)
+                ]
+            finally:
+                db.close()
+            for job_id in job_ids:
+                self._get_executor().submit(self._run, job_id)
+        if job_ids:
+            print(f"Requeued {len(job_ids)} report job(s)")
+        return len(job_ids)
+
+    def _run(self, job_id: str) -> None:
+        if not self._claim(job_id):
+            return
+        db = self.session_factory()
+        try:
+            payload = json.loads(db.get(ReportJob, job_id).Payload)
+        finally:
+            db.close()
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, job_id)
+        partial = f"{path}.part"
+
+        def progress(percent: int, stage: str) -> None:
+            self._update(job_id, Progress=percent, Stage=stage)
+
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._busy.add(thread_id)
+        try:
+            with open(partial, "wb") as out:
+                result = self._runner().run(self.handler(payload, out, progress))
+            os.replace(partial, path)
+        except Exception as e:
+            print(f"Report job {job_id} failed: {e}")
+            if os.path.exists(partial):
+                os.remove(partial)
+            self._update(
+                job_id, Status=FAILED, Stage="failed", Error=str(e), FinishedAt=_now()
+            )
+            return
+        finally:
+            with self._lock:
+                self._busy.discard(thread_id)
+                # A job that outlived shutdown() closes its own loop
+                runner = self._runners.pop(thread_id, None) if self._closed else None
+            if runner is not None:
+                self._local.runner = None
+                self._close_runners([runner])
+
+        self._update(
+            job_id,
+            Status=SUCCEEDED,
+            Progress=100,
+            Stage="done",
+            FilePath=path,
+            FileName=result.pop("name"),
+            MediaType=result.pop("media_type"),
+            Result=json.dumps(result, default=str),
+            FinishedAt=_now(),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            counts = dict(
+                db.query(ReportJob.Status, func.count())
+                .group_by(ReportJob.Status)
+                .all()
+            )
+        finally:
+            db.close()
+        return {"max_workers": self.max_workers, "jobs": counts}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._closed = True
+            idle = [
+                self._runners.pop(thread_id)
+                for thread_id in list(self._runners)
+                if thread_id not in self._busy
+            ]
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        # Idle loops aren't running and get no more jobs, so they are closed
+        # here, on a helper thread in case the caller is inside an event loop.
+        if idle:
+            closer = threading.Thread(
+                target=self._close_runners, args=(idle,), name="report-job-close"
+            )
+            closer.start()
+            closer.join()
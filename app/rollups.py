@@ -0,0 +1,129 @@
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy import func, select
+
+from app.database import engine
+from app.models import (
+    FS1_EmployeeTraining,
+    FS1_EmployeeTurnover,
+    FS1_WorkforceComposition,
+    FS1_WorkforceDiversity,
+    FS1_WorkplaceInjuries,
+    R_Diversity,
+    R_Injuries,
+    R_RollupStatus,
+    R_Training,
+    R_Turnover,
+    R_Workforce,
+)
+
+# rollup model -> (fact model, grain columns, summed measure)
+ROLLUP_SPECS = [
+    (
+        R_Workforce,
+        FS1_WorkforceComposition,
+        ("CompanyID", "Year", "OrganizationalUnitID", "CountryID", "GenderID", "ContractTypeID"),
+        "EmployeeCount",
+    ),
+    (
+        R_Turnover,
+        FS1_EmployeeTurnover,
+        ("CompanyID", "Year", "OrganizationalUnitID", "CountryID", "GenderID", "ContractTypeID"),
+        "EmployeesDeparted",
+    ),
+    (
+        R_Training,
+        FS1_EmployeeTraining,
+        ("CompanyID", "Year", "OrganizationalUnitID", "CountryID"),
+        "TotalTrainingHours",
+    ),
+    (
+        R_Injuries,
+        FS1_WorkplaceInjuries,
+        ("CompanyID", "Year", "OrganizationalUnitID", "CountryID"),
+        "InjuryCount",
+    ),
+    (
+        R_Diversity,
+        FS1_WorkforceDiversity,
+        ("CompanyID", "Year", "OrganizationalUnitID", "CountryID"),
+        "DisabilityCount",
+    ),
+]
+
+
+def clear_rollups(bind=None) -> None:
+    # Dropping the status rows first means readers fall back to the facts.
+    with (bind or engine).begin() as conn:
+        conn.execute(R_RollupStatus.__table__.delete())
+        for rollup, _, _, _ in ROLLUP_SPECS:
+            conn.execute(rollup.__table__.delete())
+
+
+def refresh_rollups(
+    company_ids: Optional[Iterable[int]] = None, bind=None
+) -> Dict[str, Any]:
+    # Rebuilds the given companies (all companies with facts when None) in a
+    # single transaction, so readers see either the old or the new rollup.
+    bind = bind or engine
+    started = time.perf_counter()
+    with bind.begin() as conn:
+        if company_ids is None:
+            company_ids = set()
+            for _, fact, _, _ in ROLLUP_SPECS:
+                company_ids.update(
+                    conn.execute(select(fact.CompanyID).distinct()).scalars()
+                )
+        company_ids = sorted(c for c in set(company_ids) if c is not None)
+        if not company_ids:
+            return {"companies": [], "rows": 0, "seconds": 0.0}
+
+        source_rows = dict.fromkeys(company_ids, 0)
+        rollup_rows = 0
+        for rollup, fact, grain, measure in ROLLUP_SPECS:
+            rollup_table = rollup.__table__
+            conn.execute(
+                rollup_table.delete().where(rollup_table.c.CompanyID.in_(company_ids))
+            )
+            fact_table = fact.__table__
+            aggregated = (
+                select(
+                    *(fact_table.c[name] for name in grain),
+                    func.sum(fact_table.c[measure]),
+                )
+                .where(fact_table.c.CompanyID.in_(company_ids))
+                .group_by(*(fact_table.c[name] for name in grain))
+            )
+            result = conn.execute(
+                rollup_table.insert().from_select([*grain, measure], aggregated)
+            )
+            rollup_rows += max(result.rowcount or 0, 0)
+            for company_id, count in conn.execute(
+                select(fact_table.c.CompanyID, func.count())
+                .where(fact_table.c.CompanyID.in_(company_ids))
+                .group_by(fact_table.c.CompanyID)
+            ):
+                source_rows[company_id] += count
+
+        status = R_RollupStatus.__table__
+        conn.execute(status.delete().where(status.c.CompanyID.in_(company_ids)))
+        now = datetime.now(timezone.utc)
+        conn.execute(
+            status.insert(),
+            [
+                {"CompanyID": cid, "RefreshedAt": now, "SourceRows": source_rows[cid]}
+                for cid in company_ids
+            ],
+        )
+
+    return {
+        "companies": company_ids,
+        "rows": rollup_rows,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def rollups_fresh(db, company_id) -> bool:
+    return db.get(R_RollupStatus, company_id) is not None
@@ -0,0 +1,96 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from app.kpi_cache import kpi_cache
+from app.kpi_columnar import KPI_ENGINES, columnar_kpi_processor, get_kpi_engine
+from app.kpi_processor import KPI_DEFINITIONS, kpi_processor, report_kpi_inputs
+
+
+class KPIQueryRequest(BaseModel):
+    company_id: int
+    years: Optional[List[int]] = None
+    organizational_unit_ids: Optional[List[int]] = None
+    country_id: Optional[int] = None
+    # One KPI by name, or all seven
+    kpi: Optional[str] = None
+
+
+class KPIBatchRequest(BaseModel):
+    company_ids: List[int]
+    years: Optional[List[int]] = None
+    organizational_unit_ids: Optional[List[int]] = None
+    country_id: Optional[int] = None
+
+
+class KPITimeSeriesRequest(BaseModel):
+    company_id: int
+    years: Optional[List[int]] = None
+    organizational_unit_ids: Optional[List[int]] = None
+    country_id: Optional[int] = None
+    report_year: Optional[int] = None
+
+
+router = APIRouter(prefix="/kpi", tags=["kpi"])
+
+
+@router.post("/query")
+def kpi_query(payload: KPIQueryRequest, engine: Optional[str] = None):
+    # engine overrides KPI_ENGINE per request; "columnar" serves repeated
+    # slices of a company from memory.
+    if engine is not None and engine not in KPI_ENGINES:
+        raise HTTPException(
+            status_code=400, detail=f"engine must be one of: {', '.join(KPI_ENGINES)}"
+        )
+    if payload.kpi is not None and payload.kpi not in KPI_DEFINITIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown KPI: {payload.kpi}")
+    processor = get_kpi_engine(engine)
+    filters = (
+        payload.company_id,
+        payload.years,
+        payload.organizational_unit_ids,
+        payload.country_id,
+    )
+    if payload.kpi is None:
+        kpis = processor.get_all_kpi_data(*filters)
+    else:
+        method = KPI_DEFINITIONS[payload.kpi][0]
+        kpis = {payload.kpi: getattr(processor, method)(*filters)}
+    return {"company_id": payload.company_id, "kpis": kpis}
+
+
+@router.post("/batch")
+def kpi_batch(payload: KPIBatchRequest):
+    if not payload.company_ids:
+        raise HTTPException(status_code=400, detail="company_ids must not be empty")
+    # Sync handler: the grouped scans run in the threadpool, off the event loop
+    companies = kpi_processor.get_all_kpi_data_batch(
+        payload.company_ids,
+        years=payload.years,
+        organizational_unit_ids=payload.organizational_unit_ids,
+        country_id=payload.country_id,
+    )
+    return {"count": len(companies), "companies": companies}
+
+
+@router.post("/timeseries")
+def kpi_timeseries(payload: KPITimeSeriesRequest):
+    series = kpi_processor.get_kpi_time_series(
+        payload.company_id,
+        years=payload.years,
+        organizational_unit_ids=payload.organizational_unit_ids,
+        country_id=payload.country_id,
+    )
+    return {
+        "company_id": payload.company_id,
+        "years": list(series),
+        "series": series,
+        # Ready to pass to /report as kpi_data and historical_kpi_data
+        "report_inputs": report_kpi_inputs(series, payload.report_year),
+    }
+
+
+@router.get("/metrics")
+def kpi_metrics():
+    return {"kpi_cache": kpi_cache.stats(), "columnar": columnar_kpi_processor.stats()}
@@ -1,10 +1,29 @@
-from fastapi import APIRouter
+import json
+import os
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Literal, Optional
 
 from app.templates.layouts import get_layout
-from app.file_export import generate_docx_report, generate_pdf_report
-from app.report_generator import generate_management_report
+from app.artifacts import MEDIA_TYPES, artifact_store, new_spool
+from app.chart_cache import chart_cache
+from app.completion_cache import completion_cache
+from app.llm_gateway import llm_gateway
+from app.file_export import (
+    generate_docx_report,
+    generate_pdf_report,
+    render_document_bytes,
+    write_docx_report,
+    write_pdf_report,
+)
+from app.rendering import render_executor
+from app.report_jobs import SUCCEEDED, QueueFullError, ReportJobQueue
+from app.report_generator import (
+    generate_management_report,
+    generate_management_report_events,
+)
 
 
 class ReportRequest(BaseModel):
@@ -14,84 +33,265 @@ class ReportRequest(BaseModel):
     kpi_data: Dict[str, Any]
     historical_kpi_data: Optional[Dict[str, Any]] = None
     type: str = "pdf"
+    # None uses REPORT_GENERATION_MODE
+    generation_mode: Optional[Literal["sections", "structured"]] = None
 
 
 router = APIRouter(prefix="/report", tags=["report"])
 
 
-@router.post("/")
-async def create_report(payload: ReportRequest):
-
+async def _generate(payload: ReportRequest):
     openai_model = "gpt-4o-mini"
-    layout = get_layout("default")
-
-    kpi_data = payload.kpi_data
-    company_id = payload.company_id
-    year = payload.year
-    company_name = payload.company_name
-    historical_kpi_data = payload.historical_kpi_data
-    type = payload.type
-
     result = await generate_management_report(
-        kpi_data=kpi_data,
-        historical_kpi_data=historical_kpi_data,
+        kpi_data=payload.kpi_data,
+        historical_kpi_data=payload.historical_kpi_data,
         openai_model=openai_model,
+        mode=payload.generation_mode,
     )
+    return result.get("sections", {}), result.get("charts", {}), result.get("generation", {})
 
-    sections = result.get("sections", {})
-    charts = result.get("charts", {})
-    file_name = None
-    file_b64 = None
-
-    if type == "docx":
-        file_name, file_b64 = generate_docx_report(
-            company_id=company_id,
-            year=year,
-            company_name=company_name,
-            kpi_data=kpi_data,
-            charts=charts,
-            executive_summary=sections.get("executive_summary", ""),
-            workforce_composition_and_diversity=sections.get(
-                "workforce_composition_and_diversity", ""
-            ),
-            working_conditions_and_equal_opportunity=sections.get(
-                "working_conditions_and_equal_opportunity", ""
-            ),
-            training_and_development=sections.get("training_and_development", ""),
-            turnover_and_retention=sections.get("turnover_and_retention", ""),
-            health_and_safety=sections.get("health_and_safety", ""),
-            outlook_and_next_steps=sections.get("outlook_and_next_steps", ""),
-            closing=sections.get("closing", ""),
-            layout_template=layout,
-        )
 
-    else:
-        file_name, file_b64 = generate_pdf_report(
-            company_id=company_id,
-            year=year,
-            company_name=company_name,
-            kpi_data=kpi_data,
-            charts=charts,
-            executive_summary=sections.get("executive_summary", ""),
-            workforce_composition_and_diversity=sections.get(
-                "workforce_composition_and_diversity", ""
-            ),
-            working_conditions_and_equal_opportunity=sections.get(
-                "working_conditions_and_equal_opportunity", ""
-            ),
-            training_and_development=sections.get("training_and_development", ""),
-            turnover_and_retention=sections.get("turnover_and_retention", ""),
-            health_and_safety=sections.get("health_and_safety", ""),
-            outlook_and_next_steps=sections.get("outlook_and_next_steps", ""),
-            closing=sections.get("closing", ""),
-            layout_template=layout,
-        )
+def _export_kwargs(
+    payload: ReportRequest, sections: Dict[str, str], charts: Dict[str, Any]
+) -> Dict[str, Any]:
+    return dict(
+        company_id=payload.company_id,
+        year=payload.year,
+        company_name=payload.company_name,
+        kpi_data=payload.kpi_data,
+        charts=charts,
+        executive_summary=sections.get("executive_summary", ""),
+        workforce_composition_and_diversity=sections.get(
+            "workforce_composition_and_diversity", ""
+        ),
+        working_conditions_and_equal_opportunity=sections.get(
+            "working_conditions_and_equal_opportunity", ""
+        ),
+        training_and_development=sections.get("training_and_development", ""),
+        turnover_and_retention=sections.get("turnover_and_retention", ""),
+        health_and_safety=sections.get("health_and_safety", ""),
+        outlook_and_next_steps=sections.get("outlook_and_next_steps", ""),
+        closing=sections.get("closing", ""),
+        layout_template=get_layout("default"),
+    )
+
+
+@router.post("/")
+async def create_report(payload: ReportRequest):
+
+    sections, charts, generation = await _generate(payload)
+
+    export = generate_docx_report if payload.type == "docx" else generate_pdf_report
+
+    # Document assembly is CPU-bound; keep it off the event loop.
+    file_name, file_b64 = await render_executor.run(
+        export, **_export_kwargs(payload, sections, charts)
+    )
 
     return {
         "sections": sections,
         "charts": charts,
+        "generation": generation,
         "file": {
             "name": file_name,
             "base64": file_b64,
         },
     }
+
+
+async def _store_artifact(payload: ReportRequest, sections, charts):
+    kind = "docx" if payload.type == "docx" else "pdf"
+    write = write_docx_report if kind == "docx" else write_pdf_report
+    kwargs = _export_kwargs(payload, sections, charts)
+
+    spool = new_spool()
+    try:
+        if render_executor.kind == "process":
+            # A spooled file can't cross into a worker process; copy the bytes once.
+            file_name, data = await render_executor.run(
+                render_document_bytes, write, **kwargs
+            )
+            spool.write(data)
+        else:
+            file_name = await render_executor.run(write, spool, **kwargs)
+    except Exception:
+        spool.close()
+        raise
+
+    return artifact_store.add(
+        file_name,
+        MEDIA_TYPES[kind],
+        spool,
+        metadata={"company_id": payload.company_id, "year": payload.year},
+    )
+
+
+def _artifact_file(artifact) -> Dict[str, Any]:
+    return {
+        "name": artifact.name,
+        "media_type": artifact.media_type,
+        "size": artifact.size,
+        "url": f"{router.prefix}/artifacts/{artifact.id}",
+    }
+
+
+@router.post("/artifacts")
+async def create_report_artifact(payload: ReportRequest):
+
+    sections, charts, generation = await _generate(payload)
+    artifact = await _store_artifact(payload, sections, charts)
+
+    return {
+        "artifact_id": artifact.id,
+        "file": _artifact_file(artifact),
+        "sections": sections,
+        "charts": sorted(name for name, chart in charts.items() if chart),
+        "generation": generation,
+    }
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/stream")
+async def stream_report(payload: ReportRequest):
+    # Server-Sent Events: "chart" and "section_delta"/"section" events as each
+    # part completes, then "file" once the document is stored as an artifact,
+    # then "done". Failures end the stream with an "error" event.
+    if payload.generation_mode == "structured":
+        # One JSON response for all sections can't be streamed per section
+        raise HTTPException(
+            status_code=400,
+            detail="generation_mode 'structured' is not supported by /report/stream",
+        )
+
+    async def events():
+        try:
+            report = None
+            async for event, data in generate_management_report_events(
+                kpi_data=payload.kpi_data,
+                historical_kpi_data=payload.historical_kpi_data,
+                openai_model="gpt-4o-mini",
+            ):
+                if event == "report":
+                    report = data
+                else:
+                    yield _sse(event, data)
+
+            artifact = await _store_artifact(payload, report["sections"], report["charts"])
+            yield _sse(
+                "file",
+                {
+                    "artifact_id": artifact.id,
+                    "file": _artifact_file(artifact),
+                    "generation": report["generation"],
+                },
+            )
+            yield _sse("done", {})
+        except Exception as exc:
+            yield _sse("error", {"detail": f"{type(exc).__name__}: {exc}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/artifacts/{artifact_id}")
+def download_report_artifact(artifact_id: str):
+    artifact = artifact_store.get(artifact_id)
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Report artifact not found or expired")
+    return StreamingResponse(
+        artifact.iter_bytes(),
+        media_type=artifact.media_type,
+        headers={
+            "Content-Length": str(artifact.size),
+            "Content-Disposition": f'attachment; filename="{artifact.name}"',
+        },
+    )
+
+
+async def _render_report_job(payload_data: Dict[str, Any], out, progress) -> Dict[str, Any]:
+    payload = ReportRequest(**payload_data)
+    progress(10, "generating")
+    sections, charts, generation = await _generate(payload)
+
+    progress(70, "exporting")
+    kind = "docx" if payload.type == "docx" else "pdf"
+    write = write_docx_report if kind == "docx" else write_pdf_report
+    # Already on a job worker thread, so the export can run inline.
+    file_name = write(out, **_export_kwargs(payload, sections, charts))
+    return {
+        "name": file_name,
+        "media_type": MEDIA_TYPES[kind],
+        "sections": sections,
+        "charts": sorted(name for name, chart in charts.items() if chart),
+        "generation": generation,
+    }
+
+
+report_jobs = ReportJobQueue(handler=_render_report_job)
+
+
+def _job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    file_path = job.pop("file_path")
+    file_name = job.pop("file_name")
+    media_type = job.pop("media_type")
+    job["status_url"] = f"{router.prefix}/jobs/{job['job_id']}"
+    job["file"] = None
+    if job["status"] == SUCCEEDED and file_path:
+        job["file"] = {
+            "name": file_name,
+            "media_type": media_type,
+            "size": os.path.getsize(file_path) if os.path.exists(file_path) else None,
+            "url": f"{router.prefix}/jobs/{job['job_id']}/file",
+        }
+    return job
+
+
+@router.post("/jobs", status_code=202)
+def create_report_job(payload: ReportRequest):
+    try:
+        job, created = report_jobs.submit(payload.model_dump())
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    response = _job_response(job)
+    response["deduplicated"] = not created
+    return response
+
+
+@router.get("/jobs/{job_id}")
+def get_report_job(job_id: str):
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return _job_response(job)
+
+
+@router.get("/jobs/{job_id}/file")
+def download_report_job(job_id: str):
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job["status"] != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Report job is {job['status']}")
+    if not job["file_path"] or not os.path.exists(job["file_path"]):
+        raise HTTPException(status_code=410, detail="Report file is no longer available")
+    return FileResponse(
+        job["file_path"], media_type=job["media_type"], filename=job["file_name"]
+    )
+
+
+@router.get("/metrics")
+def report_metrics():
+    return {
+        "render_executor": render_executor.stats(),
+        "chart_cache": chart_cache.stats(),
+        "completion_cache": completion_cache.stats(),
+        "llm": llm_gateway.stats(),
+        "artifacts": artifact_store.stats(),
+        "report_jobs": report_jobs.stats(),
+    }
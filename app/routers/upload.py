@@ -1,49 +1,80 @@
-from datetime import datetime, timezone
+import os
+import shutil
+import tempfile
+import zipfile
 from io import BytesIO
 from fastapi import APIRouter, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
 import pandas as pd
-import sqlalchemy
-
-from app.database import SessionLocal
-from app.models import (
-    FS1_Diversity,
-    FS1_EmployeeTraining,
-    FS1_EmployeeTurnover,
-    FS1_Workforce,
-    FS1_WorkforceComposition,
-    FS1_WorkforceDiversity,
-    FS1_WorkplaceInjuries,
+
+from app.ingest import (
+    INGEST_MODES,
+    ingest_sheet_batches,
+    ingest_sheets,
+    iter_archive_batches,
+    iter_csv_batches,
+    iter_parquet_batches,
+    iter_workbook_batches,
+    open_workbook,
 )
+from app.kpi_cache import kpi_cache
+from app.kpi_columnar import columnar_kpi_processor
 from app.kpi_processor import kpi_processor
+from app.rollups import clear_rollups, refresh_rollups
+
+UPLOAD_SPOOL_CHUNK_SIZE = 1024 * 1024
+UPLOAD_EXTENSIONS = (".xlsx", ".zip", ".csv", ".parquet")
 
 router = APIRouter(prefix="/upload", tags=["upload"])
 
 
-def parse_datekey(datekey):
-    if pd.isna(datekey):
-        return datetime.now()
-    if isinstance(datekey, (datetime, pd.Timestamp)):
-        return datekey
-    datekey_str = str(datekey)
+def _ingest_and_summarize(ingest_fn, mode: str = "replace", source: str = "Excel file"):
+    # Replace mode truncates the FS1 tables in the same transaction as the
+    # inserts, so a file that fails part way through leaves the old rows.
     try:
-        return datetime.strptime(datekey_str, "%Y%m%d")
-    except ValueError:
-        try:
-            return datetime.strptime(datekey_str[:10], "%Y-%m-%d")
-        except ValueError:
-            try:
-                return pd.to_datetime(datekey)
-            except Exception:
-                raise ValueError(f"Cannot parse DateKey: {datekey}")
+        ingest = ingest_fn(mode=mode, truncate=mode == "replace")
+    except Exception as e:
+        return {"error": f"Failed to read {source}: {str(e)}"}
+
+    if mode == "incremental":
+        # Only companies whose rows actually changed lose their cached KPIs.
+        refreshed = ingest["changes"]["changed_company_ids"]
+    else:
+        clear_rollups()
+        # Every table was truncated, so nothing cached before this point is valid.
+        kpi_cache.clear()
+        columnar_kpi_processor.clear()
+        refreshed = ingest["company_ids"]
+
+    # Facts are committed at this point; rebuild the affected rollups before
+    # dropping cached KPIs so the recompute below reads the new rollups.
+    rollups = refresh_rollups(refreshed) if refreshed else None
+    for company_id in refreshed:
+        kpi_cache.invalidate_company(company_id)
+        columnar_kpi_processor.invalidate_company(company_id)
+
+    if not ingest["processed_sheets"]:
+        return {"error": "No valid sheets matched any known model."}
 
+    company_id = ingest["company_id"] or 1
+    result = kpi_processor.get_all_kpi_data(company_id=company_id)
+
+    response = {
+        "message": "Excel processed successfully",
+        "processed_sheets": ingest["processed_sheets"],
+        "skipped_sheets": ingest["skipped_sheets"],
+        "mode": ingest["mode"],
+        "date_issues": ingest["date_issues"],
+        "ingest": ingest["stats"],
+        "rollups": rollups,
+        "kpi_result": result,
+    }
+    if "changes" in ingest:
+        response["changes"] = ingest["changes"]
+    return response
 
-@router.post("/")
-async def upload(file: UploadFile = File(...)):
-    
-    if not file.filename.endswith(".xlsx"):
-        return {"error": "File must be an Excel .xlsx file"}
 
-    contents = await file.read()
+def _process_workbook(contents: bytes, mode: str = "replace"):
     try:
         all_sheets = pd.read_excel(
             BytesIO(contents), sheet_name=None, engine="openpyxl"
@@ -51,197 +82,101 @@ async def upload(file: UploadFile = File(...)):
     except Exception as e:
         return {"error": f"Failed to read Excel file: {str(e)}"}
 
-    MODELS = {
-        "injuries": {
-            "model": FS1_WorkplaceInjuries,
-            "required": [
-                "injuryid",
-                "datekey",
-                "injurycount",
-                "companyid",
-                "countryid",
-                "organizationalunitid",
-                "createdat",
-                "updatedat",
-            ],
-        },
-        "workforce": {
-            "model": FS1_Workforce,
-            "required": [
-                "workforceid",
-                "datekey",
-                "workforcecount",
-                "companyid",
-                "countryid",
-                "organizationalunitid",
-                "createdat",
-                "updatedat",
-            ],
-        },
-        "diversity": {
-            "model": FS1_Diversity,
-            "required": [
-                "DiversityID",
-                "DateKey",
-                "CountryID",
-                "CompanyID",
-                "DisabilityCount",
-                "OrganizationalUnitID",
-                "created_at",
-                "updated_at",
-            ],
-        },
-        "workforcediversity": {
-            "model": FS1_WorkforceDiversity,
-            "required": [
-                "diversityid",
-                "datekey",
-                "countryid",
-                "companyid",
-                "disabilitycount",
-                "organizationalunitid",
-                "createdat",
-                "updatedat",
-            ],
-        },
-        "workforcecomposition": {
-            "model": FS1_WorkforceComposition,
-            "required": [
-                "workforcecompositionid",
-                "datekey",
-                "genderid",
-                "contracttypeid",
-                "countryid",
-                "employeecount",
-                "companyid",
-                "organizationalunitid",
-                "createdat",
-                "updatedat",
-            ],
-        },
-        "employeetraining": {
-            "model": FS1_EmployeeTraining,
-            "required": [
-                "trainingid",
-                "datekey",
-                "totaltraininghours",
-                "companyid",
-                "countryid",
-                "organizationalunitid",
-                "createdat",
-                "updatedat",
-            ],
-        },
-        "employeeturnover": {
-            "model": FS1_EmployeeTurnover,
-            "required": [
-                "turnoverid",
-                "datekey",
-                "genderid",
-                "agegroupid",
-                "employeesdeparted",
-                "companyid",
-                "contracttypeid",
-                "countryid",
-                "organizationalunitid",
-                "createdat",
-                "updatedat",
-            ],
-        },
-    }
+    return _ingest_and_summarize(
+        lambda **options: ingest_sheets(all_sheets.items(), **options), mode
+    )
 
-    processed = []
-    skipped = []
-
-    def map_record_to_model(record, model_cls):
-        mapped = {}
-        for col in model_cls.__table__.columns:
-            col_lower = col.name.lower()
-            if col_lower in record:
-                value = record[col_lower]
-                if isinstance(col.type, sqlalchemy.DateTime):
-                    value = parse_datekey(value)
-                mapped[col.name] = value
-            elif col_lower in ("createdat", "created_at"):
-                mapped[col.name] = datetime.now(timezone.utc)
-            elif col_lower in ("updatedat", "updated_at"):
-                mapped[col.name] = datetime.now(timezone.utc)
-        return mapped
-
-    with SessionLocal() as db:
-        tables_to_clear = [
-            FS1_WorkplaceInjuries,
-            FS1_Workforce,
-            FS1_Diversity,
-            FS1_WorkforceDiversity,
-            FS1_WorkforceComposition,
-            FS1_EmployeeTraining,
-            FS1_EmployeeTurnover,
-        ]
-
-        for table in tables_to_clear:
-            db.query(table).delete()
-        db.commit()
-
-        for sheet_name, df in all_sheets.items():
-            print(f"Processing sheet: {sheet_name}")
-            df.columns = (
-                df.columns.str.strip()
-                .str.replace(" ", "")
-                .str.replace("_", "")
-                .str.lower()
-            )
-
-            matched_model = None
-            for key, info in MODELS.items():
-                required = [c.lower() for c in info["required"]]
-                if all(col in df.columns for col in required):
-                    matched_model = info
-                    break
-
-            if not matched_model:
-                print(f"No matching model found for sheet '{sheet_name}'")
-                skipped.append(sheet_name)
-                continue
-
-            ModelClass = matched_model["model"]
-            print(f"Matched '{sheet_name}' → {ModelClass.__name__}")
-
-            for _, row in df.iterrows():
-                record_data = {col: row.get(col) for col in matched_model["required"]}
-                mapped_data = map_record_to_model(record_data, ModelClass)
-                instance = ModelClass(**mapped_data)
-                db.add(instance)
-
-            db.commit()
-            processed.append(sheet_name)
-
-    if not processed:
-        return {"error": "No valid sheets matched any known model."}
 
-    first_valid_df = list(all_sheets.values())[0]
-    company_id = int(first_valid_df.iloc[0].get("companyid", 1))
-
-    year = None
-    for df in all_sheets.values():
-        for col in df.columns:
-            if str(col).lower() in ("datekey",):
-                try:
-                    
-                    sample = str(df.iloc[0][col])
-                    if len(sample) >= 4:
-                        year = int(sample[:4])
-                        break
-                except Exception:
-                    pass
-        if year:
-            break
+def _process_workbook_file(path: str, mode: str = "replace"):
+    try:
+        workbook = open_workbook(path)
+    except Exception as e:
+        return {"error": f"Failed to read Excel file: {str(e)}"}
 
-    result = kpi_processor.get_all_kpi_data(company_id=company_id)
+    try:
+        return _ingest_and_summarize(
+            lambda **options: ingest_sheet_batches(iter_workbook_batches(workbook), **options),
+            mode,
+        )
+    finally:
+        workbook.close()
 
-    return {
-        "message": "Excel processed successfully",
-        "processed_sheets": processed,
-        "skipped_sheets": skipped,
-        "kpi_result": result,
-    }
+
+def _process_archive_file(path: str, mode: str = "replace"):
+    try:
+        archive = zipfile.ZipFile(path)
+    except Exception as e:
+        return {"error": f"Failed to read zip archive: {str(e)}"}
+
+    with archive:
+        return _ingest_and_summarize(
+            lambda **options: ingest_sheet_batches(iter_archive_batches(archive), **options),
+            mode,
+            "zip archive",
+        )
+
+
+def _process_table_file(path: str, filename: str, mode: str = "replace"):
+    stem, ext = os.path.splitext(os.path.basename(filename))
+    ext = ext.lower()
+    try:
+        if ext == ".parquet":
+            batches = iter_parquet_batches(path)
+        else:
+            batches = iter_csv_batches(lambda: open(path, "rb"))
+        first = next(batches)
+    except Exception as e:
+        return {"error": f"Failed to read {ext.lstrip('.')} file: {str(e)}"}
+
+    def all_batches():
+        yield first
+        yield from batches
+
+    return _ingest_and_summarize(
+        lambda **options: ingest_sheet_batches([(stem, all_batches())], **options),
+        mode,
+        f"{ext.lstrip('.')} file",
+    )
+
+
+def _spool_upload(source, suffix: str) -> str:
+    # Copies the upload to a named file chunk by chunk. Blocking disk I/O,
+    # so it runs in the threadpool like the ingest that follows.
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spool:
+        try:
+            shutil.copyfileobj(source, spool, UPLOAD_SPOOL_CHUNK_SIZE)
+        except BaseException:
+            spool.close()
+            os.remove(spool.name)
+            raise
+    return spool.name
+
+
+@router.post("/")
+async def upload(
+    file: UploadFile = File(...), streaming: bool = True, mode: str = "replace"
+):
+
+    if mode not in INGEST_MODES:
+        return {"error": f"mode must be one of: {', '.join(INGEST_MODES)}"}
+
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    if ext not in UPLOAD_EXTENSIONS:
+        return {"error": "File must be an Excel .xlsx, .zip of CSV/Parquet, .csv or .parquet file"}
+
+    if not streaming and ext == ".xlsx":
+        contents = await file.read()
+        # Parsing, inserting and the KPI recompute are all blocking work.
+        return await run_in_threadpool(_process_workbook, contents, mode)
+
+    # Spool to disk chunk by chunk; the workbook is then read row batch by
+    # row batch, so neither the upload nor a whole sheet is held in memory.
+    path = await run_in_threadpool(_spool_upload, file.file, ext)
+    try:
+        if ext == ".xlsx":
+            return await run_in_threadpool(_process_workbook_file, path, mode)
+        if ext == ".zip":
+            return await run_in_threadpool(_process_archive_file, path, mode)
+        return await run_in_threadpool(_process_table_file, path, file.filename, mode)
+    finally:
+        os.remove(path)
@@ -1,30 +1,38 @@
-from typing import Dict
+import json
+import math
+import os
+from typing import Any, Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:  # optional; falls back to a character heuristic
+    tiktoken = None
 
 
 SECTION_GUIDANCE: Dict[str, str] = {
     "executive_summary": (
-        "Write a formal executive summary (max 3 sentences) that provides an overview of the "
+        "Write a formal executive summary (max 5 sentences) that provides an overview of the "
         "company's ESRS S1 performance, highlighting key metrics and trends."
     ),
     "workforce_composition_and_diversity": (
         "Analyze workforce composition and diversity metrics (S1-1, S1-9) with gender distribution, "
-        "inclusion considerations, and any material imbalances (max 3 sentences)."
+        "inclusion considerations, and any material imbalances (max 5 sentences)."
     ),
     "working_conditions_and_equal_opportunity": (
         "Discuss working conditions and equal opportunity policies and outcomes, referencing S1-2 and S1-3 "
-        "where applicable (max 3 sentences)."
+        "where applicable (max 5 sentences)."
     ),
     "training_and_development": (
         "Analyze training and development metrics, referencing S1-13 and observed trends in capability "
-        "building (max 3 sentences)."
+        "building (max 5 sentences)."
     ),
     "turnover_and_retention": (
         "Interpret turnover and retention dynamics with potential drivers, aligned with ESRS S1 concepts "
-        "(max 3 sentences)."
+        "(max 5 sentences)."
     ),
     "health_and_safety": (
         "Summarize workplace health and safety metrics with emphasis on safe working environments, referencing "
-        "S1-14 where relevant (max 3 sentences)."
+        "S1-14 where relevant (max 5 sentences)."
     ),
     "outlook_and_next_steps": (
         "Outline management's next steps to improve performance across S1 topics with clear follow-up actions "
@@ -49,3 +57,135 @@ def build_section_prompt(section_name: str, kpi_json: str, hist_json: str) -> st
     )
 
 
+# ---- Compact prompt context ----
+# Each section only sees the KPIs it discusses, long breakdowns are cut to
+# the top N entries plus an aggregate of the rest, and floats are rounded,
+# so prompt size no longer grows with the number of org units.
+
+PROMPT_TOP_N = int(os.getenv("PROMPT_TOP_N", "5"))
+PROMPT_FLOAT_DIGITS = 2
+
+ALL_KPIS = [
+    "Total Workforce by Gender",
+    "Percentage of Employees with Disabilities",
+    "Employee Turnover Rate",
+    "Average Training Hours per Employee",
+    "Workplace Injury Rate",
+    "Workforce by Gender by Organizational Unit",
+    "Employee Turnover Rate by Organizational Unit",
+]
+# Headline KPIs for the sections that summarise the whole report
+SUMMARY_KPIS = [
+    "Total Workforce by Gender",
+    "Percentage of Employees with Disabilities",
+    "Employee Turnover Rate",
+    "Average Training Hours per Employee",
+    "Workplace Injury Rate",
+]
+SECTION_KPIS: Dict[str, List[str]] = {
+    "executive_summary": SUMMARY_KPIS,
+    "workforce_composition_and_diversity": [
+        "Total Workforce by Gender",
+        "Percentage of Employees with Disabilities",
+        "Workforce by Gender by Organizational Unit",
+    ],
+    "working_conditions_and_equal_opportunity": [
+        "Total Workforce by Gender",
+        "Percentage of Employees with Disabilities",
+        "Average Training Hours per Employee",
+    ],
+    "training_and_development": ["Average Training Hours per Employee"],
+    "turnover_and_retention": [
+        "Employee Turnover Rate",
+        "Employee Turnover Rate by Organizational Unit",
+    ],
+    "health_and_safety": ["Workplace Injury Rate"],
+    "outlook_and_next_steps": SUMMARY_KPIS,
+    "closing": SUMMARY_KPIS,
+}
+# Fields used to rank entries of a long breakdown, in order of preference
+_RANK_FIELDS = (
+    "employee_count",
+    "total_employees",
+    "total_employees_departed",
+    "total_training_hours",
+)
+
+
+def _entry_weight(entry: Dict[str, Any]) -> float:
+    if isinstance(entry.get("genders"), list):
+        return sum(float(g.get("employee_count") or 0) for g in entry["genders"])
+    for field in _RANK_FIELDS:
+        if isinstance(entry.get(field), (int, float)):
+            return float(entry[field])
+    return 0.0
+
+
+def _sum_numeric(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    totals: Dict[str, float] = {}
+    for entry in entries:
+        for key, value in entry.items():
+            # Rates and IDs don't add up; counts and hours do
+            if (
+                isinstance(value, (int, float))
+                and not isinstance(value, bool)
+                and not key.endswith(("ID", "rate", "percentage", "average_hours_per_employee"))
+            ):
+                totals[key] = totals.get(key, 0) + value
+        if isinstance(entry.get("genders"), list):
+            totals["employee_count"] = totals.get("employee_count", 0) + _entry_weight(entry)
+    return totals
+
+
+def condense(value: Any, top_n: int = PROMPT_TOP_N) -> Any:
+    if isinstance(value, float):
+        return round(value, PROMPT_FLOAT_DIGITS)
+    if isinstance(value, dict):
+        return {key: condense(item, top_n) for key, item in value.items()}
+    if isinstance(value, list):
+        if len(value) > top_n and all(isinstance(item, dict) for item in value):
+            ranked = sorted(value, key=_entry_weight, reverse=True)
+            rest = ranked[top_n:]
+            return {
+                "top": [condense(item, top_n) for item in ranked[:top_n]],
+                "others": condense(
+                    {"count": len(rest), "totals": _sum_numeric(rest)}, top_n
+                ),
+            }
+        return [condense(item, top_n) for item in value]
+    return value
+
+
+def build_prompt_context(
+    section_name: Optional[str],
+    kpi_data: Optional[Dict[str, Any]],
+    historical_kpi_data: Optional[Dict[str, Any]] = None,
+    top_n: int = PROMPT_TOP_N,
+) -> Dict[str, Any]:
+    # Relevant, condensed KPI data for one section (None: every section's KPIs).
+    # Keys outside the known KPI set are passed through for every section.
+    relevant = SECTION_KPIS.get(section_name, ALL_KPIS) if section_name else ALL_KPIS
+
+    def select(data):
+        data = data or {}
+        return {
+            key: condense(value, top_n)
+            for key, value in data.items()
+            if key in relevant or key not in ALL_KPIS
+        }
+
+    return {"kpi": select(kpi_data), "historical": select(historical_kpi_data)}
+
+
+def compact_json(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def estimate_tokens(text: str) -> int:
+    if tiktoken is not None:
+        try:
+            return len(tiktoken.get_encoding("o200k_base").encode(text))
+        except Exception:
+            pass
+    # ~4 characters per token for English text and JSON
+    return math.ceil(len(text) / 4)
@@ -6,12 +6,25 @@ import matplotlib.patches as patches
 from matplotlib.patches import Wedge
 import numpy as np
 
+from app.chart_cache import chart_cache, chart_cache_key
 
-def create_default_workforce_pie_chart(workforce_data: List[Dict[str, Any]]) -> str:
+# Passed to each renderer and folded into the chart cache key, as
+# chart_engine does with CHART_RENDER_PARAMS
+VISUAL_RENDER_PARAMS: Dict[str, Dict[str, Any]] = {
+    "create_default_workforce_pie_chart": {"figsize": (6, 6), "dpi": 200},
+    "create_default_training_hours_chart": {"figsize": (8, 5), "dpi": 200},
+    "create_default_trend_chart": {"figsize": (6, 4), "dpi": 200},
+    "create_default_kpi_summary_chart": {"figsize": (10, 6), "dpi": 200},
+}
+
+
+def create_default_workforce_pie_chart(
+    workforce_data: List[Dict[str, Any]], figsize=(6, 6), dpi: int = 200
+) -> str:
     if not workforce_data:
 
         # Create empty chart
-        fig, ax = plt.subplots(figsize=(6, 6))
+        fig, ax = plt.subplots(figsize=figsize)
         ax.text(0.5, 0.5, 'No Data Available', ha='center', va='center', 
                 transform=ax.transAxes, fontsize=14, color='gray')
         ax.set_xlim(0, 1)
@@ -24,7 +37,7 @@ def create_default_workforce_pie_chart(workforce_data: List[Dict[str, Any]]) ->
         # Filter out zero values
         non_zero_data = [(label, size) for label, size in zip(labels, sizes) if size > 0]
         if not non_zero_data:
-            fig, ax = plt.subplots(figsize=(6, 6))
+            fig, ax = plt.subplots(figsize=figsize)
             ax.text(0.5, 0.5, 'No Data Available', ha='center', va='center', 
                     transform=ax.transAxes, fontsize=14, color='gray')
             ax.set_xlim(0, 1)
@@ -33,7 +46,7 @@ def create_default_workforce_pie_chart(workforce_data: List[Dict[str, Any]]) ->
         else:
             labels, sizes = zip(*non_zero_data)
             
-            fig, ax = plt.subplots(figsize=(6, 6))
+            fig, ax = plt.subplots(figsize=figsize)
             colors = ['#4C78A8', '#59A14F', '#E74C3C', '#F39C12', '#9B59B6', '#1ABC9C']
             
             wedges, texts, autotexts = ax.pie(
@@ -58,14 +71,16 @@ def create_default_workforce_pie_chart(workforce_data: List[Dict[str, Any]]) ->
                 autotext.set_fontsize(10)
     
     plt.tight_layout()
-    return _fig_to_base64_png(fig)
+    return _fig_to_base64_png(fig, dpi=dpi)
 
 
-def create_default_training_hours_chart(training_data: List[Dict[str, Any]]) -> str:
+def create_default_training_hours_chart(
+    training_data: List[Dict[str, Any]], figsize=(8, 5), dpi: int = 200
+) -> str:
 
     if not training_data:
         # Create empty chart
-        fig, ax = plt.subplots(figsize=(8, 5))
+        fig, ax = plt.subplots(figsize=figsize)
         ax.text(0.5, 0.5, 'No Data Available', ha='center', va='center', 
                 transform=ax.transAxes, fontsize=14, color='gray')
         ax.set_xlim(0, 1)
@@ -78,7 +93,7 @@ def create_default_training_hours_chart(training_data: List[Dict[str, Any]]) ->
         # Filter out zero values
         non_zero_data = [(label, value) for label, value in zip(labels, values) if value > 0]
         if not non_zero_data:
-            fig, ax = plt.subplots(figsize=(8, 5))
+            fig, ax = plt.subplots(figsize=figsize)
             ax.text(0.5, 0.5, 'No Data Available', ha='center', va='center', 
                     transform=ax.transAxes, fontsize=14, color='gray')
             ax.set_xlim(0, 1)
@@ -87,7 +102,7 @@ def create_default_training_hours_chart(training_data: List[Dict[str, Any]]) ->
         else:
             labels, values = zip(*non_zero_data)
             
-            fig, ax = plt.subplots(figsize=(8, 5))
+            fig, ax = plt.subplots(figsize=figsize)
             bars = ax.bar(labels, values, color='#4C78A8', alpha=0.8, edgecolor='#2E5B8A', linewidth=1)
             
             # Add value labels on bars
@@ -108,21 +123,27 @@ def create_default_training_hours_chart(training_data: List[Dict[str, Any]]) ->
             ax.spines['bottom'].set_linewidth(0.5)
     
     plt.tight_layout()
-    return _fig_to_base64_png(fig)
+    return _fig_to_base64_png(fig, dpi=dpi)
 
 
-def create_default_trend_chart(current_value: float, prior_value: Optional[float], title: str = "Training Hours Trend") -> str:
+def create_default_trend_chart(
+    current_value: float,
+    prior_value: Optional[float],
+    title: str = "Training Hours Trend",
+    figsize=(6, 4),
+    dpi: int = 200,
+) -> str:
 
     if prior_value is None:
         # Create single value chart
-        fig, ax = plt.subplots(figsize=(6, 4))
+        fig, ax = plt.subplots(figsize=figsize)
         ax.text(0.5, 0.5, 'No Historical Data Available', ha='center', va='center', 
                 transform=ax.transAxes, fontsize=14, color='gray')
         ax.set_xlim(0, 1)
         ax.set_ylim(0, 1)
         ax.axis('off')
     else:
-        fig, ax = plt.subplots(figsize=(6, 4))
+        fig, ax = plt.subplots(figsize=figsize)
         
         periods = ['Prior Period', 'Current Period']
         values = [prior_value, current_value]
@@ -155,12 +176,14 @@ def create_default_trend_chart(current_value: float, prior_value: Optional[float
         ax.spines['bottom'].set_linewidth(0.5)
     
     plt.tight_layout()
-    return _fig_to_base64_png(fig)
+    return _fig_to_base64_png(fig, dpi=dpi)
 
 
-def create_default_kpi_summary_chart(kpi_data: Dict[str, Any]) -> str:
+def create_default_kpi_summary_chart(
+    kpi_data: Dict[str, Any], figsize=(10, 6), dpi: int = 200
+) -> str:
 
-    fig, ax = plt.subplots(figsize=(10, 6))
+    fig, ax = plt.subplots(figsize=figsize)
     
     # Extract key metrics
     metrics = []
@@ -219,7 +242,18 @@ def create_default_kpi_summary_chart(kpi_data: Dict[str, Any]) -> str:
         ax.spines['bottom'].set_linewidth(0.5)
     
     plt.tight_layout()
-    return _fig_to_base64_png(fig)
+    return _fig_to_base64_png(fig, dpi=dpi)
+
+
+def _cached_chart(render, *args) -> str:
+    params = VISUAL_RENDER_PARAMS[render.__name__]
+    key = chart_cache_key(f"visuals.{render.__name__}", args, params)
+    png = chart_cache.get(key)
+    if png is not None:
+        return base64.b64encode(png).decode('utf-8')
+    encoded = render(*args, **params)
+    chart_cache.set(key, base64.b64decode(encoded))
+    return encoded
 
 
 def generate_default_charts(kpi_data: Dict[str, Any], historical_kpi_data: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
@@ -227,12 +261,12 @@ def generate_default_charts(kpi_data: Dict[str, Any], historical_kpi_data: Optio
 
     workforce_data = kpi_data.get("Total Workforce by Gender", [])
     if workforce_data:
-        charts["workforce_by_gender"] = create_default_workforce_pie_chart(workforce_data)
+        charts["workforce_by_gender"] = _cached_chart(create_default_workforce_pie_chart, workforce_data)
 
     training_data = kpi_data.get("Average Training Hours per Employee", {})
     if training_data and training_data.get("breakdown_by_gender"):
-        charts["training_hours_by_gender"] = create_default_training_hours_chart(
-            training_data["breakdown_by_gender"]
+        charts["training_hours_by_gender"] = _cached_chart(
+            create_default_training_hours_chart, training_data["breakdown_by_gender"]
         )
 
     current_training = training_data.get("overall_average_hours") if training_data else None
@@ -244,20 +278,21 @@ def generate_default_charts(kpi_data: Dict[str, Any], historical_kpi_data: Optio
     
     if current_training is not None:
         if prior_training is not None:
-            charts["trend_training_hours_per_employee"] = create_default_trend_chart(
+            charts["trend_training_hours_per_employee"] = _cached_chart(
+                create_default_trend_chart,
                 current_training, prior_training, "Average Training Hours - Year over Year"
             )
         else:
             charts["trend_training_hours_per_employee"] = None
             
-    charts["kpi_summary"] = create_default_kpi_summary_chart(kpi_data)
+    charts["kpi_summary"] = _cached_chart(create_default_kpi_summary_chart, kpi_data)
     
     return charts
 
 
-def _fig_to_base64_png(fig) -> str:
+def _fig_to_base64_png(fig, dpi: int = 200) -> str:
     buffer = io.BytesIO()
-    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=200, 
+    fig.savefig(buffer, format='png', bbox_inches='tight', dpi=dpi, 
                 facecolor='white', edgecolor='none')
     plt.close(fig)
     buffer.seek(0)
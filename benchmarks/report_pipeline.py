@@ -0,0 +1,274 @@
+"""
+Benchmarks end-to-end report generation offline: KPI aggregation on a
+synthetic SQLite database, chart rendering, LLM sections against the local
+completion backend, and PDF export, for N reports at a given concurrency.
+Nothing leaves the process, so no OPENAI_API_KEY or network access is needed.
+
+Usage: python -m benchmarks.report_pipeline [--reports 20] [--concurrency 4]
+       [--latency-ms 800] [--jitter-ms 400] [--distribution lognormal]
+       [--failure-rate 0.0] [--mode sections]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sqlalchemy.orm import sessionmaker
+
+from app import models  # noqa: F401
+from app import report_generator
+from app.completion_cache import CompletionCache
+from app.database import Base, create_db_engine
+from app.file_export import render_document_bytes, write_pdf_report
+from app.kpi_processor import build_kpi_payloads, kpi_processor
+from app.llm_backends import LATENCY_DISTRIBUTIONS, LocalCompletionClient
+from app.llm_gateway import ConcurrencyLimiter, TokenBucket, llm_gateway
+from app.models import (
+    D_OrganizationalUnit,
+    FS1_EmployeeTraining,
+    FS1_EmployeeTurnover,
+    FS1_WorkforceComposition,
+    FS1_WorkforceDiversity,
+    FS1_WorkplaceInjuries,
+)
+from app.rendering import render_executor
+
+STAGES = ("kpi", "charts", "llm", "export", "total")
+YEARS = (2023, 2024)
+
+
+def _seed(engine, companies: int, org_units: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    fact_models = (
+        FS1_WorkforceComposition,
+        FS1_EmployeeTurnover,
+        FS1_EmployeeTraining,
+        FS1_WorkplaceInjuries,
+        FS1_WorkforceDiversity,
+    )
+    rows = {model: [] for model in fact_models}
+    units = []
+    for company_id in range(1, companies + 1):
+        for unit in range(org_units):
+            ou = company_id * 1000 + unit
+            units.append(
+                {
+                    "OrganizationalUnitID": ou,
+                    "OrganizationalUnitName": f"Unit {ou}",
+                    "CompanyID": company_id,
+                    "is_deleted": 0,
+                }
+            )
+            for year in YEARS:
+                for country in (1, 2):
+                    base = {
+                        "CompanyID": company_id,
+                        "OrganizationalUnitID": ou,
+                        "CountryID": country,
+                        "Year": year,
+                        "DateKey": year * 10000 + 101,
+                    }
+                    for gender in (1, 2, 3, 5):
+                        rows[FS1_WorkforceComposition].append(
+                            dict(
+                                base,
+                                GenderID=gender,
+                                ContractTypeID=1,
+                                EmployeeCount=rng.randint(5, 80),
+                            )
+                        )
+                        rows[FS1_EmployeeTurnover].append(
+                            dict(
+                                base,
+                                GenderID=gender,
+                                AgeGroupID=1,
+                                ContractTypeID=1,
+                                EmployeesDeparted=rng.randint(0, 8),
+                            )
+                        )
+                    rows[FS1_EmployeeTraining].append(
+                        dict(base, TotalTrainingHours=round(rng.uniform(50, 900), 1))
+                    )
+                    rows[FS1_WorkforceDiversity].append(
+                        dict(base, DisabilityCount=rng.randint(0, 12))
+                    )
+                    # Injuries keep a DateTime DateKey
+                    rows[FS1_WorkplaceInjuries].append(
+                        dict(base, DateKey=datetime(year, 1, 1), InjuryCount=rng.randint(0, 4))
+                    )
+    with engine.begin() as conn:
+        conn.execute(D_OrganizationalUnit.__table__.insert(), units)
+        for model, batch in rows.items():
+            conn.execute(model.__table__.insert(), batch)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "mean": statistics.fmean(ordered),
+        "max": ordered[-1],
+    }
+
+
+async def _run_report(session_factory, company_id, client, mode, timings) -> None:
+    started = time.perf_counter()
+
+    # KPIs through the same fused SQL path as KPIProcessor.get_all_kpi_data
+    stage = time.perf_counter()
+    with session_factory() as db:
+        kpi_data = build_kpi_payloads(
+            kpi_processor.fetch_base_aggregates(db, company_id, [YEARS[-1]])
+        )
+        historical = build_kpi_payloads(
+            kpi_processor.fetch_base_aggregates(db, company_id, [YEARS[-2]])
+        )
+    timings["kpi"].append(time.perf_counter() - stage)
+
+    result = await report_generator.generate_management_report(
+        kpi_data, historical_kpi_data=historical, client=client, mode=mode
+    )
+    # Charts and LLM sections overlap; each is timed on its own
+    timings["charts"].append(result["generation"]["timings"]["charts_seconds"])
+    timings["llm"].append(result["generation"]["timings"]["llm_seconds"])
+
+    stage = time.perf_counter()
+    await render_executor.run(
+        render_document_bytes,
+        write_pdf_report,
+        company_id=company_id,
+        year=YEARS[-1],
+        company_name=None,
+        kpi_data=kpi_data,
+        charts=result["charts"],
+        **result["sections"],
+    )
+    timings["export"].append(time.perf_counter() - stage)
+    timings["total"].append(time.perf_counter() - started)
+
+
+async def run(
+    reports: int = 20,
+    concurrency: int = 4,
+    org_units: int = 20,
+    latency_ms: float = 800,
+    jitter_ms: float = 400,
+    distribution: str = "lognormal",
+    failure_rate: float = 0.0,
+    mode: str = "sections",
+    llm_concurrency: int = 64,
+    rate_per_second: float = 0,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    client = LocalCompletionClient(
+        latency_ms=latency_ms,
+        jitter_ms=jitter_ms,
+        distribution=distribution,
+        failure_rate=failure_rate,
+        seed=seed,
+    )
+    # Every run measures real generation: no cached completions from earlier
+    # runs, and gateway limits set for the benchmark instead of production.
+    report_generator.completion_cache = CompletionCache(path=None)
+    llm_gateway.limiter = ConcurrencyLimiter(llm_concurrency)
+    llm_gateway.bucket = TokenBucket(rate_per_second, max(1, int(rate_per_second)))
+    llm_gateway.reset_stats()
+
+    timings = {stage: [] for stage in STAGES}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        _seed(engine, companies=reports, org_units=org_units, seed=seed)
+        session_factory = sessionmaker(bind=engine)
+
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one(company_id):
+            async with gate:
+                await _run_report(session_factory, company_id, client, mode, timings)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(company_id) for company_id in range(1, reports + 1)))
+        wall = time.perf_counter() - started
+        engine.dispose()
+
+    gateway = llm_gateway.stats()["sections"]
+    return {
+        "reports": reports,
+        "concurrency": concurrency,
+        "wall_seconds": wall,
+        "reports_per_second": reports / wall,
+        "stages": {stage: _percentiles(values) for stage, values in timings.items()},
+        "llm": {
+            **client.stats(),
+            "retries": sum(s["retries"] for s in gateway.values()),
+            "failed_sections": sum(s["failures"] for s in gateway.values()),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--reports", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--org-units", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=400)
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--mode", choices=report_generator.GENERATION_MODES, default="sections")
+    parser.add_argument("--llm-concurrency", type=int, default=64)
+    parser.add_argument("--rate", type=float, default=0, help="LLM requests/second, 0 = unlimited")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(
+        f"{args.reports} reports, concurrency {args.concurrency}, "
+        f"{args.distribution} LLM latency {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, "
+        f"failure rate {args.failure_rate:.0%}, mode {args.mode}"
+    )
+    result = asyncio.run(
+        run(
+            reports=args.reports,
+            concurrency=args.concurrency,
+            org_units=args.org_units,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            distribution=args.distribution,
+            failure_rate=args.failure_rate,
+            mode=args.mode,
+            llm_concurrency=args.llm_concurrency,
+            rate_per_second=args.rate,
+            seed=args.seed,
+        )
+    )
+    print(f"{'stage':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'mean':>9} {'max':>9}  (ms)")
+    for stage, stats in result["stages"].items():
+        cells = " ".join(f"{stats[k] * 1000:9.1f}" for k in ("p50", "p95", "p99", "mean", "max"))
+        print(f"{stage:>8} {cells}")
+    print(
+        f"throughput: {result['reports_per_second']:.2f} reports/s "
+        f"({result['wall_seconds']:.2f} s wall)"
+    )
+    llm = result["llm"]
+    print(
+        f"llm: {llm['calls']} calls, {llm['failures']} injected failures, "
+        f"{llm['retries']} retries, {llm['failed_sections']} sections fell back"
+    )
+    render_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmarks the legacy string-cast year predicate against the indexed Year
+column on a synthetic FS1_WorkforceComposition table.
+
+Usage: python -m benchmarks.year_filter [rows]
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import String, create_engine, func, select
+
+from app import models  # noqa: F401
+from app.database import Base
+from app.models import FS1_WorkforceComposition
+
+YEARS = list(range(2015, 2025))
+
+
+def _seed(engine, rows: int) -> None:
+    rng = random.Random(0)
+    table = FS1_WorkforceComposition.__table__
+    batch = []
+    with engine.begin() as conn:
+        for i in range(1, rows + 1):
+            year = rng.choice(YEARS)
+            batch.append(
+                {
+                    "WorkforceCompositionID": i,
+                    "DateKey": year * 10000 + rng.randint(1, 12) * 100 + 1,
+                    "Year": year,
+                    "GenderID": rng.randint(1, 5),
+                    "ContractTypeID": rng.randint(1, 3),
+                    "CountryID": rng.randint(1, 20),
+                    "EmployeeCount": rng.randint(1, 50),
+                    "CompanyID": rng.randint(1, 50),
+                    "OrganizationalUnitID": rng.randint(1, 200),
+                }
+            )
+            if len(batch) == 50000:
+                conn.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(table.insert(), batch)
+        conn.exec_driver_sql("ANALYZE")
+
+
+def _time(engine, statement, repeat: int = 5):
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN "
+            + str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+        ).fetchall()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(statement).all()
+            timings.append(time.perf_counter() - started)
+    return min(timings), [row[-1] for row in plan]
+
+
+def main(rows: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        print(f"Seeding {rows:,} FS1_WorkforceComposition rows...")
+        _seed(engine, rows)
+
+        years = [2023]
+        wc = FS1_WorkforceComposition
+        base = select(wc.GenderID, func.sum(wc.EmployeeCount)).group_by(wc.GenderID)
+        legacy = base.where(
+            func.substring(func.cast(wc.DateKey, String), 1, 4).in_(
+                [str(y) for y in years]
+            )
+        )
+        indexed = base.where(wc.Year.in_(years))
+
+        for label, statement in (("string cast", legacy), ("Year index", indexed)):
+            best, plan = _time(engine, statement)
+            print(f"{label:>12}: {best * 1000:8.1f} ms  plan={plan}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -1,14 +1,22 @@
 import asyncio
 import base64
 import io
+import os
 import tempfile
 from typing import Dict, Any, Optional
 import pytest
+import pandas as pd
 from unittest.mock import AsyncMock, MagicMock, patch
 from docx import Document
 from reportlab.pdfgen import canvas
 from PIL import Image
 
+# Importing app.main migrates the default database, which is the repo's own
+# app.db; tests get a throwaway one so the committed file is never rewritten.
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/app.db"
+)
+
 # Mock data for testing
 SAMPLE_KPI_DATA = {
     "Total Workforce by Gender": [
@@ -168,3 +176,182 @@ def sample_charts():
 @pytest.fixture
 def sample_sections():
     return SAMPLE_SECTIONS.copy()
+
+
+@pytest.fixture
+def sqlite_engine(tmp_path):
+    from app import models  # noqa: F401
+    from app.database import Base, create_db_engine
+
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _fact_sheets(company_id, id_offset, years):
+    composition, diversity, training, turnover, injuries = [], [], [], [], []
+    row_id = id_offset
+    for year in years:
+        for ou in (1, 2, 3):
+            for country in (3, 4):
+                row_id += 1
+                for gender in (1, 2, 5):
+                    composition.append(
+                        {
+                            "WorkforceCompositionID": row_id * 10 + gender,
+                            "DateKey": year * 10000 + 101,
+                            "GenderID": gender,
+                            "ContractTypeID": 1 + gender % 2,
+                            "CountryID": country,
+                            "EmployeeCount": 10 * ou + gender + year % 10,
+                            "CompanyID": company_id,
+                            "OrganizationalUnitID": ou,
+                            "CreatedAt": "2024-01-01",
+                            "UpdatedAt": "2024-01-01",
+                        }
+                    )
+                    turnover.append(
+                        {
+                            "TurnoverID": row_id * 10 + gender,
+                            "DateKey": year * 10000 + 101,
+                            "GenderID": gender,
+                            "AgeGroupID": 1,
+                            "EmployeesDeparted": ou + gender,
+                            "CompanyID": company_id,
+                            "ContractTypeID": 1,
+                            "CountryID": country,
+                            "OrganizationalUnitID": ou,
+                            "CreatedAt": "2024-01-01",
+                            "UpdatedAt": "2024-01-01",
+                        }
+                    )
+                diversity.append(
+                    {
+                        "DiversityID": row_id,
+                        "DateKey": year * 10000 + 101,
+                        "CountryID": country,
+                        "CompanyID": company_id,
+                        "DisabilityCount": ou + country,
+                        "OrganizationalUnitID": ou,
+                        "CreatedAt": "2024-01-01",
+                        "UpdatedAt": "2024-01-01",
+                    }
+                )
+                training.append(
+                    {
+                        "TrainingID": row_id,
+                        "DateKey": year * 10000 + 101,
+                        "TotalTrainingHours": 12.5 * ou + country,
+                        "CompanyID": company_id,
+                        "CountryID": country,
+                        "OrganizationalUnitID": ou,
+                        "CreatedAt": "2024-01-01",
+                        "UpdatedAt": "2024-01-01",
+                    }
+                )
+                injuries.append(
+                    {
+                        "InjuryID": row_id,
+                        "DateKey": f"{year}-01-01",
+                        "InjuryCount": ou,
+                        "CompanyID": company_id,
+                        "CountryID": country,
+                        "OrganizationalUnitID": ou,
+                        "CreatedAt": "2024-01-01",
+                        "UpdatedAt": "2024-01-01",
+                    }
+                )
+    return [
+        ("WorkforceComposition", pd.DataFrame(composition)),
+        ("WorkforceDiversity", pd.DataFrame(diversity)),
+        ("EmployeeTraining", pd.DataFrame(training)),
+        ("EmployeeTurnover", pd.DataFrame(turnover)),
+        ("Injuries", pd.DataFrame(injuries)),
+    ]
+
+
+@pytest.fixture
+def kpi_engine(sqlite_engine, monkeypatch):
+    from sqlalchemy.orm import sessionmaker
+    from app import kpi_columnar as columnar_module
+    from app import kpi_processor as kpi_module
+    from app.ingest import ingest_sheets
+    from app.kpi_cache import kpi_cache
+    from app.models import D_OrganizationalUnit
+
+    with sqlite_engine.begin() as conn:
+        conn.execute(
+            D_OrganizationalUnit.__table__.insert(),
+            [
+                {"OrganizationalUnitID": 1, "OrganizationalUnitName": "HR", "CompanyID": 1, "is_deleted": 0},
+                {"OrganizationalUnitID": 2, "OrganizationalUnitName": "Engineering", "CompanyID": 1, "is_deleted": 0},
+                {"OrganizationalUnitID": 3, "OrganizationalUnitName": "Legacy", "CompanyID": 1, "is_deleted": 1},
+            ],
+        )
+    for company_id, offset in ((1, 0), (2, 1000)):
+        ingest_sheets(_fact_sheets(company_id, offset, (2023, 2024)), bind=sqlite_engine)
+
+    session_factory = sessionmaker(bind=sqlite_engine)
+    monkeypatch.setattr(kpi_module, "SessionLocal", session_factory)
+    monkeypatch.setattr(columnar_module, "SessionLocal", session_factory)
+    kpi_cache.clear()
+    columnar_module.columnar_kpi_processor.clear()
+    yield sqlite_engine
+    kpi_cache.clear()
+    columnar_module.columnar_kpi_processor.clear()
+
+
+class StubCompletionClient:
+    """Offline stand-in for AsyncOpenAI that counts chat completion calls."""
+
+    def __init__(self, content: str = "Stub narrative."):
+        from types import SimpleNamespace
+
+        self.content = content
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        from types import SimpleNamespace
+
+        self.calls.append(kwargs)
+        if kwargs.get("stream"):
+            return self._stream(self.content)
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    async def _stream(self, content):
+        from types import SimpleNamespace
+
+        # One chunk per word, like a provider streaming tokens
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            delta = SimpleNamespace(content=word if i == len(words) - 1 else word + " ")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+@pytest.fixture
+def unthrottled_llm_gateway(monkeypatch):
+    from app.llm_gateway import TokenBucket, llm_gateway
+
+    # Stubbed calls are free; don't let the provider rate limit slow tests down
+    monkeypatch.setattr(llm_gateway, "bucket", TokenBucket(0, 1))
+    return llm_gateway
+
+
+@pytest.fixture
+def stub_llm_client(unthrottled_llm_gateway):
+    return StubCompletionClient()
+
+
+@pytest.fixture(autouse=True)
+def isolated_completion_cache(tmp_path, monkeypatch):
+    # Every test gets its own cache, so none writes to the default path
+    from app import report_generator
+    from app.completion_cache import CompletionCache
+
+    cache = CompletionCache(path=str(tmp_path / "completions.db"))
+    monkeypatch.setattr(report_generator, "completion_cache", cache)
+    yield cache
+    cache.close()
@@ -0,0 +1,387 @@
+"""
+Tests the bulk ingest path used by the /upload endpoint.
+
+"""
+
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import select, func
+
+from app.ingest import ingest_sheets, to_datetime_column
+from app.models import FS1_WorkforceComposition, FS1_WorkplaceInjuries
+
+
+def _composition_sheet(rows):
+    return pd.DataFrame(
+        {
+            "Workforce Composition ID": range(1, rows + 1),
+            "Date_Key": [20240101] * rows,
+            "GenderID": [1, 2] * (rows // 2),
+            "ContractTypeID": [1] * rows,
+            "CountryID": [3] * rows,
+            "EmployeeCount": [10] * rows,
+            "CompanyID": [7] * rows,
+            "OrganizationalUnitID": [1] * rows,
+            "CreatedAt": ["2024-01-01"] * rows,
+            "UpdatedAt": ["20240102"] * rows,
+        }
+    )
+
+
+class TestBulkIngest:
+
+    def test_sheets_are_matched_and_inserted_in_chunks(self, sqlite_engine):
+        injuries = pd.DataFrame(
+            {
+                "InjuryID": [1, 2],
+                "DateKey": ["2024-03-01", None],
+                "InjuryCount": [2, 0],
+                "CompanyID": [7, 7],
+                "CountryID": [3, 3],
+                "OrganizationalUnitID": [1, 1],
+                "CreatedAt": ["2024-03-01", "2024-03-01"],
+                "UpdatedAt": ["2024-03-01", "2024-03-01"],
+            }
+        )
+        unknown = pd.DataFrame({"foo": [1]})
+
+        result = ingest_sheets(
+            [
+                ("Composition", _composition_sheet(10)),
+                ("Injuries", injuries),
+                ("Notes", unknown),
+            ],
+            chunk_size=3,
+            bind=sqlite_engine,
+        )
+
+        assert result["processed_sheets"] == ["Composition", "Injuries"]
+        assert result["skipped_sheets"] == ["Notes"]
+        assert result["company_id"] == 7
+        assert result["stats"]["rows"] == 12
+        assert result["stats"]["chunk_size"] == 3
+        assert result["stats"]["rows_per_second"] > 0
+
+        with sqlite_engine.connect() as conn:
+            count, total = conn.execute(
+                select(
+                    func.count(),
+                    func.sum(FS1_WorkforceComposition.EmployeeCount),
+                )
+            ).one()
+            created = conn.execute(
+                select(FS1_WorkforceComposition.CreatedAt).limit(1)
+            ).scalar()
+            injury_dates = conn.execute(
+                select(FS1_WorkplaceInjuries.DateKey).order_by(
+                    FS1_WorkplaceInjuries.InjuryID
+                )
+            ).scalars().all()
+
+        assert count == 10
+        assert total == 100
+        assert created == datetime(2024, 1, 1)
+        assert injury_dates[0] == datetime(2024, 3, 1)
+        # Missing dates are reported, not stamped with the current time
+        assert injury_dates[1] is None
+        assert result["date_issues"] == [
+            {
+                "sheet": "Injuries",
+                "column": "DateKey",
+                "missing_count": 1,
+                "unparseable_count": 0,
+                "missing_rows": [1],
+                "unparseable_rows": [],
+            }
+        ]
+
+    def test_vectorized_dates_parse_each_input_form(self):
+        values = pd.Series(
+            [20240115, "2024-02-03", "2024-02-03T10:00:00", pd.Timestamp("2023-05-06 07:08")],
+            dtype=object,
+        )
+
+        converted = to_datetime_column(values)
+
+        assert converted.tolist() == [
+            datetime(2024, 1, 15),
+            datetime(2024, 2, 3),
+            datetime(2024, 2, 3),
+            datetime(2023, 5, 6, 7, 8),
+        ]
+
+    def test_date_format_is_detected_per_column_and_bad_rows_reported(self):
+        from app.ingest import normalize_date_column
+
+        values = pd.Series(["03/01/2024", None, "2024-13-45", "2024-02-03"], index=[10, 11, 12, 13])
+        assert normalize_date_column(pd.Series([20240101, 20240102]))["format"] == "%Y%m%d"
+
+        result = normalize_date_column(values)
+
+        assert result["format"] == "%Y-%m-%d"
+        assert result["values"].tolist() == [datetime(2024, 3, 1), None, None, datetime(2024, 2, 3)]
+        assert result["missing"] == [11]
+        assert result["unparseable"] == [12]
+
+    def test_streaming_workbook_matches_dataframe_ingest(self, sqlite_engine, tmp_path):
+        from sqlalchemy import create_engine
+
+        from app.database import Base
+        from app.ingest import ingest_sheet_batches, iter_workbook_batches, open_workbook
+
+        path = tmp_path / "upload.xlsx"
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            _composition_sheet(10).to_excel(writer, sheet_name="Composition", index=False)
+            pd.DataFrame({"foo": [1]}).to_excel(writer, sheet_name="Notes", index=False)
+
+        workbook = open_workbook(path)
+        try:
+            streamed = ingest_sheet_batches(
+                iter_workbook_batches(workbook, batch_size=4), bind=sqlite_engine
+            )
+        finally:
+            workbook.close()
+
+        reference_engine = create_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+        Base.metadata.create_all(reference_engine)
+        ingest_sheets(
+            pd.read_excel(path, sheet_name=None).items(), bind=reference_engine
+        )
+
+        assert streamed["processed_sheets"] == ["Composition"]
+        assert streamed["skipped_sheets"] == ["Notes"]
+        assert streamed["stats"]["rows"] == 10
+        assert streamed["stats"]["batches"] == 3
+
+        table = FS1_WorkforceComposition.__table__
+        query = select(table).order_by(table.c.WorkforceCompositionID)
+        with sqlite_engine.connect() as conn, reference_engine.connect() as ref:
+            assert conn.execute(query).all() == ref.execute(query).all()
+
+    def test_zipped_csv_and_parquet_match_dataframe_ingest(self, sqlite_engine, tmp_path):
+        import zipfile
+
+        from sqlalchemy import create_engine
+
+        from app.database import Base
+        from app.ingest import csv_dtypes, ingest_sheet_batches, iter_archive_batches
+
+        composition = _composition_sheet(10)
+        injuries = pd.DataFrame(
+            {
+                "InjuryID": [1, 2, 3],
+                "DateKey": pd.to_datetime(["2024-03-01", "2024-04-01", "2024-05-01"]),
+                "InjuryCount": [2, 0, 5],
+                "CompanyID": [7, 7, 7],
+                "CountryID": [3, 3, 3],
+                "OrganizationalUnitID": [1, 1, 2],
+                "CreatedAt": ["2024-03-01"] * 3,
+                "UpdatedAt": ["2024-03-01"] * 3,
+            }
+        )
+        bundle = tmp_path / "drop.zip"
+        injuries.to_parquet(tmp_path / "injuries.parquet", index=False)
+        with zipfile.ZipFile(bundle, "w") as archive:
+            archive.writestr("drop/composition.csv", composition.to_csv(index=False))
+            archive.write(tmp_path / "injuries.parquet", "drop/injuries.parquet")
+            archive.writestr("drop/readme.txt", "notes")
+
+        dtypes = csv_dtypes(composition.columns)
+        assert dtypes["EmployeeCount"] == "Int64"
+        assert dtypes["Date_Key"] is object
+
+        with zipfile.ZipFile(bundle) as archive:
+            result = ingest_sheet_batches(
+                iter_archive_batches(archive, batch_size=4), bind=sqlite_engine
+            )
+
+        reference_engine = create_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+        Base.metadata.create_all(reference_engine)
+        ingest_sheets(
+            [("composition", composition), ("injuries", injuries)],
+            bind=reference_engine,
+        )
+
+        assert result["processed_sheets"] == ["composition", "injuries"]
+        assert result["skipped_sheets"] == ["readme"]
+        assert result["stats"]["rows"] == 13
+        assert result["stats"]["batches"] == 4
+
+        for model in (FS1_WorkforceComposition, FS1_WorkplaceInjuries):
+            table = model.__table__
+            # Injuries stamp created_at/updated_at at ingest time
+            columns = [c for c in table.columns if c.name not in ("created_at", "updated_at")]
+            query = select(*columns).order_by(*table.primary_key.columns)
+            with sqlite_engine.connect() as conn, reference_engine.connect() as ref:
+                assert conn.execute(query).all() == ref.execute(query).all()
+
+    def test_incremental_mode_upserts_and_replaces_only_covered_slices(self, sqlite_engine):
+        baseline = _composition_sheet(10)
+        other_company = _composition_sheet(2).assign(
+            **{"Workforce Composition ID": [101, 102], "CompanyID": [8, 8]}
+        )
+        other_year = _composition_sheet(2).assign(
+            **{"Workforce Composition ID": [201, 202], "Date_Key": [20230101] * 2}
+        )
+        ingest_sheets(
+            [("a", baseline), ("b", other_company), ("c", other_year)], bind=sqlite_engine
+        )
+
+        drop = _composition_sheet(10).iloc[:8].copy()
+        drop.loc[1, "EmployeeCount"] = 99
+        drop = pd.concat(
+            [drop, _composition_sheet(2).iloc[:1].assign(**{"Workforce Composition ID": [11]})],
+            ignore_index=True,
+        )
+        result = ingest_sheets([("Composition", drop)], bind=sqlite_engine, mode="incremental")
+
+        changes = result["changes"]
+        assert result["mode"] == "incremental"
+        assert (changes["inserted"], changes["updated"], changes["unchanged"], changes["deleted"]) == (1, 1, 7, 2)
+        assert changes["by_table"]["FS1_WorkforceComposition"]["deleted"] == 2
+        assert changes["changed_company_ids"] == [7]
+
+        with sqlite_engine.connect() as conn:
+            rows = dict(
+                conn.execute(
+                    select(
+                        FS1_WorkforceComposition.WorkforceCompositionID,
+                        FS1_WorkforceComposition.EmployeeCount,
+                    )
+                ).all()
+            )
+        assert sorted(rows) == [1, 2, 3, 4, 5, 6, 7, 8, 11, 101, 102, 201, 202]
+        assert rows[2] == 99
+
+        again = ingest_sheets([("Composition", drop)], bind=sqlite_engine, mode="incremental")
+        assert again["changes"]["unchanged"] == 9
+        assert again["changes"]["changed_company_ids"] == []
+
+    def test_row_moving_between_companies_refreshes_both(self, kpi_engine, monkeypatch):
+        from app import rollups as rollups_module
+        from app.kpi_columnar import columnar_kpi_processor
+        from app.kpi_processor import kpi_processor
+        from app.routers import upload as upload_module
+        from tests.conftest import _fact_sheets
+
+        monkeypatch.setattr(rollups_module, "engine", kpi_engine)
+        rollups_module.refresh_rollups([1, 2])
+        before = {c: kpi_processor.get_all_kpi_data(c, [2024]) for c in (1, 2)}
+        for company_id in (1, 2):
+            columnar_kpi_processor.get_all_kpi_data(company_id, [2024])
+
+        def composition(company_id, offset):
+            sheet = _fact_sheets(company_id, offset, (2023, 2024))[0][1]
+            return sheet[sheet["DateKey"] // 10000 == 2024]
+
+        # Company 2's 2024 composition, plus one of company 1's rows moved over
+        moved = composition(1, 0).iloc[:1].assign(CompanyID=2)
+        drop = pd.concat([composition(2, 1000), moved], ignore_index=True)
+        result = upload_module._ingest_and_summarize(
+            lambda **options: ingest_sheets(
+                [("WorkforceComposition", drop)], bind=kpi_engine, **options
+            ),
+            "incremental",
+        )
+
+        assert result["changes"]["changed_company_ids"] == [1, 2]
+        for company_id in (1, 2):
+            fresh = kpi_processor.get_all_kpi_data(
+                company_id, [2024], use_cache=False, use_rollups=False
+            )
+            assert fresh != before[company_id]
+            assert kpi_processor.get_all_kpi_data(company_id, [2024]) == fresh
+            assert columnar_kpi_processor.get_all_kpi_data(company_id, [2024]) == fresh
+
+    def test_failed_replace_ingest_keeps_previous_rows(self, sqlite_engine):
+        import pytest
+
+        from app.ingest import ingest_sheet_batches
+
+        ingest_sheets([("Composition", _composition_sheet(10))], bind=sqlite_engine)
+
+        def batches():
+            yield _composition_sheet(4)
+            raise ValueError("corrupt row batch")
+
+        with pytest.raises(ValueError, match="corrupt row batch"):
+            ingest_sheet_batches([("Composition", batches())], bind=sqlite_engine, truncate=True)
+
+        table = FS1_WorkforceComposition.__table__
+        with sqlite_engine.connect() as conn:
+            assert conn.execute(select(func.count()).select_from(table)).scalar() == 10
+
+        ingest_sheet_batches(
+            [("Composition", iter([_composition_sheet(4)]))], bind=sqlite_engine, truncate=True
+        )
+        with sqlite_engine.connect() as conn:
+            assert conn.execute(select(func.count()).select_from(table)).scalar() == 4
+
+    def test_upload_failing_mid_stream_keeps_previous_rows(
+        self, sqlite_engine, tmp_path, monkeypatch
+    ):
+        import zipfile
+
+        from app import ingest as ingest_module
+        from app.routers import upload as upload_module
+
+        monkeypatch.setattr(ingest_module, "engine", sqlite_engine)
+        monkeypatch.setattr(ingest_module, "INGEST_CHUNK_SIZE", 4)
+        ingest_sheets([("Composition", _composition_sheet(10))], bind=sqlite_engine)
+
+        # The bad EmployeeCount only turns up in the third CSV chunk
+        drop = _composition_sheet(12).astype({"EmployeeCount": object})
+        drop.loc[10, "EmployeeCount"] = "n/a"
+        csv_path = tmp_path / "composition.csv"
+        drop.to_csv(csv_path, index=False)
+        bundle = tmp_path / "drop.zip"
+        with zipfile.ZipFile(bundle, "w") as archive:
+            archive.writestr("composition.csv", _composition_sheet(4).to_csv(index=False))
+            archive.writestr("injuries.parquet", b"not a parquet file")
+
+        result = upload_module._process_table_file(str(csv_path), "composition.csv")
+        assert result["error"].startswith("Failed to read csv file")
+        result = upload_module._process_archive_file(str(bundle))
+        assert result["error"].startswith("Failed to read zip archive")
+
+        table = FS1_WorkforceComposition.__table__
+        with sqlite_engine.connect() as conn:
+            assert conn.execute(select(func.count()).select_from(table)).scalar() == 10
+
+    def test_upload_is_spooled_off_the_event_loop(self, kpi_engine, monkeypatch):
+        import asyncio
+
+        from fastapi.testclient import TestClient
+
+        from app import ingest as ingest_module
+        from app import rollups as rollups_module
+        from app.main import app
+        from app.routers import upload as upload_module
+
+        monkeypatch.setattr(ingest_module, "engine", kpi_engine)
+        monkeypatch.setattr(rollups_module, "engine", kpi_engine)
+        loops = []
+        spool = upload_module._spool_upload
+
+        def recording_spool(source, suffix):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return spool(source, suffix)
+
+        monkeypatch.setattr(upload_module, "_spool_upload", recording_spool)
+        body = _composition_sheet(10).to_csv(index=False).encode()
+        response = TestClient(app).post(
+            "/upload/?mode=incremental", files={"file": ("composition.csv", body, "text/csv")}
+        )
+
+        assert response.json()["processed_sheets"] == ["composition"]
+        assert loops == [None]
+        table = FS1_WorkforceComposition.__table__
+        with kpi_engine.connect() as conn:
+            count = conn.execute(
+                select(func.count()).select_from(table).where(table.c.CompanyID == 7)
+            ).scalar()
+        assert count == 10
@@ -0,0 +1,141 @@
+"""
+Tests the chart rendering engine used by generate_management_report.
+
+"""
+
+import asyncio
+
+import pytest
+
+import app.chart_engine as chart_engine_module
+from app.chart_cache import ChartCache
+from app.chart_engine import ChartRenderEngine
+from app.report_generator import _chart_jobs
+from tests.conftest import SAMPLE_HISTORICAL_KPI_DATA, SAMPLE_KPI_DATA
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class TestChartRenderEngine:
+
+    def test_in_process_rendering_returns_png_bytes(self):
+        engine = ChartRenderEngine(max_workers=0, cache=None)
+        jobs = _chart_jobs(SAMPLE_KPI_DATA, SAMPLE_HISTORICAL_KPI_DATA)
+
+        rendered = asyncio.run(engine.render_async(jobs))
+
+        assert set(rendered) == {
+            "workforce_by_gender",
+            "training_hours_by_gender",
+            "trend_training_hours_per_employee",
+        }
+        assert all(png.startswith(PNG_SIGNATURE) for png in rendered.values())
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reports_render_in_isolated_workers(self):
+        engine = ChartRenderEngine(max_workers=2, cache=None)
+        reference = ChartRenderEngine(max_workers=0, cache=None)
+        other_kpis = {
+            "Total Workforce by Gender": [
+                {"gender": "Male", "employee_count": 1},
+                {"gender": "Female", "employee_count": 99},
+            ]
+        }
+        try:
+            first, second = await asyncio.gather(
+                engine.render_async(_chart_jobs(SAMPLE_KPI_DATA, None)),
+                engine.render_async(_chart_jobs(other_kpis, None)),
+            )
+        finally:
+            engine.shutdown()
+
+        assert first == await reference.render_async(_chart_jobs(SAMPLE_KPI_DATA, None))
+        assert second == await reference.render_async(_chart_jobs(other_kpis, None))
+        assert first["workforce_by_gender"] != second["workforce_by_gender"]
+
+
+class TestChartCache:
+
+    def _counting_renderer(self, monkeypatch):
+        calls = []
+        original = chart_engine_module.render_chart_png
+
+        def counting(kind, args):
+            calls.append(kind)
+            return original(kind, args)
+
+        monkeypatch.setattr(chart_engine_module, "render_chart_png", counting)
+        return calls
+
+    def test_identical_inputs_render_once(self, monkeypatch):
+        calls = self._counting_renderer(monkeypatch)
+        engine = ChartRenderEngine(max_workers=0, cache=ChartCache(max_entries=8))
+        jobs = _chart_jobs(SAMPLE_KPI_DATA, SAMPLE_HISTORICAL_KPI_DATA)
+
+        first = asyncio.run(engine.render_async(jobs))
+        second = asyncio.run(engine.render_async(jobs))
+
+        assert first == second
+        assert len(calls) == len(jobs)
+        assert engine.cache.stats()["memory_hits"] == len(jobs)
+
+        other = {"Total Workforce by Gender": [{"gender": "Male", "employee_count": 7}]}
+        asyncio.run(engine.render_async(_chart_jobs(other, None)))
+        assert len(calls) == len(jobs) + 1
+
+    def test_disk_tier_survives_a_new_cache(self, monkeypatch, tmp_path):
+        calls = self._counting_renderer(monkeypatch)
+        jobs = _chart_jobs(SAMPLE_KPI_DATA, None)
+
+        first = asyncio.run(
+            ChartRenderEngine(
+                max_workers=0, cache=ChartCache(max_entries=1, directory=str(tmp_path))
+            ).render_async(jobs)
+        )
+        fresh = ChartCache(max_entries=1, directory=str(tmp_path))
+        second = asyncio.run(ChartRenderEngine(max_workers=0, cache=fresh).render_async(jobs))
+
+        assert first == second
+        assert len(calls) == len(jobs)
+        assert fresh.stats()["disk_hits"] == len(jobs)
+
+    def test_disk_tier_is_read_off_the_event_loop(self, tmp_path):
+        import threading
+
+        cache = ChartCache(max_entries=8, directory=str(tmp_path))
+        engine = ChartRenderEngine(max_workers=0, cache=cache)
+        jobs = _chart_jobs(SAMPLE_KPI_DATA, None)
+        threads = []
+        lookup = cache.get
+
+        def recording_get(key):
+            threads.append(threading.current_thread())
+            return lookup(key)
+
+        cache.get = recording_get
+        asyncio.run(engine.render_async(jobs))
+        assert threads and threading.main_thread() not in threads
+
+    def test_visual_cache_keys_follow_the_render_params(self, monkeypatch):
+        import base64
+        import io
+
+        from PIL import Image
+
+        from app.templates import visuals
+
+        monkeypatch.setattr(visuals, "chart_cache", ChartCache(max_entries=8))
+        args = (12.0, 9.0, "Training")
+        default = visuals._cached_chart(visuals.create_default_trend_chart, *args)
+        assert default == visuals.create_default_trend_chart(*args)
+
+        monkeypatch.setitem(
+            visuals.VISUAL_RENDER_PARAMS,
+            "create_default_trend_chart",
+            {"figsize": (3, 2), "dpi": 50},
+        )
+        small = visuals._cached_chart(visuals.create_default_trend_chart, *args)
+        sizes = [
+            Image.open(io.BytesIO(base64.b64decode(png))).size for png in (default, small)
+        ]
+        assert sizes[1][0] < sizes[0][0]
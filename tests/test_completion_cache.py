@@ -0,0 +1,91 @@
+"""
+Tests the persistent LLM completion cache used for narrative sections.
+
+"""
+
+import time
+
+import pytest
+
+from app.completion_cache import CompletionCache
+from app.report_generator import generate_management_report
+from tests.conftest import SAMPLE_HISTORICAL_KPI_DATA, SAMPLE_KPI_DATA, StubCompletionClient
+
+
+class TestCompletionCache:
+
+    @pytest.mark.asyncio
+    async def test_regenerating_a_report_makes_no_llm_calls(
+        self, stub_llm_client, isolated_completion_cache
+    ):
+        first = await generate_management_report(
+            kpi_data=SAMPLE_KPI_DATA,
+            historical_kpi_data=SAMPLE_HISTORICAL_KPI_DATA,
+            client=stub_llm_client,
+        )
+        assert len(stub_llm_client.calls) == 8
+
+        second = await generate_management_report(
+            kpi_data=SAMPLE_KPI_DATA,
+            historical_kpi_data=SAMPLE_HISTORICAL_KPI_DATA,
+            client=stub_llm_client,
+        )
+        assert len(stub_llm_client.calls) == 8
+        assert second["sections"] == first["sections"]
+        assert isolated_completion_cache.stats()["hits"] == 8
+
+        # A different model is a different cache entry
+        await generate_management_report(
+            kpi_data=SAMPLE_KPI_DATA,
+            historical_kpi_data=SAMPLE_HISTORICAL_KPI_DATA,
+            openai_model="gpt-4o",
+            client=stub_llm_client,
+        )
+        assert len(stub_llm_client.calls) == 16
+
+    @pytest.mark.asyncio
+    async def test_empty_completions_are_not_cached(self, isolated_completion_cache):
+        client = StubCompletionClient(content="")
+        await generate_management_report(kpi_data=SAMPLE_KPI_DATA, client=client)
+        await generate_management_report(kpi_data=SAMPLE_KPI_DATA, client=client)
+
+        assert len(client.calls) == 16
+        assert isolated_completion_cache.stats()["entries"] == 0
+
+    def test_ttl_and_size_eviction(self, tmp_path):
+        cache = CompletionCache(path=str(tmp_path / "c.db"), ttl_seconds=60, max_entries=2)
+        keys = [cache.make_key("m", [{"role": "user", "content": str(i)}]) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.set(key, "m", f"text {i}")
+
+        assert cache.get(keys[0]) is None
+        assert cache.get(keys[2]) == "text 2"
+
+        cache.ttl_seconds = 0.01
+        time.sleep(0.02)
+        assert cache.get(keys[2]) is None
+        assert cache.stats()["entries"] == 1
+        cache.close()
+
+    def test_hits_batch_their_access_time_writes(self, tmp_path):
+        cache = CompletionCache(path=str(tmp_path / "c.db"), max_entries=2, touch_batch=2)
+        keys = [cache.make_key("m", [{"role": "user", "content": str(i)}]) for i in range(3)]
+        cache.set(keys[0], "m", "text 0")
+        cache.set(keys[1], "m", "text 1")
+
+        def accessed(key):
+            return cache._connect().execute(
+                "SELECT accessed_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()[0]
+
+        stored = accessed(keys[0])
+        assert cache.get(keys[0]) == "text 0"
+        assert accessed(keys[0]) == stored
+
+        # The pending touch lands before the next store evicts, so the
+        # entry read last survives
+        cache.set(keys[2], "m", "text 2")
+        assert cache.get(keys[0]) == "text 0"
+        assert cache.get(keys[1]) is None
+        assert accessed(keys[0]) > stored
+        cache.close()
@@ -0,0 +1,49 @@
+from sqlalchemy import text
+
+from app.database import create_db_engine, engine_options
+
+
+class TestEngineFactory:
+
+    def test_sqlite_pragmas_applied_on_connect(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+        try:
+            with engine.connect() as conn:
+                pragma = lambda name: conn.execute(text(f"PRAGMA {name}")).scalar()
+                assert pragma("journal_mode") == "wal"
+                assert pragma("synchronous") == 1  # NORMAL
+                assert pragma("cache_size") == -64000
+                assert pragma("temp_store") == 2  # MEMORY
+                assert pragma("busy_timeout") == 5000
+                assert pragma("mmap_size") > 0
+        finally:
+            engine.dispose()
+
+    def test_reads_proceed_during_a_write_transaction(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'wal.db'}")
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("CREATE TABLE t (v INTEGER)"))
+                conn.execute(text("INSERT INTO t VALUES (1)"))
+
+            writer = engine.connect()
+            transaction = writer.begin()
+            writer.execute(text("INSERT INTO t VALUES (2)"))
+            # Without WAL this read would wait on the writer's lock
+            with engine.connect() as reader:
+                assert reader.execute(text("SELECT COUNT(*) FROM t")).scalar() == 1
+            transaction.commit()
+            writer.close()
+        finally:
+            engine.dispose()
+
+    def test_pool_options_per_backend(self, monkeypatch):
+        postgres = engine_options("postgresql+psycopg2://user:pw@db/esg", pool_size=40)
+        assert postgres["pool_size"] == 40
+        assert postgres["pool_pre_ping"] is True
+        assert "connect_args" not in postgres
+
+        sqlite_file = engine_options("sqlite:///./app.db")
+        assert sqlite_file["connect_args"]["check_same_thread"] is False
+        assert "pool_size" in sqlite_file
+        assert "pool_size" not in engine_options("sqlite://")
@@ -0,0 +1,457 @@
+"""
+Tests the KPIProcessor queries against a seeded SQLite database.
+
+"""
+
+import itertools
+import shutil
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.kpi_cache import KPICache, kpi_cache
+from app.kpi_columnar import ColumnarKPIProcessor
+from app.kpi_processor import KPI_DEFINITIONS, kpi_processor, report_kpi_inputs
+from app.migrations import apply_migrations
+from app.rollups import clear_rollups, refresh_rollups
+
+
+class TestYearFiltering:
+
+    def test_year_filter_uses_precomputed_year(self, kpi_engine):
+        result = kpi_processor.get_total_workforce_by_gender(1, years=[2024])
+
+        assert result == [
+            {"gender": "Male", "employee_count": 80},
+            {"gender": "Female", "employee_count": 84},
+            {"gender": "Other", "employee_count": 96},
+        ]
+
+    def test_year_predicate_is_an_index_search(self, kpi_engine):
+        with kpi_engine.connect() as conn:
+            plan = conn.execute(
+                text(
+                    'EXPLAIN QUERY PLAN SELECT SUM("EmployeeCount") '
+                    'FROM "FS1_WorkforceComposition" WHERE "Year" IN (2024)'
+                )
+            ).fetchall()
+
+        assert any("USING" in row[-1] and "INDEX" in row[-1] for row in plan)
+
+    def test_migration_adds_and_backfills_year(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    'CREATE TABLE "FS1_WorkforceComposition" ('
+                    '"WorkforceCompositionID" INTEGER PRIMARY KEY, "DateKey" INTEGER NOT NULL, '
+                    '"GenderID" INTEGER NOT NULL, "ContractTypeID" INTEGER NOT NULL, '
+                    '"CountryID" INTEGER NOT NULL, "EmployeeCount" INTEGER NOT NULL, '
+                    '"CompanyID" INTEGER NOT NULL, "OrganizationalUnitID" INTEGER NOT NULL, '
+                    '"CreatedAt" DATETIME, "UpdatedAt" DATETIME)'
+                )
+            )
+            conn.execute(
+                text(
+                    'INSERT INTO "FS1_WorkforceComposition" VALUES '
+                    "(1, 20230615, 1, 1, 3, 5, 1, 1, NULL, NULL), "
+                    "(2, 2025, 2, 1, 3, 5, 1, 1, NULL, NULL)"
+                )
+            )
+
+        apply_migrations(engine)
+
+        with engine.connect() as conn:
+            years = conn.execute(
+                text('SELECT "Year" FROM "FS1_WorkforceComposition" ORDER BY 1')
+            ).scalars().all()
+        indexes = {
+            ix["name"] for ix in inspect(engine).get_indexes("FS1_WorkforceComposition")
+        }
+
+        assert years == [2023, 2025]
+        assert "ix_FS1_WorkforceComposition_Year" in indexes
+        engine.dispose()
+
+
+class TestKPIIndexes:
+
+    def test_gender_sum_runs_on_covering_index(self, kpi_engine):
+        with kpi_engine.connect() as conn:
+            plan = conn.execute(
+                text(
+                    'EXPLAIN QUERY PLAN SELECT "GenderID", SUM("EmployeeCount") '
+                    'FROM "FS1_WorkforceComposition" '
+                    'WHERE "CompanyID" = 1 AND "Year" IN (2024) GROUP BY "GenderID"'
+                )
+            ).fetchall()
+
+        details = " ".join(row[-1] for row in plan)
+        assert "COVERING INDEX ix_FS1_WorkforceComposition_kpi" in details
+
+    def test_migration_creates_kpi_indexes(self, kpi_engine):
+        apply_migrations(kpi_engine)
+        inspector = inspect(kpi_engine)
+
+        for table in (
+            "FS1_WorkforceComposition",
+            "FS1_WorkforceDiversity",
+            "FS1_EmployeeTraining",
+            "FS1_EmployeeTurnover",
+            "FS1_WorkplaceInjuries",
+        ):
+            names = {ix["name"] for ix in inspector.get_indexes(table)}
+            assert f"ix_{table}_kpi" in names
+        names = {ix["name"] for ix in inspector.get_indexes("D_OrganizationalUnit")}
+        assert "ix_D_OrganizationalUnit_is_deleted" in names
+
+    def test_committed_database_migrates_to_current_schema(self, tmp_path):
+        # app.db stays at its original schema; startup migrations bring it up
+        # to date instead of committing a regenerated binary.
+        path = tmp_path / "app.db"
+        shutil.copy(Path(__file__).resolve().parents[1] / "app.db", path)
+        engine = create_engine(f"sqlite:///{path}")
+        apply_migrations(engine)
+        inspector = inspect(engine)
+
+        for table in Base.metadata.sorted_tables:
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            assert {c.name for c in table.columns} <= columns, table.name
+            indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+            assert {ix.name for ix in table.indexes} <= indexes, table.name
+        engine.dispose()
+
+
+class TestFusedKPIData:
+
+    def test_fused_matches_per_kpi_queries(self, kpi_engine):
+        for years, org_units, country in itertools.product(
+            [None, [2024], [2023, 2024]], [None, [1], [2, 3]], [None, 4]
+        ):
+            fused = kpi_processor.get_all_kpi_data(
+                1, years, org_units, country, use_cache=False
+            )
+            separate = kpi_processor.get_all_kpi_data(
+                1, years, org_units, country, fused=False, use_cache=False
+            )
+            assert fused == separate, (years, org_units, country)
+
+    def test_fused_issues_a_handful_of_queries(self, kpi_engine):
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(kpi_engine, "before_cursor_execute", count)
+        try:
+            kpi_processor.get_all_kpi_data(
+                1, years=[2024], use_cache=False, use_rollups=False
+            )
+            fused_count = len(statements)
+            statements.clear()
+            kpi_processor.get_all_kpi_data(
+                1, years=[2024], fused=False, use_cache=False
+            )
+            separate_count = len(statements)
+        finally:
+            event.remove(kpi_engine, "before_cursor_execute", count)
+
+        assert fused_count == 4
+        assert separate_count > fused_count
+
+
+class TestKPIRollups:
+
+    def _statements(self, engine, fn):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            result = fn()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        return result, " ".join(statements)
+
+    def test_rollups_match_fact_aggregation(self, kpi_engine):
+        refreshed = refresh_rollups(bind=kpi_engine)
+        assert refreshed["companies"] == [1, 2]
+
+        for years, org_units, country in itertools.product(
+            [None, [2024], [2023, 2024]], [None, [1], [2, 3]], [None, 4]
+        ):
+            from_rollups, sql = self._statements(
+                kpi_engine,
+                lambda: kpi_processor.get_all_kpi_data(
+                    1, years, org_units, country, use_cache=False
+                ),
+            )
+            from_facts = kpi_processor.get_all_kpi_data(
+                1, years, org_units, country, use_cache=False, use_rollups=False
+            )
+            assert from_rollups == from_facts, (years, org_units, country)
+            assert '"R_Workforce"' in sql and '"FS1_WorkforceComposition"' not in sql
+
+    def test_stale_rollups_fall_back_to_facts(self, kpi_engine):
+        refresh_rollups([2], bind=kpi_engine)
+
+        _, sql = self._statements(
+            kpi_engine, lambda: kpi_processor.get_all_kpi_data(1, use_cache=False)
+        )
+        assert '"FS1_WorkforceComposition"' in sql
+
+        clear_rollups(bind=kpi_engine)
+        _, sql = self._statements(
+            kpi_engine, lambda: kpi_processor.get_all_kpi_data(2, use_cache=False)
+        )
+        assert '"R_Workforce"' not in sql
+
+
+class TestKPIBatch:
+
+    def test_batch_matches_per_company_calls(self, kpi_engine):
+        refresh_rollups([2], bind=kpi_engine)
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        for years, country in [(None, None), ([2024], 4)]:
+            event.listen(kpi_engine, "before_cursor_execute", count)
+            try:
+                batch = kpi_processor.get_all_kpi_data_batch(
+                    [2, 1, 3, 1], years=years, country_id=country, use_cache=False
+                )
+            finally:
+                event.remove(kpi_engine, "before_cursor_execute", count)
+
+            assert list(batch) == [2, 1, 3]
+            for company_id, kpis in batch.items():
+                assert kpis == kpi_processor.get_all_kpi_data(
+                    company_id, years, None, country, use_cache=False
+                )
+        # status lookup plus 6 grouped scans per table set, per call
+        assert len(statements) == 2 * (1 + 2 * 6)
+
+    def test_batch_endpoint(self, kpi_engine):
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = TestClient(app)
+        response = client.post("/kpi/batch", json={"company_ids": [1, 2], "years": [2024]})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["count"] == 2
+        assert body["companies"]["1"] == kpi_processor.get_all_kpi_data(1, [2024])
+        assert client.post("/kpi/batch", json={"company_ids": []}).status_code == 400
+
+
+class TestKPITimeSeries:
+
+    def test_series_matches_per_year_calls(self, kpi_engine):
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(kpi_engine, "before_cursor_execute", count)
+        try:
+            series = kpi_processor.get_kpi_time_series(1, use_rollups=False)
+        finally:
+            event.remove(kpi_engine, "before_cursor_execute", count)
+
+        assert list(series) == [2023, 2024]
+        for year, kpis in series.items():
+            assert kpis == kpi_processor.get_all_kpi_data(
+                1, [year], use_cache=False, use_rollups=False
+            )
+        # five year-grouped scans plus the org unit names, for all years
+        assert len(statements) == 6
+
+        refresh_rollups(bind=kpi_engine)
+        assert kpi_processor.get_kpi_time_series(1, country_id=4) == {
+            year: kpi_processor.get_all_kpi_data(1, [year], country_id=4, use_cache=False)
+            for year in (2023, 2024)
+        }
+
+    def test_report_inputs_pick_prior_year(self, kpi_engine):
+        series = kpi_processor.get_kpi_time_series(1, years=[2022, 2023, 2024])
+        assert list(series) == [2022, 2023, 2024]
+        assert series[2022]["Total Workforce by Gender"] == []
+
+        inputs = report_kpi_inputs(series)
+        assert inputs["year"] == 2024
+        assert inputs["kpi_data"] is series[2024]
+        assert inputs["historical_kpi_data"] is series[2023]
+        assert report_kpi_inputs(series, 2022)["historical_kpi_data"] is None
+
+
+class TestColumnarKPIEngine:
+
+    def test_columnar_matches_sql_path(self, kpi_engine):
+        columnar = ColumnarKPIProcessor(session_factory=sessionmaker(bind=kpi_engine))
+
+        for company_id, years, org_units, country in itertools.product(
+            [1, 2, 3], [None, [2024], [2023, 2024]], [None, [1], [2, 3]], [None, 4]
+        ):
+            expected = kpi_processor.get_all_kpi_data(
+                company_id, years, org_units, country, use_cache=False, use_rollups=False
+            )
+            assert columnar.get_all_kpi_data(
+                company_id, years, org_units, country
+            ) == expected, (company_id, years, org_units, country)
+            assert columnar.get_employee_turnover_rate_by_org_unit(
+                company_id, years, org_units, country
+            ) == expected["Employee Turnover Rate by Organizational Unit"]
+
+    def test_null_measures_match_sql_sums(self, kpi_engine):
+        from app.models import FS1_WorkplaceInjuries
+
+        # Blank InjuryCount cells are stored as NULL; company 3 has only NULLs.
+        with kpi_engine.begin() as conn:
+            conn.execute(
+                FS1_WorkplaceInjuries.__table__.update()
+                .where(FS1_WorkplaceInjuries.CompanyID == 3)
+                .values(InjuryCount=None)
+            )
+            conn.execute(
+                FS1_WorkplaceInjuries.__table__.insert(),
+                [{"CompanyID": 1, "OrganizationalUnitID": 1, "CountryID": 3, "Year": 2024,
+                  "InjuryCount": None}],
+            )
+        columnar = ColumnarKPIProcessor(session_factory=sessionmaker(bind=kpi_engine))
+
+        for company_id, years in itertools.product([1, 3], [None, [2024]]):
+            expected = kpi_processor.get_all_kpi_data(
+                company_id, years, use_cache=False, use_rollups=False
+            )
+            assert columnar.get_all_kpi_data(company_id, years) == expected
+        assert columnar.fetch_base_aggregates(3, aggregates=("injuries",))["injuries"] is None
+        assert columnar.fetch_base_aggregates(1, aggregates=("injuries",))["injuries"] > 0
+
+    def test_loads_each_company_once(self, kpi_engine):
+        columnar = ColumnarKPIProcessor(session_factory=sessionmaker(bind=kpi_engine))
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        columnar.get_all_kpi_data(1)
+        event.listen(kpi_engine, "before_cursor_execute", count)
+        try:
+            columnar.get_all_kpi_data(1, years=[2024], country_id=3)
+            columnar.get_workplace_injury_rate(1, organizational_unit_ids=[2])
+            assert statements == []
+
+            columnar.invalidate_company(1)
+            columnar.get_all_kpi_data(1)
+            assert statements
+        finally:
+            event.remove(kpi_engine, "before_cursor_execute", count)
+        assert columnar.stats()["companies"] == 1
+
+    def test_single_kpis_compute_only_their_aggregates(self, kpi_engine):
+        columnar = ColumnarKPIProcessor(session_factory=sessionmaker(bind=kpi_engine))
+        aggregates = columnar.fetch_base_aggregates(1, aggregates=("workforce", "injuries"))
+        assert set(aggregates) == {"workforce", "injuries", "org_unit_names"}
+
+        expected = kpi_processor.get_all_kpi_data(1, [2024], use_cache=False)
+        for name, (method, _) in KPI_DEFINITIONS.items():
+            assert getattr(columnar, method)(1, [2024]) == expected[name], name
+
+    def test_query_endpoint_selects_the_engine(self, kpi_engine):
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        client = TestClient(app)
+        body = {"company_id": 1, "years": [2024], "organizational_unit_ids": [1]}
+        sql = client.post("/kpi/query", json=body).json()["kpis"]
+        columnar = client.post("/kpi/query?engine=columnar", json=body).json()["kpis"]
+        assert columnar == sql == kpi_processor.get_all_kpi_data(1, [2024], [1])
+
+        one = client.post(
+            "/kpi/query?engine=columnar", json={**body, "kpi": "Workplace Injury Rate"}
+        ).json()["kpis"]
+        assert one == {"Workplace Injury Rate": sql["Workplace Injury Rate"]}
+        assert client.get("/kpi/metrics").json()["columnar"]["companies"] == 1
+        assert client.post("/kpi/query?engine=duckdb", json=body).status_code == 400
+        assert client.post("/kpi/query", json={**body, "kpi": "Nope"}).status_code == 400
+
+
+class TestKPICache:
+
+    def test_repeat_reads_are_served_from_cache(self, kpi_engine):
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        first = kpi_processor.get_all_kpi_data(1, years=[2024, 2023])
+        event.listen(kpi_engine, "before_cursor_execute", count)
+        try:
+            second = kpi_processor.get_all_kpi_data(1, years=[2023, 2024])
+        finally:
+            event.remove(kpi_engine, "before_cursor_execute", count)
+
+        assert second == first
+        assert statements == []
+        assert kpi_cache.stats()["hits"] >= 1
+
+        second["Total Workforce by Gender"].clear()
+        assert kpi_processor.get_all_kpi_data(1, years=[2024, 2023]) == first
+
+    def test_invalidation_is_per_company(self, kpi_engine):
+        kpi_processor.get_all_kpi_data(1)
+        kpi_processor.get_all_kpi_data(2)
+
+        assert kpi_cache.invalidate_company(1) == 1
+        assert kpi_cache.get(KPICache.make_key(2)) is not None
+        assert kpi_cache.get(KPICache.make_key(1)) is None
+
+    def test_invalidation_during_a_miss_drops_the_result(self, kpi_engine, monkeypatch):
+        # An upload invalidates company 1 while its KPIs are being computed
+        for name in ("fetch_base_aggregates", "fetch_base_aggregates_batch"):
+            def racing_upload(*args, _compute=getattr(kpi_processor, name), **kwargs):
+                aggregates = _compute(*args, **kwargs)
+                kpi_cache.invalidate_company(1)
+                return aggregates
+
+            monkeypatch.setattr(kpi_processor, name, racing_upload)
+        stale_writes = kpi_cache.stats()["stale_writes"]
+        kpi_processor.get_all_kpi_data(1)
+        kpi_processor.get_all_kpi_data_batch([1])
+
+        assert kpi_cache.get(KPICache.make_key(1)) is None
+        assert kpi_cache.stats()["stale_writes"] == stale_writes + 2
+
+    def test_metrics_endpoint(self, kpi_engine):
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        kpi_processor.get_all_kpi_data(1)
+        kpi_processor.get_all_kpi_data(1)
+        stats = TestClient(app).get("/kpi/metrics").json()["kpi_cache"]
+        assert stats["hits"] >= 1 and stats["misses"] >= 1
+
+    def test_lru_and_ttl_eviction(self, monkeypatch):
+        cache = KPICache(max_entries=2, ttl_seconds=60)
+        now = [1000.0]
+        monkeypatch.setattr("app.kpi_cache.time.monotonic", lambda: now[0])
+
+        cache.set("a", {"v": 1})
+        cache.set("b", {"v": 2})
+        cache.get("a")
+        cache.set("c", {"v": 3})
+        assert cache.get("b") is None
+        assert cache.get("a") == {"v": 1}
+
+        now[0] += 61
+        assert cache.get("c") is None
+        stats = cache.stats()
+        assert stats["evictions"] == 2
+        assert stats["hits"] == 2
+        assert stats["misses"] == 2
@@ -0,0 +1,97 @@
+"""
+Tests the local completion backend and the offline report benchmark.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app import llm_backends, llm_gateway as gateway_module
+from app.llm_backends import LocalBackendError, LocalCompletionClient, create_llm_client
+from app.llm_gateway import LLMGateway
+
+MESSAGES = [{"role": "user", "content": "Write the closing section."}]
+
+
+class TestLocalCompletionClient:
+
+    @pytest.mark.asyncio
+    async def test_replies_and_timings_are_reproducible(self):
+        async def sample(client):
+            replies = []
+            for _ in range(5):
+                started = asyncio.get_running_loop().time()
+                response = await client.chat.completions.create(model="m", messages=MESSAGES)
+                replies.append(
+                    (response.choices[0].message.content, asyncio.get_running_loop().time() - started)
+                )
+            return replies
+
+        first = await sample(LocalCompletionClient(latency_ms=20, jitter_ms=10, seed=3))
+        second = await sample(LocalCompletionClient(latency_ms=20, jitter_ms=10, seed=3))
+        assert [text for text, _ in first] == [text for text, _ in second]
+        assert all(0 < seconds < 0.5 for _, seconds in first)
+
+        structured = await LocalCompletionClient(latency_ms=1, jitter_ms=0).chat.completions.create(
+            model="m",
+            messages=MESSAGES,
+            response_format={"json_schema": {"schema": {"properties": {"closing": {}}}}},
+        )
+        assert list(json.loads(structured.choices[0].message.content)) == ["closing"]
+
+    @pytest.mark.asyncio
+    async def test_streams_in_chunks(self):
+        client = LocalCompletionClient(latency_ms=5, jitter_ms=0, distribution="fixed")
+        stream = await client.chat.completions.create(model="m", messages=MESSAGES, stream=True)
+        chunks = [chunk.choices[0].delta.content async for chunk in stream]
+        assert len(chunks) > 1
+        assert "".join(chunks) == LocalCompletionClient._reply(MESSAGES)
+
+    @pytest.mark.asyncio
+    async def test_injected_failures_are_retried_by_the_gateway(self, monkeypatch):
+        monkeypatch.setattr(gateway_module, "LLM_RETRY_BASE_DELAY", 0.001)
+        client = LocalCompletionClient(latency_ms=1, jitter_ms=0, failure_rate=0.3, seed=1)
+        gateway = LLMGateway(rate_per_second=0, max_retries=10)
+
+        results = await asyncio.gather(
+            *(gateway.complete(MESSAGES, model="m", client=client) for _ in range(20))
+        )
+
+        assert all(results)
+        assert client.failures > 0
+        assert gateway.stats()["sections"]["default"]["retries"] == client.failures
+
+        with pytest.raises(LocalBackendError):
+            await LLMGateway(rate_per_second=0, max_retries=0).complete(
+                MESSAGES, model="m", client=LocalCompletionClient(failure_rate=1.0)
+            )
+
+    def test_backend_is_selected_by_setting(self, monkeypatch):
+        monkeypatch.setattr(llm_backends, "LLM_BACKEND", "local")
+        assert isinstance(create_llm_client(), LocalCompletionClient)
+        with pytest.raises(ValueError):
+            create_llm_client("bogus")
+
+
+class TestReportBenchmark:
+
+    @pytest.mark.asyncio
+    async def test_benchmark_reports_stage_percentiles(self, monkeypatch):
+        from app import report_generator
+        from app.llm_gateway import llm_gateway
+        from benchmarks import report_pipeline
+
+        # run() swaps these for the benchmark; put them back afterwards
+        monkeypatch.setattr(report_generator, "completion_cache", report_generator.completion_cache)
+        monkeypatch.setattr(llm_gateway, "limiter", llm_gateway.limiter)
+        monkeypatch.setattr(llm_gateway, "bucket", llm_gateway.bucket)
+
+        result = await report_pipeline.run(
+            reports=2, concurrency=2, org_units=3, latency_ms=5, jitter_ms=2
+        )
+
+        assert set(result["stages"]) == set(report_pipeline.STAGES)
+        assert all(stats["p95"] >= stats["p50"] > 0 for stats in result["stages"].values())
+        assert result["reports_per_second"] > 0
+        assert result["llm"]["calls"] == 16 and result["llm"]["failed_sections"] == 0
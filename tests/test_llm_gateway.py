@@ -0,0 +1,149 @@
+"""
+Tests the LLM gateway: retries, deadlines, concurrency and rate shaping.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app import llm_gateway as gateway_module
+from app.llm_gateway import ConcurrencyLimiter, LLMGateway, TokenBucket
+from tests.conftest import StubCompletionClient
+
+
+class ProviderError(Exception):
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FlakyClient(StubCompletionClient):
+    """Fails with the queued errors (or sleeps for the queued delays) first."""
+
+    def __init__(self, script, content="Recovered."):
+        super().__init__(content)
+        self.script = list(script)
+        self.in_flight = 0
+        self.peak = 0
+
+    async def _create(self, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            step = self.script.pop(0) if self.script else None
+            if isinstance(step, Exception):
+                raise step
+            await asyncio.sleep(step or 0.01)
+            return await super()._create(**kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(gateway_module, "LLM_RETRY_BASE_DELAY", 0.001)
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class TestLLMGateway:
+
+    @pytest.mark.asyncio
+    async def test_retryable_errors_back_off_and_recover(self):
+        gateway = LLMGateway(rate_per_second=0)
+        client = FlakyClient([ProviderError(429), ProviderError(503)])
+
+        content = await gateway.complete(
+            MESSAGES, model="m", section="closing", client=client
+        )
+
+        assert content == "Recovered."
+        stats = gateway.stats()["sections"]["closing"]
+        assert stats["calls"] == 1 and stats["successes"] == 1
+        assert stats["retries"] == 2 and stats["rate_limited"] == 1
+        assert stats["latency_p50"] is not None
+
+    @pytest.mark.asyncio
+    async def test_non_retryable_errors_fail_fast(self):
+        gateway = LLMGateway(rate_per_second=0)
+        client = FlakyClient([ProviderError(400)])
+
+        with pytest.raises(ProviderError):
+            await gateway.complete(MESSAGES, model="m", section="s", client=client)
+
+        stats = gateway.stats()["sections"]["s"]
+        assert stats["failures"] == 1 and stats["retries"] == 0
+        assert client.calls == []
+
+    @pytest.mark.asyncio
+    async def test_per_call_timeout_and_retry_budget(self):
+        gateway = LLMGateway(rate_per_second=0, timeout=0.05, max_retries=2)
+        client = FlakyClient([1.0, 1.0, 1.0, 1.0])
+
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await gateway.complete(MESSAGES, model="m", section="s", client=client)
+
+        assert time.monotonic() - started < 0.5
+        stats = gateway.stats()["sections"]["s"]
+        assert stats["timeouts"] == 3 and stats["retries"] == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_capped(self):
+        gateway = LLMGateway(max_concurrency=3, rate_per_second=0)
+        client = FlakyClient([0.02] * 12)
+
+        await asyncio.gather(
+            *(gateway.complete(MESSAGES, model="m", client=client) for _ in range(12))
+        )
+
+        assert client.peak == 3
+        assert gateway.stats()["in_flight"] == 0
+
+
+class TestLimiters:
+
+    def test_token_bucket_spaces_out_requests(self, monkeypatch):
+        now = [100.0]
+        monkeypatch.setattr(gateway_module.time, "monotonic", lambda: now[0])
+        bucket = TokenBucket(rate=2, burst=2)
+
+        assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+        now[0] += 1.5
+        assert bucket.reserve() == 0.0
+
+    def test_limiter_is_shared_across_event_loops(self):
+        limiter = ConcurrencyLimiter(2)
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        async def work():
+            await limiter.acquire()
+            try:
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                await asyncio.sleep(0.01)
+                with lock:
+                    active[0] -= 1
+            finally:
+                limiter.release()
+
+        async def main():
+            await asyncio.wait_for(asyncio.gather(*(work() for _ in range(5))), 5)
+
+        def run_loop():
+            asyncio.run(main())
+
+        threads = [threading.Thread(target=run_loop) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert peak[0] == 2
+        assert limiter.active == 0
@@ -0,0 +1,82 @@
+"""
+Tests the compact per-section KPI context used in the LLM prompts.
+"""
+
+import copy
+import json
+
+import pytest
+
+from app.report_generator import REPORT_SECTIONS, _build_section_prompt, generate_management_report
+from app.templates.prompts import build_prompt_context, estimate_tokens
+from tests.conftest import SAMPLE_HISTORICAL_KPI_DATA, SAMPLE_KPI_DATA
+
+
+def _large_tenant(org_units):
+    kpi_data = copy.deepcopy(SAMPLE_KPI_DATA)
+    kpi_data["Workforce by Gender by Organizational Unit"] = [
+        {
+            "OrganizationalUnitID": ou,
+            "OrganizationalUnitName": f"Unit {ou}",
+            "genders": [
+                {"gender": "Female", "employee_count": ou},
+                {"gender": "Male", "employee_count": ou + 1},
+            ],
+        }
+        for ou in range(1, org_units + 1)
+    ]
+    kpi_data["Employee Turnover Rate by Organizational Unit"] = [
+        {
+            "OrganizationalUnitID": ou,
+            "OrganizationalUnitName": f"Unit {ou}",
+            "total_employees": 2 * ou + 1,
+            "total_employees_departed": 1,
+            "turnover_rate": round(100 / (2 * ou + 1), 2),
+        }
+        for ou in range(1, org_units + 1)
+    ]
+    return kpi_data
+
+
+class TestPromptContext:
+
+    def test_sections_only_see_relevant_kpis(self):
+        context = build_prompt_context(
+            "health_and_safety", SAMPLE_KPI_DATA, SAMPLE_HISTORICAL_KPI_DATA
+        )
+        assert list(context["kpi"]) == ["Workplace Injury Rate"]
+        assert context["historical"] == {}
+
+        training = build_prompt_context(
+            "training_and_development", SAMPLE_KPI_DATA, SAMPLE_HISTORICAL_KPI_DATA
+        )
+        assert list(training["historical"]) == ["Average Training Hours per Employee"]
+
+    def test_long_breakdowns_keep_top_n_and_aggregate_the_rest(self):
+        context = build_prompt_context("turnover_and_retention", _large_tenant(300), top_n=5)
+        by_unit = context["kpi"]["Employee Turnover Rate by Organizational Unit"]
+
+        assert [u["OrganizationalUnitID"] for u in by_unit["top"]] == [300, 299, 298, 297, 296]
+        assert by_unit["others"]["count"] == 295
+        totals = by_unit["others"]["totals"]
+        assert totals["total_employees"] == sum(2 * ou + 1 for ou in range(1, 296))
+        assert "turnover_rate" not in totals
+
+    def test_prompt_size_does_not_scale_with_org_units(self):
+        section = "workforce_composition_and_diversity"
+        small = _build_section_prompt(section, _large_tenant(10), None)
+        large = _build_section_prompt(section, _large_tenant(1000), None)
+
+        assert abs(estimate_tokens(large) - estimate_tokens(small)) < 50
+        assert len(large) < len(json.dumps(_large_tenant(1000))) / 20
+
+    @pytest.mark.asyncio
+    async def test_report_records_prompt_token_estimates(
+        self, isolated_completion_cache, stub_llm_client
+    ):
+        result = await generate_management_report(
+            kpi_data=SAMPLE_KPI_DATA, client=stub_llm_client
+        )
+        estimates = result["generation"]["prompt_tokens"]
+        assert set(estimates) == set(REPORT_SECTIONS)
+        assert all(0 < tokens < 1000 for tokens in estimates.values())
@@ -0,0 +1,70 @@
+"""
+Tests the rendering executor used to keep chart and document rendering off
+the event loop.
+
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.rendering import RenderExecutor
+
+
+class TestRenderExecutor:
+
+    @pytest.mark.asyncio
+    async def test_rendering_does_not_block_the_event_loop(self):
+        executor = RenderExecutor(kind="thread", max_workers=1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        try:
+            await executor.run(time.sleep, 0.2)
+        finally:
+            task.cancel()
+            executor.shutdown()
+
+        assert ticks >= 5
+
+    @pytest.mark.asyncio
+    async def test_queue_depth_and_wait_metrics(self):
+        executor = RenderExecutor(kind="thread", max_workers=1)
+        try:
+            jobs = [asyncio.ensure_future(executor.run(time.sleep, 0.05)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            assert executor.stats()["queue_depth"] == 2
+            await asyncio.gather(*jobs)
+        finally:
+            executor.shutdown()
+
+        stats = executor.stats()
+        assert stats["completed"] == 3
+        assert stats["in_flight"] == 0
+        assert stats["max_wait_ms"] >= 50
+
+    @pytest.mark.asyncio
+    async def test_process_pool_runs_picklable_callables(self):
+        executor = RenderExecutor(kind="process", max_workers=2)
+        try:
+            results = await asyncio.gather(
+                executor.run(sum, [1, 2, 3]), executor.run(max, 4, 9)
+            )
+        finally:
+            executor.shutdown()
+
+        assert results == [6, 9]
+        assert executor.stats()["failed"] == 0
+
+    def test_auto_uses_processes_on_multicore_hosts(self, monkeypatch):
+        monkeypatch.setattr("app.rendering.os.cpu_count", lambda: 8)
+        assert RenderExecutor(kind="auto").kind == "process"
+        monkeypatch.setattr("app.rendering.os.cpu_count", lambda: 1)
+        assert RenderExecutor(kind="auto").kind == "thread"
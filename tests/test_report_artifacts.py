@@ -0,0 +1,61 @@
+"""
+Tests the report artifact endpoints that stream generated documents instead
+of returning them base64-encoded inside JSON.
+
+"""
+
+import functools
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import report
+from app.report_generator import generate_management_report
+from tests.conftest import SAMPLE_KPI_DATA
+
+
+@pytest.fixture
+def report_client(monkeypatch, stub_llm_client, isolated_completion_cache):
+    monkeypatch.setattr(
+        report,
+        "generate_management_report",
+        functools.partial(generate_management_report, client=stub_llm_client),
+    )
+    app = FastAPI()
+    app.include_router(report.router)
+    return TestClient(app)
+
+
+class TestReportArtifacts:
+
+    @pytest.mark.parametrize(
+        "doc_type, media_type, signature",
+        [
+            ("pdf", "application/pdf", b"%PDF"),
+            ("docx", report.MEDIA_TYPES["docx"], b"PK"),
+        ],
+    )
+    def test_artifact_is_streamed_as_binary(
+        self, report_client, doc_type, media_type, signature
+    ):
+        created = report_client.post(
+            "/report/artifacts",
+            json={"company_id": 1, "year": 2024, "kpi_data": SAMPLE_KPI_DATA, "type": doc_type},
+        )
+        assert created.status_code == 200
+        body = created.json()
+        assert "base64" not in body["file"]
+        assert body["sections"]["closing"] == "Stub narrative."
+        assert "workforce_by_gender" in body["charts"]
+
+        download = report_client.get(body["file"]["url"])
+        assert download.status_code == 200
+        assert download.headers["content-type"] == media_type
+        assert int(download.headers["content-length"]) == body["file"]["size"]
+        assert body["file"]["name"] in download.headers["content-disposition"]
+        assert download.content.startswith(signature)
+        assert len(download.content) == body["file"]["size"]
+
+    def test_unknown_artifact_returns_404(self, report_client):
+        assert report_client.get("/report/artifacts/missing").status_code == 404
@@ -2,10 +2,13 @@
 Tests the performance of the generate_management_report function and ensures
 it completes within 10 seconds.
 
+The LLM runs on the local completion backend with provider-like latency, so
+the timing covers real section generation instead of offline fallbacks.
 """
 
 import time
 import pytest
+from app.llm_backends import LocalCompletionClient
 from app.report_generator import generate_management_report
 from tests.conftest import SAMPLE_HISTORICAL_KPI_DATA, SAMPLE_KPI_DATA
 
@@ -14,15 +17,18 @@ class TestReportGenerationPerformance:
 
     @pytest.mark.asyncio
     async def test_generate_management_report(
-        self
+        self, isolated_completion_cache, unthrottled_llm_gateway
     ):
-        import time
+        client = LocalCompletionClient(
+            latency_ms=800, jitter_ms=400, distribution="lognormal", seed=7
+        )
 
         start_time = time.time()
 
         result = await generate_management_report(
             kpi_data=SAMPLE_KPI_DATA,
-            historical_kpi_data=SAMPLE_HISTORICAL_KPI_DATA
+            historical_kpi_data=SAMPLE_HISTORICAL_KPI_DATA,
+            client=client,
         )
 
         end_time = time.time()
@@ -33,3 +39,6 @@ class TestReportGenerationPerformance:
         ), f"Report generation took {generation_time:.2f} seconds, expected < 10 seconds"
 
         assert isinstance(result, dict), "Function did not return a dictionary"
+        assert client.stats()["calls"] == 8
+        for section, text in result["sections"].items():
+            assert "local backend" in text, f"{section} fell back instead of generating"
@@ -0,0 +1,241 @@
+"""
+Tests the SQLite-backed report job queue and the /report/jobs endpoints.
+
+"""
+
+import asyncio
+import functools
+import threading
+import time
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from app.models import ReportJob
+from app.report_generator import generate_management_report
+from app.report_jobs import FAILED, SUCCEEDED, ReportJobQueue
+from app.routers import report
+from tests.conftest import SAMPLE_KPI_DATA
+
+
+def _wait_for(queue, job_id, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in (SUCCEEDED, FAILED):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+@pytest.fixture
+def make_queue(sqlite_engine, tmp_path):
+    queues = []
+
+    def factory(handler, **kwargs):
+        queue = ReportJobQueue(
+            handler,
+            session_factory=sessionmaker(bind=sqlite_engine),
+            directory=str(tmp_path / "jobs"),
+            **kwargs,
+        )
+        queues.append(queue)
+        return queue
+
+    yield factory
+    for queue in queues:
+        queue.shutdown()
+
+
+class TestReportJobQueue:
+
+    def test_identical_in_flight_requests_share_one_job(self, make_queue):
+        release = threading.Event()
+        calls = []
+
+        async def handler(payload, out, progress):
+            calls.append(payload)
+            release.wait(10)
+            progress(50, "writing")
+            out.write(b"report for %d" % payload["company_id"])
+            return {"name": "r.pdf", "media_type": "application/pdf", "sections": {}}
+
+        queue = make_queue(handler)
+        first, created = queue.submit({"company_id": 1, "year": 2024})
+        second, created_again = queue.submit({"year": 2024, "company_id": 1})
+        other, _ = queue.submit({"company_id": 2, "year": 2024})
+        release.set()
+
+        assert created and not created_again
+        assert second["job_id"] == first["job_id"]
+        assert other["job_id"] != first["job_id"]
+
+        job = _wait_for(queue, first["job_id"])
+        _wait_for(queue, other["job_id"])
+        assert job["status"] == SUCCEEDED and job["progress"] == 100
+        assert job["result"] == {"sections": {}}
+        with open(job["file_path"], "rb") as f:
+            assert f.read() == b"report for 1"
+        assert len(calls) == 2
+
+        # Finished jobs don't absorb new requests
+        _, created = queue.submit({"company_id": 1, "year": 2024})
+        assert created
+
+    def test_failures_are_recorded(self, make_queue):
+        async def handler(payload, out, progress):
+            raise RuntimeError("export exploded")
+
+        queue = make_queue(handler)
+        job, _ = queue.submit({"company_id": 1})
+        job = _wait_for(queue, job["job_id"])
+
+        assert job["status"] == FAILED
+        assert job["error"] == "export exploded"
+        assert job["file_path"] is None
+
+    def test_pending_jobs_survive_a_restart(self, make_queue, sqlite_engine):
+        now = datetime.now(timezone.utc)
+        db = sessionmaker(bind=sqlite_engine)()
+        db.add_all(
+            [
+                ReportJob(JobID="interrupted", DedupKey="a", Status="running", Progress=40,
+                          Payload='{"company_id": 1}', CreatedAt=now, UpdatedAt=now),
+                ReportJob(JobID="waiting", DedupKey="b", Status="queued", Progress=0,
+                          Payload='{"company_id": 2}', CreatedAt=now, UpdatedAt=now),
+            ]
+        )
+        db.commit()
+        db.close()
+
+        async def handler(payload, out, progress):
+            out.write(b"ok")
+            return {"name": "r.pdf", "media_type": "application/pdf"}
+
+        queue = make_queue(handler)
+        assert queue.resume() == 2
+        assert _wait_for(queue, "interrupted")["status"] == SUCCEEDED
+        assert _wait_for(queue, "waiting")["status"] == SUCCEEDED
+
+    def test_workers_sharing_a_database_run_each_job_once(self, make_queue, sqlite_engine):
+        calls = []
+
+        async def handler(payload, out, progress):
+            calls.append(payload["company_id"])
+            out.write(b"ok")
+            return {"name": "r.pdf", "media_type": "application/pdf"}
+
+        earlier = datetime.now(timezone.utc) - timedelta(minutes=5)
+        db = sessionmaker(bind=sqlite_engine)()
+        db.add_all(
+            [
+                ReportJob(JobID="interrupted", DedupKey="a", Status="running", Progress=40,
+                          Payload='{"company_id": 1}', CreatedAt=earlier, UpdatedAt=earlier),
+                ReportJob(JobID="waiting", DedupKey="b", Status="queued", Progress=0,
+                          Payload='{"company_id": 2}', CreatedAt=earlier, UpdatedAt=earlier),
+            ]
+        )
+        db.commit()
+        # Two uvicorn workers start on the same database
+        workers = [make_queue(handler, max_workers=1), make_queue(handler, max_workers=1)]
+        # A job a live worker claimed after both started is left alone
+        now = datetime.now(timezone.utc)
+        db.add(ReportJob(JobID="live", DedupKey="c", Status="running", Progress=40,
+                         Payload='{"company_id": 3}', CreatedAt=now, UpdatedAt=now))
+        db.commit()
+        db.close()
+
+        for worker in workers:
+            worker.resume()
+        for job_id in ("interrupted", "waiting"):
+            assert _wait_for(workers[0], job_id)["status"] == SUCCEEDED
+        # Let each worker finish its attempts; losers of a claim do nothing
+        for worker in workers:
+            worker._get_executor().submit(lambda: None).result()
+
+        assert sorted(calls) == [1, 2]
+        assert workers[0].get("live")["status"] == "running"
+
+    def test_finished_jobs_expire_with_their_files(self, make_queue):
+        async def handler(payload, out, progress):
+            out.write(b"ok")
+            return {"name": "r.pdf", "media_type": "application/pdf"}
+
+        queue = make_queue(handler, ttl_seconds=3600)
+        job, _ = queue.submit({"company_id": 1})
+        job = _wait_for(queue, job["job_id"])
+        assert queue.purge_expired() == 0
+
+        queue.ttl_seconds = 0
+        assert queue.purge_expired() == 1
+        assert not os.path.exists(job["file_path"])
+        assert queue.get(job["job_id"]) is None
+
+    def test_jobs_on_a_worker_share_its_loop_and_llm_client(self, make_queue, monkeypatch):
+        from app import llm_gateway as gateway_module
+
+        closed = []
+
+        class Client:
+            async def close(self):
+                closed.append(self)
+
+        monkeypatch.setattr(gateway_module, "create_llm_client", lambda **kwargs: Client())
+        loops, clients = [], []
+
+        async def handler(payload, out, progress):
+            loops.append(asyncio.get_running_loop())
+            clients.append(gateway_module.llm_gateway.client())
+            out.write(b"ok")
+            return {"name": "r.pdf", "media_type": "application/pdf"}
+
+        queue = make_queue(handler, max_workers=1)
+        for company_id in (1, 2):
+            job, _ = queue.submit({"company_id": company_id})
+            assert _wait_for(queue, job["job_id"])["status"] == SUCCEEDED
+
+        assert loops[0] is loops[1]
+        assert clients[0] is clients[1]
+        queue.shutdown()
+        assert closed == [clients[0]]
+        assert loops[0].is_closed()
+
+
+class TestReportJobEndpoints:
+
+    def test_job_lifecycle(self, make_queue, monkeypatch, stub_llm_client, isolated_completion_cache):
+        monkeypatch.setattr(
+            report,
+            "generate_management_report",
+            functools.partial(generate_management_report, client=stub_llm_client),
+        )
+        queue = make_queue(report._render_report_job)
+        monkeypatch.setattr(report, "report_jobs", queue)
+        app = FastAPI()
+        app.include_router(report.router)
+        client = TestClient(app)
+
+        body = {"company_id": 1, "year": 2024, "kpi_data": SAMPLE_KPI_DATA}
+        created = client.post("/report/jobs", json=body)
+        duplicate = client.post("/report/jobs", json=body)
+        assert created.status_code == 202
+        job_id = created.json()["job_id"]
+        assert duplicate.json()["job_id"] == job_id
+
+        _wait_for(queue, job_id)
+        status = client.get(f"/report/jobs/{job_id}").json()
+        assert status["status"] == SUCCEEDED
+        assert status["result"]["sections"]["closing"] == "Stub narrative."
+        assert "file_path" not in status
+
+        download = client.get(status["file"]["url"])
+        assert download.status_code == 200
+        assert download.headers["content-type"] == "application/pdf"
+        assert download.content.startswith(b"%PDF")
+        assert len(download.content) == status["file"]["size"]
+
+        assert client.get("/report/jobs/missing").status_code == 404
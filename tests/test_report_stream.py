@@ -0,0 +1,110 @@
+"""
+Tests the Server-Sent Events variant of the report endpoint.
+
+"""
+
+import asyncio
+import functools
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import report
+from app.report_generator import REPORT_SECTIONS, generate_management_report_events
+from tests.conftest import SAMPLE_HISTORICAL_KPI_DATA, SAMPLE_KPI_DATA, StubCompletionClient
+
+
+def _parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class SlowSectionClient(StubCompletionClient):
+    """Streams every section immediately except the closing one."""
+
+    async def _create(self, **kwargs):
+        if "'closing' section" in kwargs["messages"][-1]["content"]:
+            await asyncio.sleep(0.3)
+        return await super()._create(**kwargs)
+
+
+class TestReportStream:
+
+    def test_stream_emits_parts_then_file(
+        self, monkeypatch, stub_llm_client, isolated_completion_cache
+    ):
+        monkeypatch.setattr(
+            report,
+            "generate_management_report_events",
+            functools.partial(generate_management_report_events, client=stub_llm_client),
+        )
+        app = FastAPI()
+        app.include_router(report.router)
+        client = TestClient(app)
+
+        response = client.post(
+            "/report/stream",
+            json={
+                "company_id": 1,
+                "year": 2024,
+                "kpi_data": SAMPLE_KPI_DATA,
+                "historical_kpi_data": SAMPLE_HISTORICAL_KPI_DATA,
+            },
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _parse_sse(response.text)
+
+        assert [name for name, _ in events[-2:]] == ["file", "done"]
+        charts = {data["name"] for name, data in events if name == "chart"}
+        assert charts == {
+            "workforce_by_gender",
+            "training_hours_by_gender",
+            "trend_training_hours_per_employee",
+        }
+        sections = {data["section"]: data["text"] for name, data in events if name == "section"}
+        assert list(sorted(sections)) == sorted(REPORT_SECTIONS)
+        for section, text in sections.items():
+            deltas = [
+                data["delta"]
+                for name, data in events
+                if name == "section_delta" and data["section"] == section
+            ]
+            assert "".join(deltas) == text == "Stub narrative."
+        assert all(call.get("stream") for call in stub_llm_client.calls)
+
+        file_event = events[-2][1]
+        download = client.get(file_event["file"]["url"])
+        assert download.content.startswith(b"%PDF")
+        assert set(file_event["generation"]["timings"]) == {"charts_seconds", "llm_seconds"}
+
+        structured = client.post(
+            "/report/stream",
+            json={
+                "company_id": 1,
+                "year": 2024,
+                "kpi_data": SAMPLE_KPI_DATA,
+                "generation_mode": "structured",
+            },
+        )
+        assert structured.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_sections_arrive_as_they_complete(
+        self, isolated_completion_cache, stub_llm_client
+    ):
+        events = [
+            event
+            async for event in generate_management_report_events(
+                SAMPLE_KPI_DATA, client=SlowSectionClient()
+            )
+        ]
+        finished = [data["section"] for name, data in events if name == "section"]
+        assert finished[-1] == "closing"
+        assert events[-1][0] == "report"
+        assert events[-1][1]["sections"]["closing"] == "Stub narrative."
@@ -0,0 +1,78 @@
+"""
+Tests the single-call structured generation mode of generate_management_report.
+"""
+
+import json
+
+import pytest
+
+from app.report_generator import REPORT_SECTIONS, generate_management_report
+from tests.conftest import SAMPLE_KPI_DATA, StubCompletionClient
+
+
+class StructuredStubClient(StubCompletionClient):
+    """Answers JSON-schema requests with `structured`, plain ones with text."""
+
+    def __init__(self, structured):
+        super().__init__("Per-section narrative.")
+        self.structured = structured
+
+    async def _create(self, **kwargs):
+        response = await super()._create(**kwargs)
+        if "response_format" in kwargs:
+            response.choices[0].message.content = self.structured
+        return response
+
+
+class TestStructuredGeneration:
+
+    @pytest.mark.asyncio
+    async def test_one_call_fills_every_section(
+        self, isolated_completion_cache, unthrottled_llm_gateway
+    ):
+        client = StructuredStubClient(
+            json.dumps({name: f"Text for {name}." for name in REPORT_SECTIONS})
+        )
+
+        result = await generate_management_report(
+            kpi_data=SAMPLE_KPI_DATA, client=client, mode="structured"
+        )
+
+        assert len(client.calls) == 1
+        schema = client.calls[0]["response_format"]["json_schema"]["schema"]
+        assert schema["required"] == REPORT_SECTIONS
+        assert result["sections"]["closing"] == "Text for closing."
+        assert result["generation"]["mode"] == "structured"
+        assert result["generation"]["fallback_sections"] == []
+        assert set(result["generation"]["prompt_tokens"]) == {"structured"}
+
+    @pytest.mark.asyncio
+    async def test_invalid_sections_fall_back_to_per_section_calls(
+        self, isolated_completion_cache, stub_llm_client
+    ):
+        partial = {name: f"Text for {name}." for name in REPORT_SECTIONS[:5]}
+        partial["health_and_safety"] = 42
+        client = StructuredStubClient(json.dumps(partial))
+
+        result = await generate_management_report(
+            kpi_data=SAMPLE_KPI_DATA, client=client, mode="structured"
+        )
+
+        fallback = ["health_and_safety", "outlook_and_next_steps", "closing"]
+        assert result["generation"]["fallback_sections"] == fallback
+        assert len(client.calls) == 1 + len(fallback)
+        assert result["sections"]["executive_summary"] == "Text for executive_summary."
+        assert result["sections"]["health_and_safety"] == "Per-section narrative."
+
+        # A broken response falls back entirely and is never cached; the
+        # three sections generated above come from the completion cache.
+        broken = StructuredStubClient("not json")
+        result = await generate_management_report(
+            kpi_data=SAMPLE_KPI_DATA, client=broken, mode="structured"
+        )
+        assert result["generation"]["fallback_sections"] == REPORT_SECTIONS
+        assert len(broken.calls) == 1 + len(REPORT_SECTIONS) - len(fallback)
+        result = await generate_management_report(
+            kpi_data=SAMPLE_KPI_DATA, client=broken, mode="structured"
+        )
+        assert broken.calls[-1].get("response_format")